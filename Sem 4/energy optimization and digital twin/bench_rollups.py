@@ -0,0 +1,88 @@
+"""
+Dashboard queries from rollups (rollups.py) vs from the raw store (ts_store.py).
+
+A year of synthetic 1 Hz readings goes into both a raw store and the rollups,
+fed a day at a time. Then the same views are asked of each: a whole year, a
+month and a day, with a point budget. The raw side reads the range and
+averages it into the same number of buckets.
+
+Usage:
+  python bench_rollups.py
+  python bench_rollups.py --days 30
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from rollups import CHANNELS, Rollups
+from ts_store import SeriesStore
+
+START = 1704067200.0  # 2024-01-01 00:00 UTC
+DAY = 86400
+
+
+def day_of_readings(day, rng):
+    t = START + day * DAY + np.arange(DAY, dtype=float)
+    current = np.abs(8 + 4 * np.sin(t / 3600) + rng.normal(0, 0.5, DAY))
+    voltage = 230 + rng.normal(0, 3, DAY)
+    power = voltage * current
+    return t, {'PZEM Voltage': voltage, 'PZEM Current': current, 'PZEM Power': power,
+               'PZEM Energy': day * 50 + np.cumsum(power) / 3.6e6}
+
+
+def raw_view(store, start, end, points):
+    """The raw-data way: read every reading in range and average it into `points` buckets."""
+    arrays = store.read_arrays(['PZEM Voltage', 'PZEM Power'], start, end)
+    width = (end - start) / points
+    bucket = ((arrays['time'] - start) // width).astype(np.int64)
+    counts = np.bincount(bucket, minlength=points)
+    with np.errstate(invalid='ignore'):
+        return np.bincount(bucket, arrays['PZEM Power'], minlength=points) / counts
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--points", type=int, default=1000)
+    args = ap.parse_args()
+    rng = np.random.default_rng(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SeriesStore(os.path.join(tmp, 'raw'), columns=[(c, 'float') for c in CHANNELS])
+        rollups = Rollups(os.path.join(tmp, 'rollups'))
+        raw_seconds = rollup_seconds = 0.0
+        for day in range(args.days):
+            times, columns = day_of_readings(day, rng)
+            t0 = time.perf_counter()
+            store.append('meter', times, columns)
+            t1 = time.perf_counter()
+            rollups.add('meter', times, columns)
+            rollups.save()
+            rollup_seconds += time.perf_counter() - t1
+            raw_seconds += t1 - t0
+        store.close()
+        rows = args.days * DAY
+        print("%d rows: raw store write %.1f s, rollup update %.1f s (%.0f rows/s)" % (
+            rows, raw_seconds, rollup_seconds, rows / rollup_seconds))
+
+        end = START + args.days * DAY
+        views = [("year", START, end), ("month", end - 30 * DAY, end), ("day", end - DAY, end)]
+        print("%-6s %12s %8s %12s %12s %9s" % ("view", "raw rows", "level", "raw (ms)", "rollup (ms)", "speedup"))
+        for name, lo, hi in views:
+            lo = max(lo, START)
+            t0 = time.perf_counter()
+            raw_view(store, lo, hi, args.points)
+            t_raw = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            result = Rollups(os.path.join(tmp, 'rollups')).query('meter', lo, hi, args.points)
+            t_rollup = time.perf_counter() - t0
+            print("%-6s %12d %8s %12.1f %12.2f %8.0fx" % (
+                name, hi - lo, "%s:%d" % (result['resolution'], len(result['time'])),
+                t_raw * 1000, t_rollup * 1000, t_raw / t_rollup))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+CSV log vs partitioned store (ts_store.py) on a synthetic meter history.
+
+Writes the same readings both ways, then times a full read, a three-column read
+and a one-hour range read, and compares the size on disk.
+
+Usage:
+  python bench_store.py
+  python bench_store.py --rows 5000000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from ts_store import SeriesStore
+
+HEADERS = ['MidPoint', 'Noise mV', 'Average Temperature (°C)', 'PZEM Voltage', 'PZEM Current',
+           'PZEM Power', 'PZEM Energy', 'PZEM Frequency', 'PZEM PF']
+START = 1704067200.0  # 2024-01-01 00:00 UTC
+
+
+def meter_history(n, seed=0):
+    rng = np.random.default_rng(seed)
+    current = np.abs(8 + 4 * np.sin(np.arange(n) / 3600) + rng.normal(0, 0.5, n))
+    voltage = 230 + rng.normal(0, 3, n)
+    return pd.DataFrame({
+        'MidPoint': rng.integers(500, 600, n).astype(float),
+        'Noise mV': rng.integers(10, 40, n).astype(float),
+        'Average Temperature (°C)': np.round(40 + rng.normal(0, 1, n), 2),
+        'PZEM Voltage': np.round(voltage, 2),
+        'PZEM Current': np.round(current, 2),
+        'PZEM Power': np.round(voltage * current, 2),
+        'PZEM Energy': np.round(np.cumsum(voltage * current) / 3.6e6, 3),
+        'PZEM Frequency': np.round(50 + rng.normal(0, 0.1, n), 2),
+        'PZEM PF': np.ones(n),
+    })
+
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return time.perf_counter() - t0, out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--rows", type=int, default=2000000)
+    args = ap.parse_args()
+
+    data = meter_history(args.rows)
+    times = START + np.arange(args.rows, dtype=float)  # one reading per second
+    columns = ['PZEM Voltage', 'PZEM Current', 'PZEM Power']
+    hour = (START + 3600 * 5, START + 3600 * 6)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'serial_data.csv')
+        store_path = os.path.join(tmp, 'serial_data_store')
+
+        csv_write, _ = timed(lambda: data.to_csv(csv_path, index=False))
+
+        def write_store():
+            store = SeriesStore(store_path, columns=[(name, 'float') for name in HEADERS])
+            store.append('meter', times, {name: data[name].to_numpy() for name in HEADERS})
+            store.close()
+        store_write, _ = timed(write_store)
+
+        store = SeriesStore(store_path)
+        csv_time = pd.Series(times)
+
+        def csv_hour():
+            frame = pd.read_csv(csv_path, encoding='unicode_escape')
+            mask = ((csv_time >= hour[0]) & (csv_time < hour[1])).to_numpy()
+            return frame[mask]
+
+        results = [
+            ("write", csv_write, store_write),
+            ("full read", timed(lambda: pd.read_csv(csv_path, encoding='unicode_escape'))[0],
+             timed(lambda: store.read_frame(index_columns=False))[0]),
+            ("3 columns", timed(lambda: pd.read_csv(csv_path, encoding='unicode_escape', usecols=columns))[0],
+             timed(lambda: store.read_frame(columns, index_columns=False))[0]),
+            ("1 hour", timed(csv_hour)[0],
+             timed(lambda: store.read_frame(columns, hour[0], hour[1], index_columns=False))[0]),
+        ]
+        csv_bytes, store_bytes = os.path.getsize(csv_path), dir_size(store_path)
+        hour_rows = len(store.read_frame(columns, hour[0], hour[1]))
+
+    print("%d rows x %d columns, %d partitions, 1-hour read returns %d rows" % (
+        args.rows, len(HEADERS), len(store.meta['partitions']['meter']), hour_rows))
+    print("%-10s %10s %10s %9s" % ("", "csv (s)", "store (s)", "speedup"))
+    for name, a, b in results:
+        print("%-10s %10.3f %10.3f %8.1fx" % (name, a, b, a / b))
+    print("%-10s %9.1fM %9.1fM" % ("size", csv_bytes / 2**20, store_bytes / 2**20))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Throughput of the threshold engine (thresholds.py) on a long synthetic history.
+
+The history is generated chunk by chunk, so 100M rows fit in memory. Only the
+time spent in ThresholdEngine.feed() is counted. For comparison, a plain
+Python per-reading loop, which tracks the same hysteresis intervals, runs
+over the first --loop-rows rows. "live" feeds --live-rows rows a few at a
+time, the way the serial logger does.
+
+Usage:
+  python bench_thresholds.py
+  python bench_thresholds.py --rows 10000000 --chunk 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from thresholds import DEFAULT_RULES, ThresholdEngine
+
+CHANNELS = ['PZEM Voltage', 'PZEM Current', 'PZEM Power', 'PZEM Frequency', 'PZEM PF']
+
+
+def readings(start, n, rng):
+    """n rows at 1 Hz from row `start`: slow drifts plus noise, so every rule fires now and then."""
+    t = start + np.arange(n, dtype=float)
+    voltage = 225 + 12 * np.sin(t / 5400) + rng.normal(0, 1, n)
+    current = 80 + 60 * np.sin(t / 1800) ** 2 + rng.normal(0, 2, n)
+    return t, {
+        'PZEM Voltage': voltage,
+        'PZEM Current': current,
+        'PZEM Power': voltage * current / 250,
+        'PZEM Frequency': 50 + 0.3 * np.sin(t / 900) + rng.normal(0, 0.03, n),
+        'PZEM PF': np.clip(0.9 + 0.08 * np.sin(t / 7200) + rng.normal(0, 0.01, n), 0, 1),
+    }
+
+
+def python_loop(times, columns, rules):
+    """Per-reading version of the same rules, as the old highpower.py loops would have to become."""
+    events = 0
+    for rule in rules:
+        values = columns[rule.channel].tolist()
+        active = False
+        start = 0.0
+        for t, v in zip(times.tolist(), values):
+            if not active:
+                if (v > rule.threshold) if rule.above else (v < rule.threshold):
+                    active, start = True, t
+            elif (v < rule.clear) if rule.above else (v > rule.clear):
+                active = False
+                if t - start >= rule.min_duration:
+                    events += 1
+    return events
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--rows", type=int, default=100000000)
+    ap.add_argument("--chunk", type=int, default=5000000)
+    ap.add_argument("--loop-rows", type=int, default=2000000)
+    ap.add_argument("--live-rows", type=int, default=200000)
+    ap.add_argument("--live-batch", type=int, default=10)
+    args = ap.parse_args()
+    rng = np.random.default_rng(0)
+
+    engine = ThresholdEngine(DEFAULT_RULES)
+    events = 0
+    spent = 0.0
+    for start in range(0, args.rows, args.chunk):
+        times, columns = readings(start, min(args.chunk, args.rows - start), rng)
+        t0 = time.perf_counter()
+        events += len(engine.feed(times, columns))
+        spent += time.perf_counter() - t0
+    print("%d rules over %d channels" % (len(DEFAULT_RULES), len(CHANNELS)))
+    print("%-8s %12s %10s %10s %14s" % ("mode", "rows", "events", "seconds", "rows/s"))
+    print("%-8s %12d %10d %10.2f %14.0f" % ("batch", args.rows, events, spent, args.rows / spent))
+
+    times, columns = readings(0, args.loop_rows, np.random.default_rng(1))
+    t0 = time.perf_counter()
+    loop_events = python_loop(times, columns, DEFAULT_RULES)
+    spent = time.perf_counter() - t0
+    print("%-8s %12d %10d %10.2f %14.0f" % ("loop", args.loop_rows, loop_events, spent, args.loop_rows / spent))
+
+    times, columns = readings(0, args.live_rows, np.random.default_rng(2))
+    engine = ThresholdEngine(DEFAULT_RULES)
+    events = 0
+    t0 = time.perf_counter()
+    for i in range(0, args.live_rows, args.live_batch):
+        events += len(engine.feed(times[i:i + args.live_batch],
+                                  {name: values[i:i + args.live_batch] for name, values in columns.items()}))
+        engine.newly_active()
+    spent = time.perf_counter() - t0
+    print("%-8s %12d %10d %10.2f %14.0f   (%d rows per feed)" % (
+        "live", args.live_rows, events, spent, args.live_rows / spent, args.live_batch))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,12 @@
 import pandas as pd
 import numpy as np
 
+from thresholds import detect, print_events
+from ts_store import load_serial_data
+
 # data = pd.read_csv("serial_data.csv", encoding='unicode_escape')
-data = pd.read_csv("serial_data.csv", encoding='unicode_escape')
+# Reads serial_data_store/ instead when it exists (see ts_store.py)
+data = load_serial_data("serial_data.csv")
 
 print("data preview is : ", data.head(5))
 
@@ -34,23 +38,17 @@ print("Power", power)
 #     else:
 #         print("less")
 
-for volt in voltage:
-    if volt > 240:
-        print("High Voltage")
-        break
-    else:
-        continue
-
-for curr in current:
-    if curr > 150:
-        print("High Current")
-        break
-    else:
-        continue
-
-for pwr in power:
-    if pwr > 100:
-        print("High Power")
-        break
-    else:
-        continue
\ No newline at end of file
+# Every threshold event (start, end, peak), not just the first reading over the limit.
+# The CSV has no time column, so the row number stands in for seconds at 1 Hz.
+channels = {'PZEM Voltage': voltage, 'PZEM Current': current, 'PZEM Power': power,
+            'PZEM Frequency': frequency, 'PZEM PF': powerfactor}
+events = detect(np.arange(len(data), dtype=float), channels)
+print_events(events)
+
+# The original checks: any single reading over the limit
+if np.any(voltage > 240):
+    print("High Voltage")
+if np.any(current > 150):
+    print("High Current")
+if np.any(power > 100):
+    print("High Power")
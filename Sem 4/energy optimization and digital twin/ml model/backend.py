@@ -1,39 +1,18 @@
 from pandas import read_csv
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
-from sklearn.svm import SVC
-import pickle
 import csv
 
+from training import train
+
 file = "serial_data.csv"
+learner = 'svc'  # 'svc' (the original SVC), 'sgd' or 'hgb'; see training.LEARNERS
 #names = ['MidPoint', 'Noise mV', 'Average Temperature (°C)', 'PZEM Voltage', 'PZEM Current', 'PZEM Power', 'PZEM Energy', 'PZEM Frequency', 'PZEM PF', 'OUTPUT']
 
-dataset = read_csv("serial_data.csv", encoding='unicode_escape')
-
-print("data preview is : ", dataset.head(5))
-
-dataset['OUTPUT'] = dataset['OUTPUT'].map({'normal': 0, 'medium': 1, "high": 2, "csmr": 3, "pgvf":4})
-
-array = dataset.values
-X = array[:,0:8]
-y = array[:,9]
-X_train, X_test, Y_train, Y_test = train_test_split(X, y, test_size=0.50, random_state=1)
-
-sc = StandardScaler()
-X_train = sc.fit_transform(X_train)
-X_test = sc.transform(X_test)
-
-model = SVC(gamma='auto')
-#model = LogisticRegression(solver='liblinear', multi_class='ovr')
-
-model.fit(X_train, Y_train)
-
-filename = 'model.pkl'
-pickle.dump(model, open(filename, 'wb'))
-
-loaded_model = pickle.load(open(filename, 'rb'))
-result = loaded_model.score(X_test, Y_test)
-print(result)
+# Load, split, scale, fit, save (model.pkl + model_scaler.pkl) and score; see training.py
+result = train(file, 'model.pkl', progress=lambda fraction, message: print(f"[{fraction * 100:3.0f}%] {message}"),
+               learner=learner)
+model = result.model
+sc = result.scaler
+print(result.accuracy)
 
 # value = [[213.11479999999997,0.252315,53.772060761999995]]
 # predictions = model.predict(value)
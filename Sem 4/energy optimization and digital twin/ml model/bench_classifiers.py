@@ -0,0 +1,96 @@
+"""
+Accuracy, fit time and prediction latency of the learners in training.py.
+
+Training sets of growing size are drawn from serial_data.csv: rows are resampled
+per class with Gaussian jitter, so the classes overlap as they would in months of
+real readings. Every learner is scored on the same held-out set. SVC stops at
+--svc-max-rows, because its fit time grows quadratically or worse. "sgd chunked" trains
+through train(..., chunk_rows=...) from a CSV on disk, the way a history too big
+for memory would be trained.
+
+Usage, from the ml model folder:
+  python bench_classifiers.py
+  python bench_classifiers.py --sizes 10000 100000 --svc-max-rows 10000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from training import features_and_labels, make_classifier, train
+
+HEADERS = ['MidPoint', 'Noise mV', 'Average Temperature (°C)', 'PZEM Voltage', 'PZEM Current',
+           'PZEM Power', 'PZEM Energy', 'PZEM Frequency', 'PZEM PF', 'OUTPUT']
+
+
+def synthetic(base, n, rng, jitter=0.6):
+    """n labelled rows resampled from base, per class, with jitter x the class's feature spread."""
+    picks = base.iloc[rng.integers(0, len(base), n)].reset_index(drop=True)
+    spread = base.groupby('OUTPUT')[HEADERS[:9]].std().fillna(0.0)
+    noise = rng.normal(0.0, 1.0, (n, 9)) * spread.loc[picks['OUTPUT']].to_numpy() * jitter
+    picks[HEADERS[:9]] = picks[HEADERS[:9]].to_numpy(dtype=float) + noise
+    return picks
+
+
+def predict_latency(model, sc, X, repeats=200):
+    """Median seconds to predict one reading (scaling included), and rows/s for the whole of X."""
+    single = []
+    for i in range(repeats):
+        row = X[i % len(X)].reshape(1, -1)
+        t0 = time.perf_counter()
+        model.predict(sc.transform(row))
+        single.append(time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    model.predict(sc.transform(X))
+    return float(np.median(single)), len(X) / (time.perf_counter() - t0)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--csv", default="serial_data.csv")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[2000, 10000, 30000, 100000, 1000000])
+    ap.add_argument("--svc-max-rows", type=int, default=30000)
+    ap.add_argument("--test-rows", type=int, default=50000)
+    ap.add_argument("--chunk-rows", type=int, default=200000)
+    args = ap.parse_args()
+
+    base = pd.read_csv(args.csv, encoding='unicode_escape')
+    base.columns = HEADERS
+    rng = np.random.default_rng(0)
+    X_test, Y_test = features_and_labels(synthetic(base, args.test_rows, rng))
+
+    print("%-12s %9s %10s %10s %14s %14s" % ("learner", "rows", "accuracy", "fit (s)", "1 row (us)", "batch rows/s"))
+    for n in args.sizes:
+        X, y = features_and_labels(synthetic(base, n, rng))
+        for learner in ['svc', 'sgd', 'hgb']:
+            if learner == 'svc' and n > args.svc_max_rows:
+                continue
+            t0 = time.perf_counter()
+            sc = StandardScaler()
+            model = make_classifier(learner)
+            model.fit(sc.fit_transform(X), y)
+            fit = time.perf_counter() - t0
+            accuracy = np.mean(model.predict(sc.transform(X_test)) == Y_test)
+            single, batch = predict_latency(model, sc, X_test)
+            print("%-12s %9d %10.4f %10.2f %14.0f %14.0f" % (learner, n, accuracy, fit, single * 1e6, batch))
+
+    n = max(args.sizes)
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'history.csv')
+        frame = synthetic(base, n, rng)
+        frame.to_csv(csv_path, index=False, encoding='latin-1')
+        t0 = time.perf_counter()
+        result = train(csv_path, os.path.join(tmp, 'model.pkl'), learner='sgd', chunk_rows=args.chunk_rows)
+        fit = time.perf_counter() - t0
+        accuracy = np.mean(result.model.predict(result.scaler.transform(X_test)) == Y_test)
+        single, batch = predict_latency(result.model, result.scaler, X_test)
+        print("%-12s %9d %10.4f %10.2f %14.0f %14.0f   (CSV read in %d-row chunks, 3 epochs)" % (
+            "sgd chunked", n, accuracy, fit, single * 1e6, batch, args.chunk_rows))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,8 @@
 from pandas import read_csv
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
-from sklearn.svm import SVC
-import pickle
 import csv
 
+from training import DEFAULT_LEARNER, LEARNERS, TrainingJob
+
 import tkinter as tk
 from tkinter import messagebox
 
@@ -18,10 +16,23 @@ class MyGUI:
         self.root.configure(bg="gray")
 
 
+        #Learner (see training.LEARNERS)
+        self.learner = tk.StringVar(self.root, value=DEFAULT_LEARNER)
+        self.learnermenu = tk.OptionMenu(self.root, self.learner, *LEARNERS)
+        self.learnermenu.config(font=("Arial", 15), width=20, bg="white")
+        self.learnermenu.pack(padx=5, pady=5)
+
         #Train button
         self.trainbtn = tk.Button(self.root, text="Train ML model", height=2, width=25, font=("Arial", 25), bg="white", command=self.train)
         self.trainbtn.pack(padx=5, pady=5)
 
+        self.cancelbtn = tk.Button(self.root, text="Cancel Training", height=1, width=25, font=("Arial", 15), bg="white", command=self.cancel_training, state=tk.DISABLED)
+        self.cancelbtn.pack(padx=5, pady=5)
+
+        self.status = tk.Label(self.root, text="", font=("Arial", 15), bg="gray")
+        self.status.pack(padx=5, pady=5)
+        self.job = None
+
         self.accuracypagebtn = tk.Button(self.root, text="Check Accuracy", height=2, width=25, font=("Arial", 25), bg="white", command=self.accuracy_window)
         self.accuracypagebtn.pack(padx=10, pady=10)
 
@@ -36,29 +47,43 @@ class MyGUI:
 
     
     def train(self):
-        self.file = "serial_data.csv"
-        self.dataset = read_csv("serial_data.csv", encoding='unicode_escape')
-        self.dataset['OUTPUT'] = self.dataset['OUTPUT'].map({'normal': 0, 'medium': 1, "high": 2, "csmr": 3, "pgvf":4})
-
-        self.array = self.dataset.values
-        self.X = self.array[:,0:8]
-        self.y = self.array[:,9]
-        self.X_train, self.X_test, self.Y_train, self.Y_test = train_test_split(self.X, self.y, test_size=0.50, random_state=1)
-
-        self.sc = StandardScaler()
-        self.X_train = self.sc.fit_transform(self.X_train)
-        self.X_test = self.sc.transform(self.X_test)
-
-        self.model = SVC(gamma='auto')
-    
-        self.model.fit(self.X_train, self.Y_train)
-
-        self.filename = 'model.pkl'
-        pickle.dump(self.model, open(self.filename, 'wb'))
+        # The fit runs in a worker process (training.py); the window stays responsive
+        if self.job is not None and self.job.running:
+            return
+        self.trainbtn.config(state=tk.DISABLED)
+        self.cancelbtn.config(state=tk.NORMAL)
+        self.status.config(text="Starting training...")
+        self.job = TrainingJob("serial_data.csv", 'model.pkl', on_progress=self.training_progress, on_done=self.training_done,
+                               learner=self.learner.get())
+        self.job.start()
+        self.root.after(100, self.poll_training)
+
+    def poll_training(self):
+        # Runs on the Tk thread, so the job's callbacks below are free to update widgets
+        if self.job.poll():
+            self.root.after(100, self.poll_training)
+
+    def cancel_training(self):
+        if self.job is not None:
+            self.job.cancel()
+
+    def training_progress(self, fraction, message):
+        self.status.config(text=f"{message}... {fraction * 100:.0f} %")
+
+    def training_done(self, job):
+        self.trainbtn.config(state=tk.NORMAL)
+        self.cancelbtn.config(state=tk.DISABLED)
+        if job.status != 'done':
+            self.status.config(text=f"Training {job.status}")
+            if job.status == 'failed':
+                messagebox.showerror(title="Training Failed", message=job.error)
+            return
+        self.status.config(text=f"{job.result.learner} model trained in {job.result.seconds:.1f} s")
+        self.model = job.result.model
+        self.sc = job.result.scaler
 
         #Accuracy
-        self.loaded_model = pickle.load(open(self.filename, 'rb'))
-        self.accuracy = self.loaded_model.score(self.X_test, self.Y_test)
+        self.accuracy = job.result.accuracy
         print(self.accuracy)
 
         #Prediction
@@ -248,6 +273,8 @@ class MyGUI:
 
     def close(self):
         if messagebox.askyesno(title="Quit?", message="Do you want to quit ?"):
+            self.cancel_training()
             self.root.destroy()
 
-MyGUI()
\ No newline at end of file
+if __name__ == "__main__":  # the training worker is a spawned process, which imports this module too
+    MyGUI()
\ No newline at end of file
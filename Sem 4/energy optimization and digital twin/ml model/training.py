@@ -0,0 +1,388 @@
+# ---------------------------------------------------------------------------
+# Training service for the energy state model, independent of the GUI
+#
+# train() is the whole job (load, scale, fit, save, score) with a progress
+# callback and a stop check between steps. TrainingJob runs it in a separate
+# process, so a long fit never blocks the caller and can be cancelled outright
+# (the process is terminated). Saving is the last step and cannot be cancelled:
+# once it has begun the run completes, so model.pkl is never replaced by a run
+# that is reported as cancelled.
+# Progress and the result come back through a queue that the caller drains
+# with poll() from its own thread (the GUI does so from a Tk after() timer).
+#
+# Learners (LEARNERS): the original kernel SVC, whose fit grows quadratically or
+# worse with the number of rows, and two that grow linearly: an RBF kernel
+# approximation with a linear SVM trained by SGD, which can also train chunk
+# by chunk on data that does not fit in memory (chunk_rows), and histogram
+# gradient boosting.
+#
+# Headless:  python training.py [--csv serial_data.csv] [--model model.pkl] [--learner hgb]
+#                               [--chunk-rows 1000000 --epochs 3]   (sgd only)
+# ---------------------------------------------------------------------------
+import argparse
+import multiprocessing
+import os
+import pickle
+import queue
+import signal
+import sys
+import time
+
+import numpy as np
+from sklearn.ensemble import HistGradientBoostingClassifier
+from sklearn.kernel_approximation import RBFSampler
+from sklearn.linear_model import SGDClassifier
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+from sklearn.svm import SVC
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from ts_store import iter_serial_data, load_serial_data  # noqa: E402
+
+LABELS = {'normal': 0, 'medium': 1, "high": 2, "csmr": 3, "pgvf": 4}
+LABEL_NAMES = {0: "Normal", 1: "Medium", 2: "High", 3: "CSMR", 4: "PGVF"}
+CLASSES = np.array(sorted(LABELS.values()), dtype=float)
+N_FEATURES = 8
+
+LEARNERS = {
+    'svc': "RBF kernel SVC (the original model; fit time grows ~n^2-n^3, keep to a few 10k rows)",
+    'sgd': "RBF kernel approximation + linear SVM by SGD (linear time; trains chunk by chunk)",
+    'hgb': "histogram gradient boosting (linear time, needs the data in memory)",
+}
+DEFAULT_LEARNER = 'svc'  # model.pkl stays the original model family unless another is picked
+
+
+class KernelSGDClassifier:
+    """
+    Random Fourier features approximating the SVC's RBF kernel (same gamma as
+    gamma='auto' on the 8 scaled features), then a linear SVM fitted by SGD.
+    partial_fit() takes one chunk at a time; fit() makes `epochs` shuffled passes
+    in minibatches, so the expanded features never exist for all rows at once.
+    """
+
+    def __init__(self, n_features=N_FEATURES, n_components=100, alpha=1e-5, epochs=5, batch_rows=10000,
+                 random_state=1):
+        self.features = RBFSampler(gamma=1.0 / n_features, n_components=n_components, random_state=random_state)
+        self.features.fit(np.zeros((1, n_features)))  # draws the random projection; needs only the width
+        self.linear = SGDClassifier(loss='hinge', alpha=alpha, random_state=random_state)
+        self.epochs = epochs
+        self.batch_rows = batch_rows
+        self.random_state = random_state
+
+    def fit(self, X, y):
+        rng = np.random.default_rng(self.random_state)
+        for _ in range(self.epochs):
+            order = rng.permutation(len(y))
+            for lo in range(0, len(y), self.batch_rows):
+                batch = order[lo:lo + self.batch_rows]
+                self.partial_fit(X[batch], y[batch])
+        return self
+
+    def partial_fit(self, X, y, classes=CLASSES):
+        self.linear.partial_fit(self.features.transform(X), y, classes=classes)
+        return self
+
+    def predict(self, X):
+        return self.linear.predict(self.features.transform(X))
+
+    def score(self, X, y):
+        return float(np.mean(self.predict(X) == y))
+
+
+def make_classifier(learner=DEFAULT_LEARNER):
+    if learner == 'svc':
+        return SVC(gamma='auto')
+    if learner == 'sgd':
+        return KernelSGDClassifier()
+    if learner == 'hgb':
+        return HistGradientBoostingClassifier(random_state=1)
+    raise ValueError(f"unknown learner {learner!r} (one of {', '.join(LEARNERS)})")
+
+
+class TrainingCancelled(Exception):
+    pass
+
+
+class TrainingResult:
+    __slots__ = ('learner', 'model', 'scaler', 'accuracy', 'n_train', 'n_test', 'seconds', 'model_path')
+
+    def __init__(self, learner, model, scaler, accuracy, n_train, n_test, seconds, model_path):
+        self.learner = learner
+        self.model = model
+        self.scaler = scaler
+        self.accuracy = accuracy
+        self.n_train = n_train
+        self.n_test = n_test
+        self.seconds = seconds
+        self.model_path = model_path
+
+
+def scaler_path(model_path):
+    return os.path.splitext(model_path)[0] + '_scaler.pkl'
+
+
+def features_and_labels(dataset):
+    """The 8 sensor features and the OUTPUT label (0-4) of labelled readings; unlabelled rows are dropped."""
+    dataset['OUTPUT'] = dataset['OUTPUT'].map(LABELS)
+    array = dataset.values
+    X, y = array[:, 0:8].astype(float), array[:, 9].astype(float)
+    labelled = ~np.isnan(y)
+    return X[labelled], y[labelled]
+
+
+def load_dataset(csv_path):
+    return features_and_labels(load_serial_data(csv_path))
+
+
+def _dump(obj, path):
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        pickle.dump(obj, f)
+    os.replace(tmp, path)  # readers never see a half-written model
+
+
+def train(csv_path="serial_data.csv", model_path="model.pkl", progress=None, should_stop=None,
+          learner=DEFAULT_LEARNER, chunk_rows=None, epochs=3, begin_saving=None):
+    """
+    Trains and saves the model (model_path) and its scaler (<model>_scaler.pkl).
+    progress(fraction, message) is called between steps; should_stop() is checked
+    there too and raises TrainingCancelled when it returns True. Saving comes last
+    and is not checked: once begin_saving() (if given) has returned True the run
+    completes; it returns False to cancel instead. With chunk_rows (learner 'sgd'
+    only) the data is streamed in chunks instead of loaded whole.
+    """
+    t0 = time.perf_counter()
+
+    def step(fraction, message):
+        if should_stop is not None and should_stop():
+            raise TrainingCancelled(message)
+        if progress is not None:
+            progress(fraction, message)
+
+    def save(fraction, model, sc):
+        step(fraction, "Saving model")
+        if begin_saving is not None and not begin_saving():
+            raise TrainingCancelled("Saving model")
+        _dump(model, model_path)
+        _dump(sc, scaler_path(model_path))
+        if progress is not None:
+            progress(1.0, "Done")
+
+    if learner not in LEARNERS:
+        raise ValueError(f"unknown learner {learner!r} (one of {', '.join(LEARNERS)})")
+    if chunk_rows:
+        if learner != 'sgd':
+            raise ValueError(f"chunked training needs learner 'sgd' (partial_fit), not {learner!r}")
+        model, sc, accuracy, n_train, n_test = _train_chunked(csv_path, step, chunk_rows, epochs)
+        save(0.95, model, sc)
+        return TrainingResult(learner, model, sc, accuracy, n_train, n_test, time.perf_counter() - t0, model_path)
+
+    step(0.0, "Loading data")
+    X, y = load_dataset(csv_path)
+    X_train, X_test, Y_train, Y_test = train_test_split(X, y, test_size=0.50, random_state=1)
+
+    step(0.1, "Scaling features")
+    sc = StandardScaler()
+    X_train = sc.fit_transform(X_train)
+    X_test = sc.transform(X_test)
+
+    step(0.2, f"Fitting {learner} on {len(X_train)} rows")
+    model = make_classifier(learner)
+    model.fit(X_train, Y_train)
+
+    step(0.8, "Scoring")
+    accuracy = model.score(X_test, Y_test)
+
+    save(0.9, model, sc)
+    return TrainingResult(learner, model, sc, accuracy, len(X_train), len(X_test), time.perf_counter() - t0,
+                          model_path)
+
+
+def _train_chunked(csv_path, step, chunk_rows, epochs):
+    """
+    One pass to fit the scaler, `epochs` passes of partial_fit, one pass to score.
+    Each chunk is split 50/50 into train and test rows, the same way on every pass.
+    """
+    def chunks():
+        for i, frame in enumerate(iter_serial_data(csv_path, chunk_rows)):
+            X, y = features_and_labels(frame)
+            test = np.random.default_rng(i).random(len(y)) < 0.5
+            yield X[~test], y[~test], X[test], y[test]
+
+    sc = StandardScaler()
+    n_chunks = n_train = n_test = 0
+    for X_train, _, X_test, _ in chunks():
+        step(0.05, f"Scaling features: {n_train + n_test + len(X_train) + len(X_test)} rows read")
+        sc.partial_fit(X_train)
+        n_chunks += 1
+        n_train += len(X_train)
+        n_test += len(X_test)
+    if not n_train:
+        raise ValueError(f"no labelled rows in {csv_path}")
+
+    model = make_classifier('sgd')
+    rng = np.random.default_rng(1)
+    done = 0
+    for epoch in range(epochs):
+        for X_train, Y_train, _, _ in chunks():
+            step(0.1 + 0.75 * done / (epochs * n_chunks),
+                 f"Fitting sgd, epoch {epoch + 1}/{epochs}, chunk {done % n_chunks + 1}/{n_chunks}")
+            order = rng.permutation(len(Y_train))  # logged rows come in runs of one state; SGD wants them mixed
+            model.partial_fit(sc.transform(X_train[order]), Y_train[order])
+            done += 1
+
+    correct = 0
+    for _, _, X_test, Y_test in chunks():
+        step(0.85, "Scoring")
+        if len(Y_test):
+            correct += int(np.sum(model.predict(sc.transform(X_test)) == Y_test))
+    return model, sc, correct / n_test if n_test else float('nan'), n_train, n_test
+
+
+def _worker(messages, stop, saving, lock, csv_path, model_path, options):
+    """Process entry point: runs train() and reports through the messages queue."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C reaches the whole group; the parent cancels
+
+    def begin_saving():
+        with lock:  # TrainingJob.cancel() sets stop under the same lock
+            if stop.is_set():
+                return False
+            saving.set()
+            return True
+
+    try:
+        result = train(csv_path, model_path,
+                       progress=lambda fraction, message: messages.put(('progress', fraction, message)),
+                       should_stop=stop.is_set, begin_saving=begin_saving, **options)
+        messages.put(('done', result))
+    except TrainingCancelled:
+        messages.put(('cancelled',))
+    except Exception as e:
+        messages.put(('failed', f"{type(e).__name__}: {e}"))
+
+
+class TrainingJob:
+    """
+    One training run in a worker process.
+
+        job = TrainingJob("serial_data.csv", "model.pkl", on_progress=..., on_done=...)
+        job.start()
+        ...                # call job.poll() regularly; callbacks run in the polling thread
+        job.cancel()       # optional
+
+    status: 'pending', 'running', 'done', 'failed' or 'cancelled'.
+    on_progress(fraction, message); on_done(job), with job.result or job.error set.
+    """
+
+    def __init__(self, csv_path="serial_data.csv", model_path="model.pkl", on_progress=None, on_done=None,
+                 learner=DEFAULT_LEARNER, chunk_rows=None, epochs=3):
+        self.csv_path = csv_path
+        self.model_path = model_path
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.status = 'pending'
+        self.fraction = 0.0
+        self.message = ""
+        self.result = None
+        self.error = None
+        ctx = multiprocessing.get_context('spawn')  # same behaviour on Windows, Linux and macOS
+        self._messages = ctx.Queue()
+        self._stop = ctx.Event()
+        self._saving = ctx.Event()
+        self._lock = ctx.Lock()
+        options = {'learner': learner, 'chunk_rows': chunk_rows, 'epochs': epochs}
+        self._process = ctx.Process(target=_worker, daemon=True,
+                                    args=(self._messages, self._stop, self._saving, self._lock,
+                                          csv_path, model_path, options))
+
+    def start(self):
+        self.status = 'running'
+        self._process.start()
+        return self
+
+    @property
+    def running(self):
+        return self.status == 'running'
+
+    def cancel(self):
+        """
+        Stops the run: asks the worker to stop, and terminates it if it is inside the fit.
+        Once the worker has begun saving, cancel is a no-op: it waits and the run ends 'done'.
+        """
+        if not self.running:
+            return
+        with self._lock:
+            self._stop.set()
+            saving = self._saving.is_set()
+        if saving:
+            self.wait()
+            return
+        self._process.join(0.5)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join()
+        self._finish('cancelled')
+
+    def poll(self):
+        """Delivers queued progress and the result to the callbacks. True while the job is running."""
+        while self.running:
+            try:
+                message = self._messages.get_nowait()
+            except queue.Empty:
+                if not self._process.is_alive() and self._messages.empty():
+                    self.error = f"worker exited with code {self._process.exitcode}"
+                    self._finish('failed')
+                break
+            kind = message[0]
+            if kind == 'progress':
+                self.fraction, self.message = message[1], message[2]
+                if self.on_progress is not None:
+                    self.on_progress(self.fraction, self.message)
+            elif kind == 'done':
+                self.result = message[1]
+                self._finish('done')
+            elif kind == 'failed':
+                self.error = message[1]
+                self._finish('failed')
+            else:
+                self._finish('cancelled')
+        return self.running
+
+    def wait(self, interval=0.1):
+        """Polls until the job ends (for headless use); returns the final status."""
+        while self.poll():
+            time.sleep(interval)
+        return self.status
+
+    def _finish(self, status):
+        self.status = status
+        self._process.join(1.0)
+        if self.on_done is not None:
+            self.on_done(self)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Train the energy state model without the GUI (Ctrl+C cancels)")
+    ap.add_argument("--csv", default="serial_data.csv")
+    ap.add_argument("--model", default="model.pkl")
+    ap.add_argument("--learner", default=DEFAULT_LEARNER, choices=list(LEARNERS))
+    ap.add_argument("--chunk-rows", type=int, help="stream the data in chunks of this many rows (sgd only)")
+    ap.add_argument("--epochs", type=int, default=3, help="passes over the data when streaming")
+    args = ap.parse_args()
+    if args.chunk_rows and args.learner != 'sgd':
+        ap.error("--chunk-rows needs --learner sgd")
+
+    job = TrainingJob(args.csv, args.model,
+                      on_progress=lambda fraction, message: print(f"[{fraction * 100:3.0f}%] {message}"),
+                      learner=args.learner, chunk_rows=args.chunk_rows, epochs=args.epochs)
+    job.start()
+    try:
+        status = job.wait()
+    except KeyboardInterrupt:
+        job.cancel()
+        status = job.status
+    if status == 'done':
+        r = job.result
+        print(f"{r.learner}: accuracy {r.accuracy:.4f} ({r.n_train} train / {r.n_test} test rows) in {r.seconds:.2f}s -> {r.model_path}")
+    else:
+        raise SystemExit(f"training {status}" + (f": {job.error}" if job.error else ""))
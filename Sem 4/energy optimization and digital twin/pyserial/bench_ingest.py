@@ -0,0 +1,114 @@
+"""
+Throughput of the serial logger against a simulated meter, no hardware needed.
+
+A pseudo-terminal pair stands in for the serial port: a feeder thread writes
+"Key: value" lines into the master side as fast as the logger takes them, and
+the logger reads the slave side like a real port. Compares the old loop
+(blocking readline, re.findall, DictWriter, flush per row) with SerialLogger.
+
+Linux/macOS only (uses os.openpty). Usage, from the pyserial folder:
+  python bench_ingest.py
+  python bench_ingest.py --lines 200000 --modes logger
+"""
+import argparse
+import csv
+import os
+import re
+import tempfile
+import threading
+import time
+import tty
+
+import serial
+
+import file2
+
+LINE_TEMPLATES = ['MidPoint: {:d}', 'Noise mV: {:d}', 'Average Temperature: {:.2f}',
+                  'PZEM Voltage: {:.1f}', 'PZEM Current: {:.3f}', 'PZEM Power: {:.1f}',
+                  'PZEM Energy: {:.3f}', 'PZEM Frequency: {:.1f}', 'PZEM PF: {:.2f}']
+
+
+def meter_output(n):
+    lines = []
+    for i in range(n):
+        template = LINE_TEMPLATES[i % len(LINE_TEMPLATES)]
+        value = 500 + i % 97 if '{:d}' in template else 20 + (i % 1000) / 10
+        lines.append(template.format(value))
+    return ('\r\n'.join(lines) + '\r\n').encode()
+
+
+def feed(master, data, chunk=4096):
+    for start in range(0, len(data), chunk):
+        os.write(master, data[start:start + chunk])
+
+
+def legacy_loop(port, csv_path, n_lines, feeder):
+    """The previous file2.py loop, stopped after n_lines rows."""
+    with open(csv_path, 'a', newline='') as csv_file:
+        csv_writer = csv.DictWriter(csv_file, fieldnames=file2.headers)
+        csv_writer.writeheader()
+        ser = serial.Serial(port, file2.baud_rate, timeout=1)
+        feeder.start()  # opening the port empties its input buffer, so feed only now
+        values = dict.fromkeys(file2.headers, '')
+        columns = dict(zip(file2.serial_keys, file2.headers))
+        rows = 0
+        while rows < n_lines:
+            serial_data = ser.readline().decode('utf-8').strip()
+            data_pairs = re.findall(r'([a-zA-Z ]+): (.+)', serial_data)
+            if data_pairs:
+                data_dict = {key.strip(): value.strip() for key, value in data_pairs}
+                for key, value in data_dict.items():
+                    if key in columns:
+                        values[columns[key]] = value
+                csv_writer.writerow(values)
+                csv_file.flush()
+                rows += 1
+        done = time.perf_counter()
+        ser.close()
+    return rows, 0, done
+
+
+def run_logger(port, csv_path, n_lines, feeder):
+    logger = file2.SerialLogger(port, file2.baud_rate, csv_path)
+    stop = threading.Event()
+    thread = threading.Thread(target=logger.run, args=(stop,))
+    thread.start()
+    while logger.reader is None:
+        time.sleep(0.001)
+    feeder.start()
+    while logger.rows_written + logger.reader.lines_dropped < n_lines:
+        time.sleep(0.001)
+    done = time.perf_counter()
+    stop.set()
+    thread.join()
+    return logger.rows_written, logger.reader.lines_dropped, done
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--lines", type=int, default=50000)
+    ap.add_argument("--modes", nargs="+", default=["legacy", "logger"], choices=["legacy", "logger"])
+    args = ap.parse_args()
+
+    data = meter_output(args.lines)
+    print("%d lines, %.1f MB (115200 baud carries about %.0f of these lines/s)" % (
+        args.lines, len(data) / 2**20, 11520 / (len(data) / args.lines)))
+    print("%-8s %10s %10s %12s %12s" % ("mode", "rows", "dropped", "seconds", "lines/s"))
+    for mode in args.modes:
+        master, slave = os.openpty()
+        tty.setraw(slave)
+        port = os.ttyname(slave)
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_path = os.path.join(tmp, 'bench.csv')
+            feeder = threading.Thread(target=feed, args=(master, data), daemon=True)
+            t0 = time.perf_counter()
+            run = legacy_loop if mode == "legacy" else run_logger
+            rows, dropped, done = run(port, csv_path, args.lines, feeder)
+            elapsed = done - t0
+        os.close(master)
+        os.close(slave)
+        print("%-8s %10d %10d %12.3f %12.0f" % (mode, rows, dropped, elapsed, args.lines / elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Multi-port logging against simulated meters, no hardware needed.
+
+Opens one pseudo-terminal pair per meter, feeds each with its own stream of
+"Key: value" lines, runs MultiPortLogger on the slave sides and checks that every
+device's CSV received all of its lines, none of them dropped. Prints per-port rows, drops and read->write lag.
+Unpaced, the feeders flood the logger and the lag shows the queue backlog; --rate
+paces each meter to a real line rate (115200 baud is about 580 lines/s).
+
+Linux/macOS only (uses os.openpty). Usage, from the pyserial folder:
+  python bench_multiport.py
+  python bench_multiport.py --ports 24 --lines 50000
+  python bench_multiport.py --ports 12 --lines 3000 --rate 580
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+import tty
+
+import file2
+from bench_ingest import feed, meter_output
+
+
+def paced_feed(master, data, rate, n_lines, chunk=256):
+    """feed() at about rate lines per second."""
+    seconds_per_byte = n_lines / rate / len(data)
+    t0 = time.perf_counter()
+    for start in range(0, len(data), chunk):
+        os.write(master, data[start:start + chunk])
+        delay = t0 + (start + chunk) * seconds_per_byte - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--ports", type=int, default=12)
+    ap.add_argument("--lines", type=int, default=20000, help="lines per port")
+    ap.add_argument("--rate", type=float, default=0, help="lines/s per port (0 = as fast as possible)")
+    args = ap.parse_args()
+
+    data = meter_output(args.lines)
+    pairs = []
+    for _ in range(args.ports):
+        master, slave = os.openpty()
+        tty.setraw(slave)
+        pairs.append((master, slave))
+    ports = {"pzem-%02d" % i: os.ttyname(slave) for i, (_, slave) in enumerate(pairs)}
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        logger = file2.MultiPortLogger(ports, out_dir=out_dir, stats_every=0)
+        stop = threading.Event()
+        thread = threading.Thread(target=logger.run, args=(stop,))
+        thread.start()
+        while len(logger.readers) < args.ports or not all(r.is_alive() for r in logger.readers.values()):
+            time.sleep(0.001)
+
+        total = args.ports * args.lines
+        t0 = time.perf_counter()
+        for master, _ in pairs:
+            if args.rate:
+                feeder = threading.Thread(target=paced_feed, args=(master, data, args.rate, args.lines), daemon=True)
+            else:
+                feeder = threading.Thread(target=feed, args=(master, data), daemon=True)
+            feeder.start()
+        done, last_done, last_progress = 0, -1, time.perf_counter()
+        while done < total and time.perf_counter() - last_progress < 10:  # give up after 10 s without progress
+            done = sum(s.rows_written for s in logger.port_stats.values()) + \
+                sum(r.lines_dropped for r in logger.readers.values())
+            if done != last_done:
+                last_done, last_progress = done, time.perf_counter()
+            time.sleep(0.001)
+        elapsed = time.perf_counter() - t0
+        stop.set()
+        thread.join()
+
+        stats = logger.stats()
+        for device_id in ports:
+            with open(os.path.join(out_dir, device_id + ".csv"), newline='') as f:
+                rows = sum(1 for _ in f) - 1
+            assert stats[device_id]['lines_dropped'] == 0, (device_id, stats[device_id])
+            assert rows == args.lines, (device_id, rows, args.lines)
+
+    for master, slave in pairs:
+        os.close(master)
+        os.close(slave)
+    print("%d ports x %d lines: %.3f s, %.0f lines/s in total" % (args.ports, args.lines, elapsed, total / elapsed))
+
+
+if __name__ == "__main__":
+    main()
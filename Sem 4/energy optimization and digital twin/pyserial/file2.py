@@ -1,94 +1,426 @@
 import serial
+import argparse
 import csv
 import os
+import queue
 import re
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from rollups import Rollups  # noqa: E402
+from thresholds import ThresholdEngine, load_rules  # noqa: E402
+from ts_store import DEVICE_PATTERN, SeriesStore, to_float  # noqa: E402
 
 # Define the serial port and baud rate
 serial_port = 'COM3'  # Update with your serial port
 baud_rate = 115200  # Update with your baud rate
 csv_filename = 'serial_data.csv'
 
-# Check if CSV file exists, create headers if not
-file_exists = os.path.isfile(csv_filename)
+headers = ['MidPoint', 'Noise mV', 'Average Temperature (°C)', 'PZEM Voltage', 'PZEM Current', 'PZEM Power', 'PZEM Energy', 'PZEM Frequency', 'PZEM PF']
+
+# Key each column has in the "Key: value" lines sent by the board, and its column index
+serial_keys = ['MidPoint', 'Noise mV', 'Average Temperature', 'PZEM Voltage', 'PZEM Current', 'PZEM Power', 'PZEM Energy', 'PZEM Frequency', 'PZEM PF']
+key_index = {key: i for i, key in enumerate(serial_keys)}
+
+# Generic "Key: value" pattern, only needed for lines that don't start with a known key
+pair_pattern = re.compile(r'([a-zA-Z ]+): (.+)')
+
+# Write policy: flush the CSV after this many rows or this many seconds, whichever comes first
+flush_rows = 500
+flush_seconds = 1.0
+
+# Reader -> writer queue, in batches of lines (one batch per serial read)
+queue_batches = 4096
+
+
+class LineParser:
+    """
+    Keeps the latest value of every column. feed() returns the row to write for a
+    line (all columns, last known values) or None when the line is not "Key: value".
+    """
+
+    def __init__(self):
+        self.values = [''] * len(headers)
+
+    def feed(self, line):
+        key, sep, value = line.partition(': ')
+        index = key_index.get(key) if sep else None
+        if index is None:
+            match = pair_pattern.search(line)
+            if match is None:
+                return None
+            key, value = match.group(1).strip(), match.group(2)
+            index = key_index.get(key)
+        if index is not None:
+            self.values[index] = value.strip()
+        return list(self.values)
+
+
+class SerialReader(threading.Thread):
+    """
+    Reads whatever the port has buffered (instead of readline(), which reads one
+    byte at a time), splits it into lines and queues them as one batch, tagged
+    with the device id and the monotonic time of the read.
+    If the writer falls so far behind that the queue is full, the batch is dropped
+    and counted, so the serial input buffer itself never overflows.
+    """
+
+    def __init__(self, ser, lines, device_id=None):
+        super().__init__(daemon=True)
+        self.ser = ser
+        self.lines = lines
+        self.device_id = device_id
+        self.stopped = threading.Event()
+        self.lines_read = 0
+        self.lines_dropped = 0
+        self.error = None
 
-# Open CSV file in append mode ('a' to add new data)
-with open(csv_filename, 'a', newline='') as csv_file:
-    headers = ['MidPoint', 'Noise mV', 'Average Temperature (°C)', 'PZEM Voltage', 'PZEM Current', 'PZEM Power', 'PZEM Energy', 'PZEM Frequency', 'PZEM PF']
-    csv_writer = csv.DictWriter(csv_file, fieldnames=headers)
+    def run(self):
+        pending = b''
+        try:
+            while not self.stopped.is_set():
+                chunk = self.ser.read(self.ser.in_waiting or 1)
+                if not chunk:
+                    continue
+                stamp = time.monotonic()
+                batch = (pending + chunk).split(b'\n')
+                pending = batch.pop()
+                if not batch:
+                    continue
+                try:
+                    self.lines.put_nowait((self.device_id, stamp, batch))
+                    self.lines_read += len(batch)
+                except queue.Full:
+                    self.lines_dropped += len(batch)
+        except (serial.SerialException, OSError) as e:
+            self.error = str(e)  # port unplugged or closed; the other ports keep going
 
-    if not file_exists:
-        csv_writer.writeheader()  # Write headers only if the file is created newly
+    def stop(self):
+        self.stopped.set()
+        self.join()
 
-    # Create a serial object
-    ser = serial.Serial(serial_port, baud_rate, timeout=1)
 
+def write_loop(lines, write, flush, readers, stop):
+    """
+    Writer side shared by both loggers: write queued batches, flush after flush_rows
+    rows or flush_seconds, and on exit stop the readers and write what is still queued.
+    write(device_id, stamp, batch) returns the number of rows written.
+    """
+    unflushed = 0
+    last_flush = time.monotonic()
     try:
-        # Initialize variables to store MidPoint, Noise mV, Voltage, Current, and PZEM values
-        midpoint = ''
-        noise_mv = ''
-        avg_temperature = ''
-        pzem_voltage = ''
-        pzem_current = ''
-        pzem_power = ''
-        pzem_energy = ''
-        pzem_frequency = ''
-        pzem_pf = ''
-
-        while True:
-            # Read the data from the serial port
-            serial_data = ser.readline().decode('utf-8').strip()
-
-            # Use regular expressions to extract key-value pairs from the serial data
-            data_pairs = re.findall(r'([a-zA-Z ]+): (.+)', serial_data)
-
-            if data_pairs:
-                # Create a dictionary to store parsed data
-                data_dict = {key.strip(): value.strip() for key, value in data_pairs}
-
-                # Print parsed data to serial monitor for debugging
-                print("Parsed Data:", data_dict)
-
-                # Update MidPoint, Noise mV, Voltage, Current, and PZEM values if available
-                for key, value in data_dict.items():
-                    if key == 'MidPoint':
-                        midpoint = value
-                    elif key == 'Noise mV':
-                        noise_mv = value
-                    elif key == 'Average Temperature':
-                        avg_temperature = value
-                    elif key == 'PZEM Voltage':
-                        pzem_voltage = value
-                    elif key == 'PZEM Current':
-                        pzem_current = value
-                    elif key == 'PZEM Power':
-                        pzem_power = value
-                    elif key == 'PZEM Energy':
-                        pzem_energy = value
-                    elif key == 'PZEM Frequency':
-                        pzem_frequency = value
-                    elif key == 'PZEM PF':
-                        pzem_pf = value
-
-                # Prepare dictionary for CSV writing, ensuring all columns are present
-                row_data = {
-                    'MidPoint': midpoint,
-                    'Noise mV': noise_mv,
-                    'Average Temperature (°C)': avg_temperature,
-                    'PZEM Voltage': pzem_voltage,
-                    'PZEM Current': pzem_current,
-                    'PZEM Power': pzem_power,
-                    'PZEM Energy': pzem_energy,
-                    'PZEM Frequency': pzem_frequency,
-                    'PZEM PF': pzem_pf
-                }
-
-                # Write to CSV
-                csv_writer.writerow(row_data)
-                csv_file.flush()  # Flush buffer to ensure immediate writing to file
+        while not stop.is_set():
+            try:
+                unflushed += write(*lines.get(timeout=0.1))
+            except queue.Empty:
+                pass
+            now = time.monotonic()
+            if unflushed >= flush_rows or (unflushed and now - last_flush >= flush_seconds):
+                flush()
+                unflushed = 0
+                last_flush = now
 
     except KeyboardInterrupt:
         print("Keyboard Interrupt. Exiting...")
 
     finally:
-        # Close the serial port connection
-        ser.close()
+        for reader in readers:
+            reader.stop()
+        while not lines.empty():
+            write(*lines.get_nowait())
+        flush()
+
+
+def open_store(path):
+    return SeriesStore(path, columns=[(name, 'float') for name in headers])
+
+
+def feed_rows(device_id, stamp, rows, store=None, rollups=None, alerts=None):
+    """
+    Hands parsed rows to the store, the rollups and the live alerts (whichever are
+    set) as float columns, stamped with the wall-clock time of the serial read.
+    """
+    if not rows or (store is None and rollups is None and alerts is None):
+        return
+    wall = time.time() - (time.monotonic() - stamp)
+    times = [wall] * len(rows)
+    columns = {name: to_float(values) for name, values in zip(headers, zip(*rows))}
+    if store is not None:
+        store.append(device_id, times, columns)
+    if rollups is not None:
+        rollups.add(device_id, times, columns)
+    if alerts is not None:
+        alerts.check(device_id, times, columns)
+
+
+class LiveAlerts:
+    """Runs the threshold rules (thresholds.py) over each device's rows as they are written."""
+
+    def __init__(self, rules=None):
+        self.rules = rules
+        self.engines = {}
+
+    def check(self, device_id, times, columns):
+        engine = self.engines.get(device_id)
+        if engine is None:
+            engine = self.engines[device_id] = ThresholdEngine(self.rules)
+        ended = engine.feed(times, columns)
+        for event in engine.newly_active():
+            print(f"{device_id}: {event.rule} since {time.strftime('%H:%M:%S', time.localtime(event.start))}"
+                  f" ({event.channel} {event.peak:g})")
+        for event in ended:
+            print(f"{device_id}: {event.rule} ended after {event.duration:.0f}s (peak {event.peak:g})")
+
+
+class SerialLogger:
+    """
+    Serial port -> reader thread -> bounded queue -> batched CSV writes
+    (or, with store_path, appends to a partitioned ts_store under device_id).
+    rollups (rollups.Rollups) and alerts (LiveAlerts) are updated with every batch.
+    """
+
+    def __init__(self, port=serial_port, baud=baud_rate, csv_path=csv_filename, verbose=False,
+                 store_path=None, device_id='meter', alerts=None, rollups=None):
+        self.port = port
+        self.baud = baud
+        self.csv_path = csv_path
+        self.verbose = verbose
+        self.store_path = store_path
+        self.device_id = device_id
+        self.rows_written = 0
+        self.reader = None
+        self.parser = LineParser()
+        self.csv_writer = None
+        self.store = None
+        self.alerts = alerts
+        self.rollups = rollups
+
+    def _write(self, device_id, stamp, batch):
+        rows = []
+        for raw in batch:
+            row = self.parser.feed(raw.decode('utf-8', 'replace').strip())
+            if row is not None:
+                rows.append(row)
+                if self.verbose:
+                    # Print parsed data for debugging
+                    print("Parsed Data:", dict(zip(headers, row)))
+        if self.store is None:
+            self.csv_writer.writerows(rows)
+        feed_rows(self.device_id, stamp, rows, self.store, self.rollups, self.alerts)
+        self.rows_written += len(rows)
+        return len(rows)
+
+    def run(self, stop=None):
+        """Logs until KeyboardInterrupt (or until the optional stop event is set)."""
+        if self.store_path:
+            self.store = open_store(self.store_path)
+            try:
+                self._log(self.store.flush, stop)
+            finally:
+                self.store.close()
+            return
+
+        # Check if CSV file exists, create headers if not
+        file_exists = os.path.isfile(self.csv_path)
+
+        # Open CSV file in append mode ('a' to add new data)
+        with open(self.csv_path, 'a', newline='') as csv_file:
+            self.csv_writer = csv.writer(csv_file)
+            if not file_exists:
+                self.csv_writer.writerow(headers)  # Write headers only if the file is created newly
+            self._log(csv_file.flush, stop)
+
+    def _log(self, flush, stop):
+        ser = serial.Serial(self.port, self.baud, timeout=0.1)
+        lines = queue.Queue(maxsize=queue_batches)
+        self.reader = SerialReader(ser, lines)
+        self.reader.start()
+
+        def flush_all():
+            flush()
+            if self.rollups is not None:
+                self.rollups.save()
+
+        try:
+            write_loop(lines, self._write, flush_all, [self.reader], stop or threading.Event())
+        finally:
+            # Close the serial port connection
+            ser.close()
+            print(f"{self.rows_written} rows written, {self.reader.lines_dropped} lines dropped")
+
+
+class PortStats:
+    __slots__ = ('rows_written', 'lag_last', 'lag_max', 'lag_sum', 'batches', 'error')
+
+    def __init__(self):
+        self.rows_written = 0
+        self.lag_last = self.lag_max = self.lag_sum = 0.0
+        self.batches = 0
+        self.error = None  # why the port could not be opened
+
+
+class MultiPortLogger:
+    """
+    Many serial ports at once: one reader thread per port, one shared bounded queue
+    and one writer. Every row is tagged with its device id and the monotonic time
+    of the serial read that delivered it, and goes to <out_dir>/<device_id>.csv
+    (or, with store_path, to the device's partitions in a ts_store).
+    Per port it counts lines read, lines dropped and rows written, and tracks the
+    lag between the read and the write (last, mean, max). A port that fails to
+    open, or fails later, only stops its own reader; the error shows in stats().
+    """
+
+    def __init__(self, ports, baud=baud_rate, out_dir='.', stats_every=10.0, store_path=None, alerts=None,
+                 rollups=None):
+        self.ports = dict(ports)  # device id -> serial port
+        self.baud = baud
+        self.out_dir = out_dir
+        self.store_path = store_path
+        self.store = None
+        self.alerts = alerts
+        self.rollups = rollups
+        self.stats_every = stats_every
+        self.readers = {}
+        self.port_stats = {device_id: PortStats() for device_id in self.ports}
+        self.parsers = {device_id: LineParser() for device_id in self.ports}
+        self.csv_writers = {}
+        self._last_report = time.monotonic()
+
+    def _write(self, device_id, stamp, batch):
+        parser = self.parsers[device_id]
+        rows = []
+        for raw in batch:
+            row = parser.feed(raw.decode('utf-8', 'replace').strip())
+            if row is not None:
+                rows.append(row)
+        if self.store is None:
+            self.csv_writers[device_id].writerows([device_id, f"{stamp:.6f}"] + row for row in rows)
+        feed_rows(device_id, stamp, rows, self.store, self.rollups, self.alerts)
+        lag = time.monotonic() - stamp
+        stats = self.port_stats[device_id]
+        stats.rows_written += len(rows)
+        stats.lag_last = lag
+        stats.lag_max = max(stats.lag_max, lag)
+        stats.lag_sum += lag
+        stats.batches += 1
+        if self.stats_every and stamp - self._last_report >= self.stats_every:
+            self._last_report = stamp
+            self.report()
+        return len(rows)
+
+    def stats(self):
+        out = {}
+        for device_id, stats in self.port_stats.items():
+            reader = self.readers.get(device_id)
+            out[device_id] = {
+                'port': self.ports[device_id],
+                'lines_read': reader.lines_read if reader else 0,
+                'lines_dropped': reader.lines_dropped if reader else 0,
+                'rows_written': stats.rows_written,
+                'lag_last_ms': round(stats.lag_last * 1000, 3),
+                'lag_mean_ms': round(stats.lag_sum / stats.batches * 1000, 3) if stats.batches else None,
+                'lag_max_ms': round(stats.lag_max * 1000, 3),
+                'error': reader.error if reader else stats.error,
+            }
+        return out
+
+    def report(self):
+        for device_id, s in self.stats().items():
+            print(f"{device_id} ({s['port']}): {s['rows_written']} rows, {s['lines_dropped']} dropped, "
+                  f"lag {s['lag_last_ms']} ms (mean {s['lag_mean_ms']}, max {s['lag_max_ms']} ms)" + (f", error: {s['error']}" if s['error'] else ""))
+
+    def run(self, stop=None):
+        """Logs all ports until KeyboardInterrupt (or until the optional stop event is set)."""
+        files, sers = [], []
+        try:
+            if self.store_path:
+                self.store = open_store(self.store_path)
+            else:
+                os.makedirs(self.out_dir, exist_ok=True)
+            for device_id in (self.ports if self.store is None else []):
+                path = os.path.join(self.out_dir, f"{device_id}.csv")
+                file_exists = os.path.isfile(path)
+                csv_file = open(path, 'a', newline='')
+                files.append(csv_file)
+                self.csv_writers[device_id] = csv.writer(csv_file)
+                if not file_exists:
+                    self.csv_writers[device_id].writerow(['Device', 'Monotonic Time (s)'] + headers)
+
+            lines = queue.Queue(maxsize=queue_batches)
+            for device_id, port in self.ports.items():
+                try:
+                    ser = serial.Serial(port, self.baud, timeout=0.1)
+                except (serial.SerialException, OSError, ValueError) as e:
+                    self.port_stats[device_id].error = str(e)
+                    print(f"{device_id} ({port}): could not open: {e}")
+                    continue
+                sers.append(ser)
+                self.readers[device_id] = SerialReader(ser, lines, device_id)
+            if not self.readers:
+                raise serial.SerialException("none of the ports could be opened")
+            for reader in self.readers.values():
+                reader.start()
+
+            def flush():
+                for csv_file in files:
+                    csv_file.flush()
+                if self.store is not None:
+                    self.store.flush()
+                if self.rollups is not None:
+                    self.rollups.save()
+
+            write_loop(lines, self._write, flush, list(self.readers.values()), stop or threading.Event())
+        finally:
+            for ser in sers:
+                ser.close()
+            for csv_file in files:
+                csv_file.close()
+            if self.store is not None:
+                self.store.close()
+            self.report()
+
+
+def parse_ports(specs):
+    """["meter1=COM3", "meter2=/dev/ttyUSB1", ...] -> {device id: port}"""
+    ports = {}
+    for spec in specs:
+        device_id, sep, port = spec.partition('=')
+        if not sep or not device_id or not port:
+            raise ValueError(f"expected DEVICE=PORT, got {spec!r}")
+        if device_id in ports:
+            raise ValueError(f"device id used twice: {device_id}")
+        if not DEVICE_PATTERN.match(device_id):
+            raise ValueError(f"device id may only use letters, digits, '_', '.' and '-': {device_id!r}")
+        ports[device_id] = port
+    return ports
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Log the board's serial output to CSV")
+    ap.add_argument("--port", default=serial_port)
+    ap.add_argument("--baud", type=int, default=baud_rate)
+    ap.add_argument("--csv", default=csv_filename)
+    ap.add_argument("--verbose", action="store_true", help="print every parsed row")
+    ap.add_argument("--ports", nargs="+", metavar="DEVICE=PORT",
+                    help="log several ports at once, one CSV per device in --out-dir")
+    ap.add_argument("--out-dir", default="meters")
+    ap.add_argument("--stats-every", type=float, default=10.0, help="seconds between per-port reports")
+    ap.add_argument("--store", help="append to this partitioned store (see ts_store.py) instead of CSV")
+    ap.add_argument("--device", default="meter", help="device name in the store (single port)")
+    ap.add_argument("--alerts", action="store_true", help="print threshold events as they start and end")
+    ap.add_argument("--rules", help="JSON rules file for --alerts (default: thresholds.DEFAULT_RULES)")
+    ap.add_argument("--rollups", help="keep 1 min/15 min/1 h/1 day rollups in this folder (see rollups.py)")
+    args = ap.parse_args()
+    alerts = LiveAlerts(load_rules(args.rules) if args.rules else None) if args.alerts or args.rules else None
+    rollups = Rollups(args.rollups) if args.rollups else None
+
+    if args.ports:
+        try:
+            ports = parse_ports(args.ports)
+        except ValueError as e:
+            ap.error(str(e))
+        MultiPortLogger(ports, args.baud, args.out_dir, args.stats_every, args.store, alerts, rollups).run()
+    else:
+        SerialLogger(args.port, args.baud, args.csv, args.verbose, args.store, args.device, alerts, rollups).run()
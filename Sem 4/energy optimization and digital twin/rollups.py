@@ -0,0 +1,316 @@
+# ---------------------------------------------------------------------------
+# Pre-aggregated rollups of the PZEM channels for the dashboards
+#
+# Per device, at 1 min, 15 min, 1 h and 1 day: reading count, and per channel
+# min / max / sum / valid count (mean = sum / count), plus the energy used in
+# the bucket (sum of the PZEM Energy counter's increments).
+#
+# Layout:  <root>/<level>/     a ts_store per level, one row per finished bucket
+#          <root>/state.json   the bucket still being filled, per device and level
+#
+# add() aggregates each chunk of readings with NumPy, merges it into the open
+# bucket and writes the buckets that are complete. Readings that arrive late for
+# an already written bucket become an extra partial row, merged when read.
+# save() writes state.json before flushing the finished buckets, so a crash in
+# between can lose those buckets but never counts an open bucket twice.
+# query() picks the finest level that fits a point budget, so a year of data
+# comes back as a few hundred rows read from one partition.
+# ---------------------------------------------------------------------------
+import argparse
+import calendar
+import json
+import math
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+
+from ts_store import SeriesStore, default_store_path, to_float
+
+RESOLUTIONS = [('1min', 60), ('15min', 900), ('1h', 3600), ('1d', 86400)]
+# Partition length of each level's store (a few thousand buckets per partition)
+LEVEL_PARTITION_SECONDS = {60: 86400, 900: 30 * 86400, 3600: 180 * 86400, 86400: 3650 * 86400}
+CHANNELS = ['PZEM Voltage', 'PZEM Current', 'PZEM Power', 'PZEM Energy']
+ENERGY_CHANNEL = 'PZEM Energy'
+STATS = ['min', 'max', 'sum', 'n']
+
+# How partial rows of the same bucket combine
+REDUCERS = {'count': np.add, 'min': np.fmin, 'max': np.fmax, 'sum': np.add, 'n': np.add, 'energy': np.add}
+
+
+def merge(part):
+    """Partial rows {'key', 'count', 'min', 'max', 'sum', 'n', 'energy'} -> one row per bucket key, in key order."""
+    keys = part['key']
+    if len(keys) > 1 and np.any(keys[1:] < keys[:-1]):
+        order = np.argsort(keys, kind='stable')
+        part = {name: values[order] for name, values in part.items()}
+        keys = part['key']
+    first = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else keys
+    if len(first) == len(keys):
+        return part
+    merged = {'key': keys[first]}
+    merged.update({name: REDUCERS[name].reduceat(part[name], first, axis=0) for name in REDUCERS})
+    return merged
+
+
+def concat(parts):
+    return {name: np.concatenate([p[name] for p in parts]) for name in parts[0]}
+
+
+def take(part, index):
+    return {name: values[index] for name, values in part.items()}
+
+
+class _Level:
+    """One resolution: its store of finished buckets and each device's open bucket."""
+
+    def __init__(self, root, name, seconds, channels):
+        self.name = name
+        self.seconds = seconds
+        self.channels = channels
+        self.columns = ['count', 'energy'] + [f"{c} {s}" for c in channels for s in STATS]
+        self.store = SeriesStore(os.path.join(root, name), columns=[(c, 'float') for c in self.columns],
+                                 partition_seconds=LEVEL_PARTITION_SECONDS[seconds])
+        self.open = {}  # device -> partial row of the newest bucket
+        self.written = {}  # device -> newest bucket key handed to the store
+
+    def add(self, device, times, rows):
+        keys = (times // self.seconds).astype(np.int64)
+        part = merge(dict(rows, key=keys))
+        if device in self.open:
+            part = merge(concat([self.open[device], part]))
+        # The newest bucket stays open; everything before it is complete
+        self.open[device] = take(part, slice(-1, None))
+        if len(part['key']) > 1:
+            self._write(device, take(part, slice(0, -1)))
+
+    def _write(self, device, part):
+        columns = {'count': part['count'], 'energy': part['energy']}
+        for j, channel in enumerate(self.channels):
+            for stat in STATS:
+                columns[f"{channel} {stat}"] = part[stat][:, j]
+        self.store.append(device, part['key'] * float(self.seconds), columns)
+        self.written[device] = max(self.written.get(device, -1), int(part['key'].max()))
+
+    def read(self, device, start=None, end=None):
+        """Merged rows for the buckets starting in [start, end), the open one included."""
+        lo = None if start is None else start // self.seconds * self.seconds
+        arrays = self.store.read_arrays(self.columns, lo, end, devices=[device])
+        n, c = len(arrays['time']), len(self.channels)
+        part = {'key': np.round(arrays['time'] / self.seconds).astype(np.int64),
+                'count': arrays['count'], 'energy': arrays['energy']}
+        for stat in STATS:
+            part[stat] = np.column_stack([arrays[f"{ch} {stat}"] for ch in self.channels]) if n else np.empty((0, c))
+        current = self.open.get(device)
+        if current is not None:
+            t = current['key'][0] * self.seconds
+            if (lo is None or t >= lo) and (end is None or t < end):
+                part = concat([part, current])
+        return merge(part)
+
+    def state(self):
+        return {device: {name: values.tolist() for name, values in row.items()} for device, row in self.open.items()}
+
+    def load_state(self, state, written):
+        self.open = {device: {name: np.asarray(values, dtype=np.int64 if name == 'key' else float)
+                              for name, values in row.items()} for device, row in state.items()}
+        self.written = dict(written)
+        for device, key in self.written.items():
+            stored = self.store.time_range(device)
+            if stored is None or stored[1] < key * self.seconds:
+                warnings.warn(f"{self.name} rollups of {device} lost the buckets being flushed when the "
+                              f"process stopped; rebuild with 'rollups.py build' to recover them")
+
+
+class Rollups:
+    """
+    Rollups under root, updated with add(device, times, columns) as readings come
+    in (the same call as SeriesStore.append). save() writes the open buckets and
+    then the finished ones; call it when the logger flushes.
+    """
+
+    def __init__(self, root, channels=None):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.state_path = os.path.join(root, 'state.json')
+        state = {}
+        if os.path.isfile(self.state_path):
+            with open(self.state_path, encoding='utf-8') as f:
+                state = json.load(f)
+        self.channels = state.get('channels') or list(CHANNELS if channels is None else channels)
+        self.levels = [_Level(root, name, seconds, self.channels) for name, seconds in RESOLUTIONS]
+        for level in self.levels:
+            level.load_state(state.get('open', {}).get(level.name, {}), state.get('written', {}).get(level.name, {}))
+        self._last_energy = state.get('last_energy', {})
+
+    def add(self, device, times, columns):
+        times = np.asarray(times, dtype=float)
+        if not len(times):
+            return
+        n = len(times)
+        X = np.column_stack([to_float(columns[c]) if c in columns else np.full(n, np.nan) for c in self.channels])
+        if np.any(times[1:] < times[:-1]):
+            order = np.argsort(times, kind='stable')
+            times, X = times[order], X[order]
+        valid = ~np.isnan(X)
+        rows = {
+            'count': np.ones(n),
+            'min': X,
+            'max': X,
+            'sum': np.where(valid, X, 0.0),
+            'n': valid.astype(float),
+            'energy': self._energy_used(device, X[:, self.channels.index(ENERGY_CHANNEL)])
+            if ENERGY_CHANNEL in self.channels else np.zeros(n),
+        }
+        for level in self.levels:
+            level.add(device, times, rows)
+
+    def _energy_used(self, device, energy):
+        """Per-reading increments of the energy counter (a counter reset counts the new reading)."""
+        used = np.zeros(len(energy))
+        valid = np.flatnonzero(~np.isnan(energy))
+        if len(valid):
+            e = energy[valid]
+            step = np.diff(e, prepend=self._last_energy.get(device, e[0]))
+            used[valid] = np.where(step < 0, e, step)
+            self._last_energy[device] = float(e[-1])
+        return used
+
+    def save(self):
+        # state.json first: if the process dies before the flush below, the finished
+        # buckets are lost, instead of an old open bucket being loaded next to the
+        # finished bucket it grew into, which would count its readings twice
+        state = {
+            'channels': self.channels,
+            'open': {level.name: level.state() for level in self.levels},
+            'written': {level.name: level.written for level in self.levels},
+            'last_energy': self._last_energy,
+        }
+        tmp = self.state_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp, self.state_path)
+        for level in self.levels:
+            level.store.flush()
+
+    close = save
+
+    def devices(self):
+        return sorted(set(self.levels[0].store.devices()) | set(self.levels[0].open))
+
+    def time_range(self, device):
+        """(first, last) bucket start at 1 min resolution, or None for an unknown device."""
+        level = self.levels[0]
+        ends = []
+        stored = level.store.time_range(device)
+        if stored is not None:
+            ends += stored
+        if device in level.open:
+            ends.append(float(level.open[device]['key'][0] * level.seconds))
+        return (min(ends), max(ends)) if ends else None
+
+    def resolution_for(self, start, end, max_points):
+        """The finest level with at most max_points buckets between start and end (else the coarsest)."""
+        for level in self.levels:
+            if math.ceil((end - start) / level.seconds) <= max_points:
+                return level
+        return self.levels[-1]
+
+    def query(self, device, start=None, end=None, max_points=1000, resolution=None):
+        """
+        Buckets of one device between start and end (epoch seconds, default: all of it),
+        at the given resolution name or the finest one that fits max_points:
+        {'device', 'resolution', 'seconds', 'time', 'count', 'energy', 'channels': {name: {'min', 'max', 'mean'}}}
+        """
+        span = self.time_range(device)
+        if span is None:
+            raise KeyError(device)
+        lo = span[0] if start is None else start
+        hi = span[1] + 60 if end is None else end
+        if resolution is None:
+            level = self.resolution_for(lo, hi, max_points)
+        else:
+            level = next((lv for lv in self.levels if lv.name == resolution), None)
+            if level is None:
+                raise ValueError(f"unknown resolution {resolution!r} (one of {[n for n, _ in RESOLUTIONS]})")
+        part = level.read(device, start, end)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = part['sum'] / part['n']
+        return {
+            'device': device,
+            'resolution': level.name,
+            'seconds': level.seconds,
+            'time': part['key'] * float(level.seconds),
+            'count': part['count'],
+            'energy': part['energy'],
+            'channels': {c: {'min': part['min'][:, j], 'max': part['max'][:, j], 'mean': mean[:, j]}
+                         for j, c in enumerate(self.channels)},
+        }
+
+
+def build(store, rollups, chunk_seconds=86400):
+    """Feeds a whole ts_store through rollups, a day of readings at a time per device."""
+    rows = 0
+    for device in store.devices():
+        channels = [c for c in rollups.channels if c in store.columns]
+        lo, hi = store.time_range(device)
+        hi = np.nextafter(hi, np.inf)
+        t = lo
+        while t < hi:
+            arrays = store.read_arrays(channels, t, min(t + chunk_seconds, hi), devices=[device])
+            rollups.add(device, arrays['time'], arrays)
+            rows += len(arrays['time'])
+            t += chunk_seconds
+    rollups.save()
+    return rows
+
+
+def _json_values(values):
+    return [None if v != v else v for v in values.tolist()]  # NaN (no valid reading) -> null
+
+
+def default_rollups_path(csv_path):
+    return os.path.splitext(csv_path)[0] + '_rollups'
+
+
+def parse_time(text):
+    return None if text is None else calendar.timegm(time.strptime(text, '%Y-%m-%dT%H:%M:%S'))
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Build or query the rollups of the logged readings")
+    sub = ap.add_subparsers(dest="command", required=True)
+    b = sub.add_parser("build", help="roll up an existing store (see ts_store.py) from scratch")
+    b.add_argument("csv", nargs="?", default="serial_data.csv", help="uses <csv name>_store/")
+    b.add_argument("--rollups", help="default: <csv name>_rollups/")
+    q = sub.add_parser("query")
+    q.add_argument("device")
+    q.add_argument("csv", nargs="?", default="serial_data.csv", help="uses <csv name>_rollups/")
+    q.add_argument("--rollups", help="default: <csv name>_rollups/")
+    q.add_argument("--start", help="UTC, e.g. 2024-01-01T00:00:00")
+    q.add_argument("--end")
+    q.add_argument("--points", type=int, default=1000, help="point budget")
+    q.add_argument("--resolution", choices=[n for n, _ in RESOLUTIONS])
+    args = ap.parse_args()
+
+    target = args.rollups or default_rollups_path(args.csv)
+    t0 = time.perf_counter()
+    if args.command == "build":
+        if os.path.exists(target):
+            raise SystemExit(f"{target} already exists; remove it to rebuild")
+        rows = build(SeriesStore(default_store_path(args.csv)), Rollups(target))
+        print(f"{rows} readings rolled up into {target} in {time.perf_counter() - t0:.2f}s")
+    else:
+        try:
+            result = Rollups(target).query(args.device, parse_time(args.start), parse_time(args.end),
+                                           args.points, args.resolution)
+        except KeyError:
+            raise SystemExit(f"no rollups for device {args.device!r} in {target}")
+        elapsed = time.perf_counter() - t0
+        out = {name: result[name] for name in ('device', 'resolution', 'seconds')}
+        out.update({name: _json_values(result[name]) for name in ('time', 'count', 'energy')})
+        out['channels'] = {c: {s: _json_values(v) for s, v in stats.items()} for c, stats in result['channels'].items()}
+        print(json.dumps(out))
+        print(f"{len(result['time'])} points at {result['resolution']} in {elapsed * 1000:.1f} ms", file=sys.stderr)
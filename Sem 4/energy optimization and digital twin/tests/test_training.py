@@ -0,0 +1,52 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), 'ml model'))
+
+from training import TrainingCancelled, TrainingJob, scaler_path, train  # noqa: E402
+
+CSV = os.path.join(os.path.dirname(HERE), 'ml model', 'serial_data.csv')
+
+
+class TrainCancelTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.model_path = os.path.join(self.tmp.name, 'model.pkl')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_cancel_before_saving_leaves_no_model(self):
+        with self.assertRaises(TrainingCancelled):
+            train(CSV, self.model_path, learner='hgb', begin_saving=lambda: False)
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    def test_stop_after_saving_began_still_completes(self):
+        saving = []
+        result = train(CSV, self.model_path, learner='hgb', should_stop=lambda: bool(saving),
+                       begin_saving=lambda: saving.append(True) or True)
+        self.assertEqual(result.model_path, self.model_path)
+        self.assertTrue(os.path.exists(self.model_path))
+        self.assertTrue(os.path.exists(scaler_path(self.model_path)))
+
+    def test_job_cancelled_right_away_leaves_no_model(self):
+        job = TrainingJob(CSV, self.model_path, learner='hgb').start()
+        job.cancel()
+        self.assertEqual(job.status, 'cancelled')
+        self.assertFalse(os.path.exists(self.model_path))
+
+    def test_job_cancelled_while_saving_reports_what_is_on_disk(self):
+        job = TrainingJob(CSV, self.model_path, learner='hgb').start()
+        while job.poll() and job.message != "Saving model":
+            time.sleep(0.01)
+        job.cancel()
+        self.assertIn(job.status, ('done', 'cancelled'))
+        self.assertEqual(job.status == 'done', os.path.exists(self.model_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ts_store import convert_csv, current_store  # noqa: E402
+
+
+class ConvertCsvTest(unittest.TestCase):
+    def test_converting_twice_replaces_the_store(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_path = os.path.join(tmp, 'serial_data.csv')
+            with open(csv_path, 'w') as f:
+                f.write('PZEM Voltage,PZEM Current\n')
+                f.writelines(f'{230 + i % 5},{i % 3}\n' for i in range(5000))
+            store_path = os.path.join(tmp, 'serial_data_store')
+            convert_csv(csv_path, store_path, chunk_rows=1000)
+            store, rows = convert_csv(csv_path, store_path, chunk_rows=1000)
+
+            self.assertEqual(rows, 5000)
+            arrays = store.read_arrays()
+            self.assertEqual(len(arrays['time']), 5000)
+            self.assertTrue(np.all(np.diff(arrays['time']) > 0))
+            self.assertTrue(all(info['sorted'] for parts in store.meta['partitions'].values()
+                                for info in parts.values()))
+            self.assertEqual(sorted(os.listdir(tmp)), ['serial_data.csv', 'serial_data_store'])
+            self.assertIsNotNone(current_store(csv_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
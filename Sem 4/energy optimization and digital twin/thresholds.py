@@ -0,0 +1,261 @@
+# ---------------------------------------------------------------------------
+# Threshold events over the PZEM channels
+#
+# A rule goes active when its channel crosses `threshold` and stays active until
+# the channel comes back past `clear` (hysteresis, so a reading hovering around
+# the threshold gives one event instead of hundreds). Intervals shorter than
+# `min_duration` seconds are dropped.
+#
+# Every chunk of readings is scanned with NumPy, and the per-rule state carries
+# over from one chunk to the next. The same engine therefore handles a whole
+# history (batch) and a live stream fed a few rows at a time, and both give the
+# same events.
+# ---------------------------------------------------------------------------
+import argparse
+import json
+
+import numpy as np
+
+from ts_store import current_store
+
+
+class Rule:
+    __slots__ = ('name', 'channel', 'threshold', 'clear', 'above', 'min_duration')
+
+    def __init__(self, name, channel, threshold, clear=None, above=True, min_duration=0.0):
+        self.name = name
+        self.channel = channel
+        self.threshold = float(threshold)
+        self.clear = float(threshold if clear is None else clear)
+        self.above = above
+        self.min_duration = float(min_duration)
+        if (self.clear > self.threshold) if above else (self.clear < self.threshold):
+            raise ValueError(f"{name}: clear level must be on the normal side of the threshold")
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+# The three checks from highpower.py, plus the other PZEM channels
+DEFAULT_RULES = [
+    Rule('High Voltage', 'PZEM Voltage', 240, clear=238, min_duration=2),
+    Rule('Low Voltage', 'PZEM Voltage', 200, clear=205, above=False, min_duration=2),
+    Rule('High Current', 'PZEM Current', 150, clear=145, min_duration=2),
+    Rule('High Power', 'PZEM Power', 100, clear=95, min_duration=2),
+    Rule('High Frequency', 'PZEM Frequency', 50.5, clear=50.4, min_duration=2),
+    Rule('Low Frequency', 'PZEM Frequency', 49.5, clear=49.6, above=False, min_duration=2),
+    Rule('Low Power Factor', 'PZEM PF', 0.8, clear=0.85, above=False, min_duration=10),
+]
+
+
+def load_rules(path):
+    """Rules from a JSON list of {"name", "channel", "threshold", "clear", "above", "min_duration"}."""
+    with open(path, encoding='utf-8') as f:
+        return [Rule(**spec) for spec in json.load(f)]
+
+
+class Event:
+    __slots__ = ('rule', 'channel', 'start', 'end', 'peak', 'samples')
+
+    def __init__(self, rule, channel, start, end, peak, samples):
+        self.rule = rule
+        self.channel = channel
+        self.start = start
+        self.end = end  # time of the first reading back past the clear level (None while active)
+        self.peak = peak  # highest value (lowest, for an "below" rule) during the event
+        self.samples = samples
+
+    @property
+    def duration(self):
+        return None if self.end is None else self.end - self.start
+
+    def to_dict(self):
+        return {'rule': self.rule, 'channel': self.channel, 'start': self.start, 'end': self.end,
+                'duration': self.duration, 'peak': self.peak, 'samples': self.samples}
+
+    def __repr__(self):
+        return f"Event({self.rule!r}, start={self.start}, end={self.end}, peak={self.peak})"
+
+
+class _RuleState:
+    __slots__ = ('active', 'start', 'peak', 'samples', 'last_time', 'reported')
+
+    def __init__(self):
+        self.active = False
+        self.start = self.peak = self.last_time = None
+        self.samples = 0
+        self.reported = False
+
+
+def scan(rule, state, times, values):
+    """
+    Events of one rule that end within this chunk, as parallel arrays
+    (start, end, peak, samples), and the rule's state updated to the chunk's end.
+    NaN readings leave the state as it was.
+    """
+    n = len(values)
+    if rule.above:
+        x, threshold, clear = values, rule.threshold, rule.clear
+    else:  # mirror "below" rules so the rest is written once
+        x, threshold, clear = -values, -rule.threshold, -rule.clear
+    on_set = x > threshold
+    decisive = np.flatnonzero(on_set | (x < clear))  # readings that set or clear the rule
+
+    # The state flips wherever a decisive reading disagrees with the one before it
+    kinds = on_set[decisive]
+    prev = np.empty(len(kinds), dtype=bool)
+    prev[:1] = state.active
+    prev[1:] = kinds[:-1]
+    starts = decisive[kinds & ~prev]
+    ends = decisive[~kinds & prev]
+    if state.active:
+        starts = np.r_[0, starts]  # the run carried over from the previous chunk
+    closed = len(ends)
+    still_active = len(starts) > closed
+
+    # Peak of each run: max over [start, end), the open run (if any) reducing to the chunk's end
+    bounds = np.empty(2 * closed + still_active, dtype=np.intp)
+    bounds[0:2 * closed:2] = starts[:closed]
+    bounds[1:2 * closed:2] = ends
+    if still_active:
+        bounds[-1] = starts[-1]
+    peaks = np.fmax.reduceat(x, bounds)[::2] if len(bounds) else np.empty(0)
+    counts = np.r_[ends, n][:len(starts)] - starts
+    start_times = times[starts].astype(float)
+    if state.active:
+        start_times[0] = state.start
+        peaks[0] = np.fmax(peaks[0], state.peak if rule.above else -state.peak)
+        counts[0] += state.samples
+    if not rule.above:
+        peaks = -peaks
+
+    out = (start_times[:closed], times[ends].astype(float), peaks[:closed], counts[:closed])
+    if still_active:
+        if not state.active or closed:
+            state.reported = False
+        state.active = True
+        state.start = float(start_times[-1])
+        state.peak = float(peaks[-1])
+        state.samples = int(counts[-1])
+    else:
+        state.active = False
+        state.start = state.peak = None
+        state.samples = 0
+        state.reported = False
+    state.last_time = float(times[-1])
+    return out
+
+
+class ThresholdEngine:
+    """
+    Runs a set of rules over readings fed in time order. feed() returns the events
+    that ended in that chunk; newly_active() returns the ones that have been running
+    for at least their min_duration and were not reported yet (for live alerts).
+    """
+
+    def __init__(self, rules=None):
+        self.rules = list(DEFAULT_RULES if rules is None else rules)
+        self._states = [_RuleState() for _ in self.rules]
+
+    @property
+    def channels(self):
+        return sorted({rule.channel for rule in self.rules})
+
+    def feed(self, times, columns):
+        """times: seconds, increasing; columns: {channel: values}. Channels without a rule are ignored."""
+        times = np.asarray(times, dtype=float)
+        if not len(times):
+            return []
+        events = []
+        for rule, state in zip(self.rules, self._states):
+            values = columns.get(rule.channel)
+            if values is None:
+                continue
+            starts, ends, peaks, counts = scan(rule, state, times, np.asarray(values, dtype=float))
+            keep = np.flatnonzero(ends - starts >= rule.min_duration)
+            events.extend(Event(rule.name, rule.channel, float(starts[i]), float(ends[i]),
+                                float(peaks[i]), int(counts[i])) for i in keep)
+        events.sort(key=lambda e: e.start)
+        return events
+
+    def active(self):
+        """Events still running, whatever their duration so far (end is None)."""
+        return [Event(rule.name, rule.channel, state.start, None, state.peak, state.samples)
+                for rule, state in zip(self.rules, self._states) if state.active]
+
+    def newly_active(self):
+        out = []
+        for rule, state in zip(self.rules, self._states):
+            if state.active and not state.reported and state.last_time - state.start >= rule.min_duration:
+                state.reported = True
+                out.append(Event(rule.name, rule.channel, state.start, None, state.peak, state.samples))
+        return out
+
+
+def detect(times, columns, rules=None):
+    """Batch mode: all events in one history, the still-active ones last with end=None."""
+    engine = ThresholdEngine(rules)
+    return engine.feed(times, columns) + engine.active()
+
+
+def scan_store(store, rules=None, start=None, end=None, chunk_seconds=86400):
+    """{device: events} for a ts_store, a day of readings at a time per device."""
+    out = {}
+    rules = list(DEFAULT_RULES if rules is None else rules)
+    for device in store.devices():
+        engine = ThresholdEngine(rules)
+        channels = [c for c in engine.channels if c in store.columns]
+        lo, hi = store.time_range(device)
+        lo = lo if start is None else max(lo, start)
+        hi = np.nextafter(hi, np.inf) if end is None else min(hi, end)  # read_arrays stops before its end
+        events = []
+        t = lo
+        while t < hi:
+            arrays = store.read_arrays(channels, t, min(t + chunk_seconds, hi), devices=[device])
+            events += engine.feed(arrays['time'], arrays)
+            t += chunk_seconds
+        out[device] = events + engine.active()
+    return out
+
+
+def scan_csv(csv_path, rules=None, chunk_rows=1000000, interval=1.0):
+    """Events in a logged CSV, read in chunks. Rows are stamped row * interval (the CSV has no time column)."""
+    from pandas import read_csv
+    engine = ThresholdEngine(rules)
+    events = []
+    offset = 0
+    for chunk in read_csv(csv_path, encoding='unicode_escape', chunksize=chunk_rows,
+                          usecols=lambda name: name in engine.channels):
+        times = (offset + np.arange(len(chunk))) * interval
+        offset += len(chunk)
+        events += engine.feed(times, {name: chunk[name].to_numpy(dtype=float) for name in chunk.columns})
+    return events + engine.active()
+
+
+def print_events(events, label=""):
+    print(f"{label}{len(events)} events")
+    for e in events:
+        end = "active" if e.end is None else f"{e.end:.0f}"
+        duration = "" if e.end is None else f"{e.duration:.0f}s"
+        print(f"  {e.rule:<18} {e.start:>12.0f} -> {end:>12} {duration:>8}  peak {e.peak:g}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="List threshold events in the logged readings")
+    ap.add_argument("csv", nargs="?", default="serial_data.csv",
+                    help="reads <csv name>_store/ instead when it is up to date")
+    ap.add_argument("--rules", help="JSON file of rules (default: DEFAULT_RULES)")
+    ap.add_argument("--json", action="store_true", help="print the events as JSON")
+    args = ap.parse_args()
+
+    rules = load_rules(args.rules) if args.rules else None
+    store = current_store(args.csv)
+    if store is not None:
+        by_device = scan_store(store, rules)
+    else:
+        by_device = {'csv': scan_csv(args.csv, rules)}
+    if args.json:
+        print(json.dumps({d: [e.to_dict() for e in events] for d, events in by_device.items()}, indent=2))
+    else:
+        for device, events in by_device.items():
+            print_events(events, f"{device}: ")
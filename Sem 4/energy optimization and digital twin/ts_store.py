@@ -0,0 +1,411 @@
+# ts_store.py
+# Columnar, time-partitioned store for the logged meter readings.
+#
+# Layout:  <root>/meta.json                      schema (columns, categories, partition length)
+#          <root>/<device>/_index/<YYYYMMDD>.json index of that device's partitions on that day
+#          <root>/<device>/<YYYYMMDDTHH>/time.f8  epoch seconds (UTC), one file per hour
+#          <root>/<device>/<YYYYMMDDTHH>/c<i>.f8  column i (float64, NaN = missing)
+#          <root>/<device>/<YYYYMMDDTHH>/c<i>.i4  column i (category codes, -1 = missing)
+#
+# Every column is a flat typed file that is only ever appended to, so a reader
+# memory-maps just the columns it asks for, and the index (start, end and row
+# count per device and hour) skips every partition outside the requested time
+# range without opening it. The index is split by device and day, so a flush
+# rewrites only the days it touched, however long the history gets.
+import argparse
+import calendar
+import json
+import os
+import re
+import shutil
+import time
+import warnings
+
+import numpy as np
+
+PARTITION_SECONDS = 3600
+BUFFER_ROWS = 100000
+DEVICE_PATTERN = re.compile(r'^[A-Za-z0-9_-][A-Za-z0-9_.-]*$')
+INDEX_DIR = '_index'
+
+
+def partition_key(t, seconds=PARTITION_SECONDS):
+    """Name of the partition holding time t: the UTC hour it starts at."""
+    return time.strftime('%Y%m%dT%H', time.gmtime(t // seconds * seconds))
+
+
+def to_float(values):
+    """Numbers or numeric strings -> float64, anything unparsable ('' included) -> NaN."""
+    try:
+        return np.asarray(values, dtype=float)
+    except (TypeError, ValueError):
+        out = np.empty(len(values))
+        for i, v in enumerate(values):
+            try:
+                out[i] = float(v)
+            except (TypeError, ValueError):
+                out[i] = np.nan
+        return out
+
+
+def _write_json(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _append(path, data, rows_before):
+    with open(path, 'ab') as f:
+        if f.tell() != rows_before * data.itemsize:
+            f.truncate(rows_before * data.itemsize)  # rows from a flush that crashed before indexing them
+        f.write(data.tobytes())
+
+
+class SeriesStore:
+    """
+    columns: [(name, 'float' | 'category'), ...], only needed when creating a store,
+    as is partition_seconds (a whole number of hours; sparse data such as rollups
+    wants partitions longer than an hour). append() buffers rows in memory; flush()
+    (automatic every BUFFER_ROWS rows, and on close()) appends them to the
+    partitions and rewrites the index files of the days it touched.
+    """
+
+    def __init__(self, root, columns=None, partition_seconds=PARTITION_SECONDS):
+        self.root = root
+        self.meta_path = os.path.join(root, 'meta.json')
+        if os.path.isfile(self.meta_path):
+            with open(self.meta_path, encoding='utf-8') as f:
+                self.meta = json.load(f)
+            if 'partitions' in self.meta:
+                self._save_index(self.meta['partitions'])  # store from before the per-day index
+                self._save_meta()
+            else:
+                self.meta['partitions'] = self._load_index()
+        elif columns is None:
+            raise FileNotFoundError(f"no store at {root} (pass columns to create one)")
+        elif partition_seconds % PARTITION_SECONDS:
+            raise ValueError("partition_seconds must be a whole number of hours")
+        else:
+            os.makedirs(root, exist_ok=True)
+            self.meta = {
+                'partition_seconds': partition_seconds,
+                'columns': [{'name': name, 'kind': kind, 'categories': [] if kind == 'category' else None}
+                            for name, kind in columns],
+                'partitions': {},
+            }
+            self._save_meta()
+        self.columns = [c['name'] for c in self.meta['columns']]
+        self._column_index = {name: i for i, name in enumerate(self.columns)}
+        self._category_codes = [{v: k for k, v in enumerate(c['categories'])} if c['kind'] == 'category' else None
+                                for c in self.meta['columns']]
+        self._buffer = {}  # device -> [list of time arrays, list of {column index: array}]
+        self._buffered_rows = 0
+        self._categories_changed = False
+
+    # ---------------------
+    # Writing
+    # ---------------------
+    def append(self, device, times, columns):
+        """times: epoch seconds; columns: {name: values} (columns left out are stored as missing)."""
+        if not DEVICE_PATTERN.match(device):
+            raise ValueError(f"device names may only use letters, digits, '_', '.' and '-': {device!r}")
+        times = np.asarray(times, dtype=float).reshape(-1)
+        encoded = {}
+        for name, values in columns.items():
+            i = self._column_index[name]
+            if len(values) != len(times):
+                raise ValueError(f"{name}: {len(values)} values for {len(times)} timestamps")
+            encoded[i] = self._encode(i, values)
+        times_list, cols_list = self._buffer.setdefault(device, ([], []))
+        times_list.append(times)
+        cols_list.append(encoded)
+        self._buffered_rows += len(times)
+        if self._buffered_rows >= BUFFER_ROWS:
+            self.flush()
+
+    def _encode(self, i, values):
+        spec = self.meta['columns'][i]
+        if spec['kind'] == 'float':
+            return to_float(values)
+        codes = self._category_codes[i]
+        out = np.empty(len(values), dtype=np.int32)
+        for k, v in enumerate(values):
+            if v is None or v == '' or v != v:
+                out[k] = -1
+                continue
+            code = codes.get(v)
+            if code is None:
+                code = codes[v] = len(spec['categories'])
+                spec['categories'].append(v)
+                self._categories_changed = True
+            out[k] = code
+        return out
+
+    def _column_file(self, part_dir, i):
+        ext = 'f8' if self.meta['columns'][i]['kind'] == 'float' else 'i4'
+        return os.path.join(part_dir, f"c{i}.{ext}")
+
+    def flush(self):
+        if not self._buffered_rows:
+            return
+        partitions = self.meta['partitions']
+        touched = {}
+        for device, (times_list, cols_list) in self._buffer.items():
+            times = np.concatenate(times_list)
+            columns = []
+            for i, spec in enumerate(self.meta['columns']):
+                missing = -1 if spec['kind'] == 'category' else np.nan
+                dtype = np.int32 if spec['kind'] == 'category' else np.float64
+                columns.append(np.concatenate([cols[i] if i in cols else np.full(len(t), missing, dtype=dtype)
+                                               for t, cols in zip(times_list, cols_list)]))
+            order = np.argsort(times, kind='stable')
+            times = times[order]
+            columns = [c[order] for c in columns]
+            seconds = self.meta['partition_seconds']
+            periods = (times // seconds).astype(np.int64)
+            bounds = np.flatnonzero(np.diff(periods)) + 1
+            for lo, hi in zip(np.r_[0, bounds], np.r_[bounds, len(times)]):
+                key = partition_key(times[lo], seconds)
+                touched.setdefault(device, set()).add(key)
+                part_dir = os.path.join(self.root, device, key)
+                os.makedirs(part_dir, exist_ok=True)
+                info = partitions.setdefault(device, {}).get(key)
+                rows_before = 0 if info is None else info['rows']
+                _append(os.path.join(part_dir, 'time.f8'), times[lo:hi], rows_before)
+                for i, col in enumerate(columns):
+                    _append(self._column_file(part_dir, i), col[lo:hi], rows_before)
+                if info is None:
+                    partitions[device][key] = {'start': float(times[lo]), 'end': float(times[hi - 1]),
+                                               'rows': int(hi - lo), 'sorted': True}
+                else:
+                    info['sorted'] = info['sorted'] and bool(times[lo] >= info['end'])
+                    info['start'] = min(info['start'], float(times[lo]))
+                    info['end'] = max(info['end'], float(times[hi - 1]))
+                    info['rows'] += int(hi - lo)
+        self._buffer.clear()
+        self._buffered_rows = 0
+        if self._categories_changed:
+            self._save_meta()  # before the index, which may point at rows using the new codes
+            self._categories_changed = False
+        self._save_index(touched)
+
+    def _save_meta(self):
+        _write_json(self.meta_path, {k: v for k, v in self.meta.items() if k != 'partitions'})
+
+    def _save_index(self, touched):
+        """touched: {device: keys}; rewrites the index file of every day those keys fall on."""
+        for device, keys in touched.items():
+            parts = self.meta['partitions'][device]
+            index_dir = os.path.join(self.root, device, INDEX_DIR)
+            os.makedirs(index_dir, exist_ok=True)
+            for day in sorted({key[:8] for key in keys}):
+                day_keys = (f"{day}T{hour:02d}" for hour in range(24))
+                _write_json(os.path.join(index_dir, day + '.json'),
+                            {key: parts[key] for key in day_keys if key in parts})
+
+    def _load_index(self):
+        partitions = {}
+        for device in sorted(os.listdir(self.root)):
+            index_dir = os.path.join(self.root, device, INDEX_DIR)
+            if not os.path.isdir(index_dir):
+                continue
+            parts = partitions[device] = {}
+            for name in sorted(os.listdir(index_dir)):
+                if name.endswith('.json'):
+                    with open(os.path.join(index_dir, name), encoding='utf-8') as f:
+                        parts.update(json.load(f))
+        return partitions
+
+    def modified(self):
+        """Time of the last write to the store (schema or index)."""
+        paths = [self.meta_path] + [os.path.join(self.root, device, INDEX_DIR) for device in self.meta['partitions']]
+        return max(os.path.getmtime(p) for p in paths)
+
+    def close(self):
+        self.flush()
+
+    # ---------------------
+    # Reading
+    # ---------------------
+    def devices(self):
+        return sorted(self.meta['partitions'])
+
+    def time_range(self, device=None):
+        infos = [info for d, parts in self.meta['partitions'].items() if device in (None, d) for info in parts.values()]
+        if not infos:
+            return None
+        return min(i['start'] for i in infos), max(i['end'] for i in infos)
+
+    def read_arrays(self, columns=None, start=None, end=None, devices=None):
+        """
+        {'time': ..., 'device': ..., column: ...} for start <= time < end. Only the
+        partitions overlapping the range and only the requested column files are
+        touched (memory-mapped). Category columns come back as int32 codes; see
+        categories(). Rows are grouped by device, in time order within a device.
+        """
+        columns = self.columns if columns is None else list(columns)
+        idx = [self._column_index[name] for name in columns]
+        lo_t = -np.inf if start is None else float(start)
+        hi_t = np.inf if end is None else float(end)
+        out = {'time': [], 'device': []}
+        out.update({name: [] for name in columns})
+        for device in (self.devices() if devices is None else devices):
+            parts = self.meta['partitions'].get(device, {})
+            for key in sorted(parts):
+                info = parts[key]
+                if info['end'] < lo_t or info['start'] >= hi_t:
+                    continue
+                part_dir = os.path.join(self.root, device, key)
+                n = info['rows']
+                t = np.memmap(os.path.join(part_dir, 'time.f8'), dtype=np.float64, mode='r', shape=(n,))
+                if info['sorted']:
+                    sel = slice(np.searchsorted(t, lo_t, 'left'), np.searchsorted(t, hi_t, 'left'))
+                else:
+                    sel = np.flatnonzero((t >= lo_t) & (t < hi_t))
+                times = np.array(t[sel])
+                if not len(times):
+                    continue
+                out['time'].append(times)
+                out['device'].append(np.full(len(times), device, dtype=object))
+                for name, i in zip(columns, idx):
+                    dtype = np.float64 if self.meta['columns'][i]['kind'] == 'float' else np.int32
+                    col = np.memmap(self._column_file(part_dir, i), dtype=dtype, mode='r', shape=(n,))
+                    out[name].append(np.array(col[sel]))
+        dtypes = {'time': np.float64, 'device': object}
+        dtypes.update({name: np.float64 if self.categories(name) is None else np.int32 for name in columns})
+        return {name: np.concatenate(parts) if parts else np.empty(0, dtype=dtypes[name])
+                for name, parts in out.items()}
+
+    def categories(self, name):
+        return self.meta['columns'][self._column_index[name]]['categories']
+
+    def read_frame(self, columns=None, start=None, end=None, devices=None, index_columns=True):
+        """read_arrays() as a pandas DataFrame, category codes decoded to their labels."""
+        import pandas as pd
+        arrays = self.read_arrays(columns, start, end, devices)
+        if not index_columns:
+            arrays.pop('time')
+            arrays.pop('device')
+        frame = {}
+        for name, values in arrays.items():
+            cats = self.categories(name) if name in self._column_index else None
+            frame[name] = pd.Categorical.from_codes(values, cats).astype(object) if cats is not None else values
+        return pd.DataFrame(frame)
+
+
+def default_store_path(csv_path):
+    return os.path.splitext(csv_path)[0] + '_store'
+
+
+def current_store(csv_path):
+    """
+    The store next to the CSV (serial_data.csv -> serial_data_store/), or None when
+    there is none or the CSV was written after it (a logger still appending to the
+    CSV after a one-shot conversion), so callers never read a stale snapshot.
+    """
+    store_path = default_store_path(csv_path)
+    if not os.path.isfile(os.path.join(store_path, 'meta.json')):
+        return None
+    store = SeriesStore(store_path)
+    if os.path.isfile(csv_path) and os.path.getmtime(csv_path) > store.modified():
+        warnings.warn(f"{csv_path} is newer than {store_path}, reading the CSV instead "
+                      f"(run ts_store.py again to refresh the store)")
+        return None
+    return store
+
+
+def load_serial_data(csv_path, columns=None, start=None, end=None):
+    """
+    The logged readings as a DataFrame with the CSV's columns. Reads the store
+    next to the CSV when it is current (see current_store()), so only the requested
+    columns and time range are loaded; otherwise parses the CSV.
+    """
+    store = current_store(csv_path)
+    if store is not None:
+        return store.read_frame(columns, start, end, index_columns=False)
+    from pandas import read_csv
+    return read_csv(csv_path, encoding='unicode_escape', usecols=columns)
+
+
+def iter_serial_data(csv_path, chunk_rows=1000000, columns=None):
+    """
+    load_serial_data() in DataFrames of about chunk_rows rows (whole partitions at a
+    time from the store), for histories too big to load at once.
+    """
+    store = current_store(csv_path)
+    if store is None:
+        from pandas import read_csv
+        yield from read_csv(csv_path, encoding='unicode_escape', usecols=columns, chunksize=chunk_rows)
+        return
+    import pandas as pd
+    frames, rows = [], 0
+    for device in store.devices():
+        parts = store.meta['partitions'][device]
+        for key in sorted(parts):
+            info = parts[key]
+            frames.append(store.read_frame(columns, info['start'], np.nextafter(info['end'], np.inf),
+                                           devices=[device], index_columns=False))
+            rows += len(frames[-1])
+            if rows >= chunk_rows:
+                yield pd.concat(frames, ignore_index=True)
+                frames, rows = [], 0
+    if frames:
+        yield pd.concat(frames, ignore_index=True)
+
+
+def convert_csv(csv_path, store_path, device='meter', start=0.0, interval=1.0, chunk_rows=500000):
+    """
+    One-shot CSV -> store conversion, in chunks. Rows are stamped start + row * interval
+    (the single-port log has no timestamps). A 'Device' column, as written by the
+    multi-port logger, overrides device per row. The store is built in a temporary
+    folder and then replaces any store already at store_path, so converting again
+    refreshes the store instead of appending the CSV a second time.
+    """
+    from pandas import read_csv
+    store_path = os.path.normpath(store_path)
+    build_path = f"{store_path}.tmp-{os.getpid()}"
+    shutil.rmtree(build_path, ignore_errors=True)
+    store = None
+    offset = 0
+    for chunk in read_csv(csv_path, encoding='unicode_escape', chunksize=chunk_rows):
+        devices = chunk.pop('Device').astype(str).to_numpy() if 'Device' in chunk else None
+        if store is None:
+            kinds = [(name, 'float' if chunk[name].dtype.kind in 'fiub' else 'category') for name in chunk.columns]
+            store = SeriesStore(build_path, columns=kinds)
+        times = start + (offset + np.arange(len(chunk))) * interval
+        offset += len(chunk)
+        cols = {name: (chunk[name].to_numpy() if store.meta['columns'][i]['kind'] == 'float'
+                       else chunk[name].where(chunk[name].notna(), None).to_numpy())
+                for i, name in enumerate(store.columns)}
+        if devices is None:
+            store.append(device, times, cols)
+        else:
+            for d in np.unique(devices):
+                mask = devices == d
+                store.append(d, times[mask], {name: values[mask] for name, values in cols.items()})
+    if store is None:
+        return None, 0
+    store.close()
+    old_path = f"{store_path}.old-{os.getpid()}"
+    if os.path.exists(store_path):
+        os.replace(store_path, old_path)
+    os.replace(build_path, store_path)
+    shutil.rmtree(old_path, ignore_errors=True)
+    return SeriesStore(store_path), offset
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Convert a logged CSV into a partitioned store")
+    ap.add_argument("csv")
+    ap.add_argument("store", nargs="?", help="default: <csv name>_store next to the CSV")
+    ap.add_argument("--device", default="meter")
+    ap.add_argument("--start", default="2024-01-01T00:00:00", help="UTC time of the first row")
+    ap.add_argument("--interval", type=float, default=1.0, help="seconds between rows")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    start = calendar.timegm(time.strptime(args.start, '%Y-%m-%dT%H:%M:%S'))
+    target = args.store or default_store_path(args.csv)
+    store, rows = convert_csv(args.csv, target, args.device, start, args.interval)
+    print(f"{rows} rows -> {target} ({len(store.devices()) if store else 0} devices) in {time.perf_counter() - t0:.2f}s")
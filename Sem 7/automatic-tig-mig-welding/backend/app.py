@@ -1,145 +1,330 @@
 # app.py
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, Response
 from flask_cors import CORS
+from flask_sock import Sock
+from simple_websocket import ConnectionClosed
+import os
+import json
 import numpy as np
 import pandas as pd
-from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
 from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
 from sklearn.pipeline import Pipeline
+import time
 import traceback
+from functools import lru_cache
+import model_store
+import training
+from datagen import generate_synthetic_data
+import fast_forest
+import optimizer
+import streaming
+import prediction_cache
+import metrics
 
 app = Flask(__name__)
 CORS(app)  # enable CORS for all routes
-
-# ---------------------
-# Synthetic dataset generation (physics-inspired)
-# ---------------------
-def generate_synthetic_data(n_samples=2000, random_state=42):
-    rng = np.random.RandomState(random_state)
-    # Features ranges (typical-ish values — for demo only)
-    mode = rng.choice([0, 1], size=n_samples, p=[0.5, 0.5])  # 0: TIG, 1: MIG
-    current = rng.uniform(40, 300, size=n_samples)  # Amps
-    voltage = rng.uniform(10, 40, size=n_samples)  # Volts
-    wire_feed_speed = rng.uniform(0, 20, size=n_samples)  # mm/s, relevant for MIG
-    travel_speed = rng.uniform(1, 15, size=n_samples)  # mm/s
-    torch_angle = rng.uniform(0, 15, size=n_samples)  # degrees
-    gas_flow_rate = rng.uniform(5, 30, size=n_samples)  # L/min
-    material_thickness = rng.uniform(0.5, 12, size=n_samples)  # mm
-
-    # Physics-inspired target generation:
-    # penetration increases with current and thickness, decreases with travel speed.
-    penetration = (
-        0.01 * current
-        + 0.2 * np.log1p(material_thickness)
-        - 0.3 * travel_speed
-        + 0.5 * mode  # MIG tends to give deeper penetration here in synthetic model
-    )
-    penetration += rng.normal(scale=0.5, size=n_samples)
-
-    # bead width influenced by voltage, current, and wire feed (for MIG)
-    bead_width = (
-        0.02 * voltage
-        + 0.01 * current
-        + 0.5 * wire_feed_speed * mode  # only for MIG (mode=1)
-        - 0.1 * travel_speed
-    )
-    bead_width += 0.2 * np.log1p(material_thickness) + rng.normal(scale=0.3, size=n_samples)
-    bead_width = np.clip(bead_width, 0.5, None)
-
-    # defect probability: higher when settings mismatch thickness (too much travel speed, too low gas, extreme torch angle)
-    mismatch_score = (
-        np.abs(0.5 * material_thickness - 0.01 * current)  # arbitrary mismatch formula
-        + 0.2 * np.maximum(0, travel_speed - (1 + 0.8 * material_thickness))
-        + 0.3 * np.maximum(0, 10 - gas_flow_rate)
-        + 0.05 * torch_angle
-    )
-    defect_prob = 1 / (1 + np.exp(-0.5 * (mismatch_score - 2.5)))  # logistic
-    defect = (rng.rand(n_samples) < defect_prob).astype(int)
-
-    df = pd.DataFrame({
-        "mode": mode,
-        "current": current,
-        "voltage": voltage,
-        "wire_feed_speed": wire_feed_speed,
-        "travel_speed": travel_speed,
-        "torch_angle": torch_angle,
-        "gas_flow_rate": gas_flow_rate,
-        "material_thickness": material_thickness,
-        "penetration": penetration,
-        "bead_width": bead_width,
-        "defect": defect
-    })
-    return df
+sock = Sock(app)
 
 # ---------------------
 # Train models (regressors + classifier)
 # ---------------------
 def train_models(df):
-    features = ["mode", "current", "voltage", "wire_feed_speed", "travel_speed",
-                "torch_angle", "gas_flow_rate", "material_thickness"]
-    X = df[features].values
-    y_pen = df["penetration"].values
-    y_bead = df["bead_width"].values
-    y_def = df["defect"].values
-
-    # We'll use simple pipelines with a scaler (not required for trees but fine)
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
-
-    # Regressors for penetration and bead width
-    pen_model = RandomForestRegressor(n_estimators=200, random_state=0)
-    bead_model = RandomForestRegressor(n_estimators=200, random_state=1)
-    def_model = RandomForestClassifier(n_estimators=200, random_state=2)
-
-    pen_model.fit(X_scaled, y_pen)
-    bead_model.fit(X_scaled, y_bead)
-    def_model.fit(X_scaled, y_def)
-
-    # Save scaler and models in a dict
-    models = {
-        "scaler": scaler,
-        "pen_model": pen_model,
-        "bead_model": bead_model,
-        "def_model": def_model,
-        "features": features
-    }
-    return models
+    # Scaler + regressors for penetration and bead width + defect classifier.
+    # The three forests are fitted concurrently, each on TRAIN_JOBS / 3 cores.
+    return training.train_from_dataframe(df, n_jobs=TRAIN_JOBS)
+
+# Load models from the on-disk store, or generate data & train on first start.
+# Set WELDING_DATASET to train on a chunked on-disk dataset instead of synthetic data.
+TRAIN_JOBS = int(os.environ.get("WELDING_TRAIN_JOBS", -1))
+DATASET_PATH = os.environ.get("WELDING_DATASET")
+if DATASET_PATH:
+    DATA_PARAMS = {"path": os.path.abspath(DATASET_PATH),
+                   "fingerprint": training.dataset_fingerprint(DATASET_PATH)}
+    _load_data = training.load_dataset
+else:
+    DATA_PARAMS = {"n_samples": 2500, "random_state": 42}
+    _load_data = generate_synthetic_data
+MODEL_VERSION = training.MODEL_VERSION
+MODEL_STORE_DIR = model_store.DEFAULT_STORE_DIR
+
+print("Loading models (training on first start may take a few seconds)...")
+_models, _model_load = model_store.load_or_train(
+    MODEL_STORE_DIR, DATA_PARAMS, MODEL_VERSION, _load_data, train_models
+)
+print("Models ready: version {version} from {source} in {load_seconds:.3f}s".format(**_model_load))
+metrics.MODEL_LOAD_SECONDS.set(round(_model_load["load_seconds"], 4), source=_model_load["source"])
+for _name, _stats in _models.get("train_report", {}).items():
+    if isinstance(_stats, dict):
+        metrics.MODEL_TRAIN_SECONDS.set(_stats["seconds"], model=_name)
+
+# Optional fast inference engine (WELDING_INFERENCE):
+#   "sklearn"   - plain sklearn predict (default)
+#   "flat"      - flattened forests, same outputs; used for batches up to FAST_MAX_ROWS
+#   "distilled" - small forests trained to mimic the full ones; approximate, used for all batches
+INFERENCE_ENGINE = os.environ.get("WELDING_INFERENCE", "sklearn")
+FAST_MAX_ROWS = int(os.environ.get("WELDING_FAST_MAX_ROWS", 256))
+
+def build_engine(models, kind):
+    if kind == "sklearn":
+        return None
+    if kind == "flat":
+        return fast_forest.FlatForest(models)
+    if kind == "distilled":
+        small = model_store.load_artifact(MODEL_STORE_DIR, _model_load["version"], "distilled.joblib")
+        if small is None:
+            features = models["features"]
+            def sample(n, rng):
+                return generate_synthetic_data(n, rng.randint(2**31 - 1))[features].values
+            small = fast_forest.distill(models, sample_fn=sample)
+            model_store.save_artifact(small, MODEL_STORE_DIR, _model_load["version"], "distilled.joblib")
+        return fast_forest.FlatForest(small)
+    raise ValueError("unknown WELDING_INFERENCE engine: %r" % kind)
 
-# Generate data & train on startup
-print("Generating synthetic dataset and training models (this may take a few seconds)...")
-_df = generate_synthetic_data(n_samples=2500, random_state=42)
-_models = train_models(_df)
-print("Models trained and ready.")
+_engine = build_engine(_models, INFERENCE_ENGINE)
+
+# Prediction cache for /predict and /simulate (WELDING_CACHE=0 disables it).
+# WELDING_CACHE_REDIS_URL switches to a Redis cache shared by all workers.
+CACHE_ENABLED = os.environ.get("WELDING_CACHE", "1") != "0"
+CACHE_QUANTUM = float(os.environ.get("WELDING_CACHE_QUANTUM", 1e-3))
+CACHE_TTL = float(os.environ.get("WELDING_CACHE_TTL", 3600))
+CACHE_MAX_MB = float(os.environ.get("WELDING_CACHE_MAX_MB", 16))
+# Larger matrices (long /simulate passes) skip the cache: per-row lookups would cost more
+# than the vectorized predict they save, and one pass could evict every other entry
+CACHE_MAX_ROWS = int(os.environ.get("WELDING_CACHE_MAX_ROWS", 16))
+
+def build_cache():
+    if not CACHE_ENABLED:
+        return None
+    url = os.environ.get("WELDING_CACHE_REDIS_URL")
+    if url:
+        return prediction_cache.RedisPredictionCache(url, ttl=CACHE_TTL, quantum=CACHE_QUANTUM)
+    return prediction_cache.PredictionCache(max_bytes=CACHE_MAX_MB * 2**20, ttl=CACHE_TTL,
+                                            quantum=CACHE_QUANTUM)
+
+_cache = build_cache()
 
 # ---------------------
 # Helper: validate and parse input
 # ---------------------
+# Provide defaults if missing (safe fallback)
+FEATURE_DEFAULTS = {
+    "mode": 0,
+    "current": 120.0,
+    "voltage": 22.0,
+    "wire_feed_speed": 5.0,
+    "travel_speed": 6.0,
+    "torch_angle": 5.0,
+    "gas_flow_rate": 12.0,
+    "material_thickness": 2.0
+}
+
 def parse_input_json(data):
     """
     Accepts JSON dict with keys matching features.
     Returns numpy array shape (1, n_features).
     """
     features = _models["features"]
-    # Provide defaults if missing (safe fallback)
-    defaults = {
-        "mode": 0,
-        "current": 120.0,
-        "voltage": 22.0,
-        "wire_feed_speed": 5.0,
-        "travel_speed": 6.0,
-        "torch_angle": 5.0,
-        "gas_flow_rate": 12.0,
-        "material_thickness": 2.0
-    }
     vals = []
     for f in features:
         if f in data:
             vals.append(float(data[f]))
         else:
-            vals.append(float(defaults[f]))
+            vals.append(float(FEATURE_DEFAULTS[f]))
     return np.array(vals).reshape(1, -1)
 
+def parse_batch_json(data):
+    """
+    Accepts either a list of recipe dicts, {"recipes": [...]}, or columnar
+    {"columns": {"current": [...], ...}} (missing columns use the defaults).
+    Returns (X, row_ids, errors): X holds only the valid rows, row_ids their
+    positions in the request and errors a list of {"row", "error"} dicts.
+    """
+    features = _models["features"]
+    if isinstance(data, dict) and "columns" in data:
+        return _parse_columns(data["columns"], features)
+    recipes = data.get("recipes") if isinstance(data, dict) else data
+    if not isinstance(recipes, list):
+        raise ValueError("expected a JSON array of recipes, {'recipes': [...]} or {'columns': {...}}")
+
+    rows, row_ids, errors = [], [], []
+    for i, recipe in enumerate(recipes):
+        try:
+            if not isinstance(recipe, dict):
+                raise ValueError("recipe must be a JSON object")
+            x = parse_input_json(recipe).reshape(-1)
+            if not np.all(np.isfinite(x)):
+                raise ValueError("feature values must be finite numbers")
+            rows.append(x)
+            row_ids.append(i)
+        except (TypeError, ValueError) as e:
+            errors.append({"row": i, "error": str(e)})
+    X = np.array(rows).reshape(-1, len(features))
+    return X, np.array(row_ids, dtype=int), errors
+
+def _parse_columns(columns, features):
+    if not isinstance(columns, dict):
+        raise ValueError("'columns' must map feature names to arrays")
+    unknown = sorted(set(columns) - set(features))
+    if unknown:
+        raise ValueError("unknown columns: " + ", ".join(unknown))
+    if not all(isinstance(v, list) for v in columns.values()):
+        raise ValueError("every column must be a JSON array")
+    lengths = {len(v) for v in columns.values()}
+    if len(lengths) != 1:
+        raise ValueError("all columns must be arrays of the same length")
+    n = lengths.pop()
+
+    X = np.empty((n, len(features)))
+    bad = {}
+    for j, f in enumerate(features):
+        if f not in columns:
+            X[:, j] = float(FEATURE_DEFAULTS[f])
+            continue
+        try:
+            X[:, j] = np.asarray(columns[f], dtype=float)
+        except (TypeError, ValueError):
+            # slow path only for the column that failed: find the offending rows
+            for i, v in enumerate(columns[f]):
+                try:
+                    X[i, j] = float(v)
+                except (TypeError, ValueError):
+                    X[i, j] = np.nan
+                    bad.setdefault(i, "invalid value for '%s': %r" % (f, v))
+    for i in np.flatnonzero(~np.all(np.isfinite(X), axis=1)).tolist():
+        bad.setdefault(i, "feature values must be finite numbers")
+
+    ok = np.ones(n, dtype=bool)
+    ok[list(bad)] = False
+    errors = [{"row": i, "error": bad[i]} for i in sorted(bad)]
+    return X[ok], np.flatnonzero(ok), errors
+
+# ---------------------
+# Helper: vectorized inference
+# ---------------------
+def _predict(X, quantiles=None):
+    """
+    Shared body of predict_matrix() and predict_matrix_with_uncertainty(). With quantiles
+    the result also holds {model name: (std, quantile array)} for pen_model and bead_model.
+    """
+    stage = metrics.STAGE_SECONDS
+    metrics.ROWS.inc(len(X))
+    with_spread = quantiles is not None
+    # The distilled engine's spread would be that of its 16 student trees, not of the
+    # forest, so uncertainty requests always evaluate the full forests
+    use_engine = len(X) <= FAST_MAX_ROWS if INFERENCE_ENGINE != "distilled" else not with_spread
+    if _engine is not None and use_engine:
+        with stage.time(stage="engine"):
+            if not with_spread:
+                return _engine.predict(X)
+            (pen, bead, def_prob), spread = _engine.predict_stats(X, ("pen_model", "bead_model"), quantiles)
+        return pen, bead, def_prob, spread
+    with stage.time(stage="scale"):
+        x_scaled = _models["scaler"].transform(X)
+    spread = {}
+
+    def regress(name):
+        with stage.time(stage=name):
+            if not with_spread:
+                return _models[name].predict(x_scaled)
+            mean, std, qs = fast_forest.sklearn_forest_stats(_models[name], x_scaled, quantiles)
+            spread[name] = (std, qs)
+            return mean
+
+    pen = regress("pen_model")
+    bead = regress("bead_model")
+    with stage.time(stage="def_model"):
+        def_prob = _models["def_model"].predict_proba(x_scaled)[:, 1]
+    return (pen, bead, def_prob, spread) if with_spread else (pen, bead, def_prob)
+
+def predict_matrix(X):
+    """
+    Scores a (n_rows, n_features) matrix with one scaler pass and one call per model.
+    Returns (penetration, bead_width, defect_probability) as 1-D arrays.
+    """
+    return _predict(X)
+
+def predict_matrix_with_uncertainty(X, quantiles=(0.05, 0.95)):
+    """
+    predict_matrix() plus the spread of the individual trees of pen_model and bead_model,
+    computed in the same pass as the mean. This is the disagreement between trees, not a
+    calibrated prediction interval. It always comes from the full forests, also with
+    WELDING_INFERENCE=distilled.
+    Returns (pen, bead, def_prob, {"penetration_mm": (std, q), "bead_width_mm": (std, q)}).
+    """
+    pen, bead, def_prob, spread = _predict(X, quantiles)
+    return pen, bead, def_prob, {"penetration_mm": spread["pen_model"], "bead_width_mm": spread["bead_model"]}
+
+def parse_quantiles(data):
+    """Reads the optional "quantiles" list of a request (default [0.05, 0.95]); ValueError if invalid."""
+    try:
+        quantiles = tuple(float(q) for q in data.get("quantiles", (0.05, 0.95)))
+    except (TypeError, ValueError):
+        quantiles = ()
+    if not quantiles or not all(0.0 <= q <= 1.0 for q in quantiles):
+        raise ValueError("quantiles must be a non-empty list of numbers in [0, 1]")
+    return quantiles
+
+def uncertainty_json(spread, quantiles, i):
+    """Per-row uncertainty block: {"penetration_mm": {"std": .., "quantiles": {"0.05": ..}}, ...}."""
+    return {
+        target: {
+            "std": round(float(std[i]), 4),
+            "quantiles": {str(q): round(float(qs[j, i]), 4) for j, q in enumerate(quantiles)}
+        }
+        for target, (std, qs) in spread.items()
+    }
+
+def cached_predict_matrix(X):
+    """
+    predict_matrix() with repeated feature vectors answered from the prediction cache.
+    Only matrices of up to CACHE_MAX_ROWS rows go through the cache.
+    """
+    if _cache is None or len(X) > CACHE_MAX_ROWS:
+        return predict_matrix(X)
+    return prediction_cache.cached_predict(_cache, predict_matrix, X, _model_load["version"])
+
+def build_pass_matrix(base, segments):
+    """
+    Expands a 1-D base feature vector into the (segments, n_features) matrix of a welding pass.
+    Travel speed and torch angle get small sinusoidal variations along the pass.
+    Returns (frac, X) where frac is the fractional position of each segment.
+    """
+    features = _models["features"]
+    ts_idx = features.index("travel_speed")
+    ta_idx = features.index("torch_angle")
+    frac = np.arange(segments) / max(1, segments - 1)
+    X = np.repeat(base.reshape(1, -1), segments, axis=0)
+    X[:, ts_idx] = base[ts_idx] * (1 + 0.05 * np.sin(2 * np.pi * frac))
+    X[:, ta_idx] = base[ta_idx] + (0.5 * np.cos(2 * np.pi * frac))
+    return frac, X
+
+# ---------------------
+# Helper: request plumbing (timing, JSON, errors)
+# ---------------------
+@app.before_request
+def _start_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def _record_request(response):
+    endpoint = request.endpoint or "unknown"
+    metrics.REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+    if "request_start" in g:
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - g.request_start, endpoint=endpoint)
+    return response
+
+def read_json():
+    with metrics.STAGE_SECONDS.time(stage="json_parse"):
+        return request.get_json(force=True)
+
+def timed_jsonify(payload):
+    with metrics.STAGE_SECONDS.time(stage="serialize"):
+        return jsonify(payload)
+
+def error_response(e):
+    metrics.ERRORS.inc(endpoint=request.endpoint or "unknown", exception=type(e).__name__)
+    return jsonify({"error": str(e), "trace": traceback.format_exc()}), 500
+
 # ---------------------
 # Routes
 # ---------------------
@@ -153,26 +338,38 @@ def model_info():
                 "bead_width": "RandomForestRegressor (n_estimators=200)",
                 "defect": "RandomForestClassifier (n_estimators=200)"
             },
+            "version": _model_load["version"],
+            "inference_engine": INFERENCE_ENGINE,
+            "prediction_cache": _cache.stats() if _cache is not None else None,
+            "loaded_from": _model_load["source"],
             "note": "Models are trained on synthetic data for demonstration only."
         }
         return jsonify(info)
     except Exception as e:
-        return jsonify({"error": str(e), "trace": traceback.format_exc()}), 500
+        return error_response(e)
 
 @app.route("/predict", methods=["POST"])
 def predict():
     """
     Expects JSON body with feature values (mode,current,voltage,wire_feed_speed,travel_speed,torch_angle,gas_flow_rate,material_thickness)
     Returns predicted penetration, bead_width, defect_probability, defect_label
+    With "uncertainty": true also returns the per-tree std and "quantiles" (default [0.05, 0.95])
+    for penetration and bead width.
     """
     try:
-        data = request.get_json(force=True) or {}
-        x = parse_input_json(data)
-        scaler = _models["scaler"]
-        x_scaled = scaler.transform(x)
-        pen = _models["pen_model"].predict(x_scaled)[0]
-        bead = _models["bead_model"].predict(x_scaled)[0]
-        def_prob = _models["def_model"].predict_proba(x_scaled)[0][1]
+        data = read_json() or {}
+        with metrics.STAGE_SECONDS.time(stage="parse_input"):
+            x = parse_input_json(data)
+        spread = None
+        if data.get("uncertainty"):
+            try:
+                quantiles = parse_quantiles(data)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            pen, bead, def_prob, spread = predict_matrix_with_uncertainty(x, quantiles)
+            pen, bead, def_prob = pen[0], bead[0], def_prob[0]
+        else:
+            pen, bead, def_prob = (v[0] for v in cached_predict_matrix(x))
         def_label = int(def_prob >= 0.5)
 
         resp = {
@@ -182,54 +379,200 @@ def predict():
             "defect_probability": float(np.round(def_prob, 4)),
             "defect_label": def_label
         }
-        return jsonify(resp)
+        if spread is not None:
+            resp["uncertainty"] = uncertainty_json(spread, quantiles, 0)
+        return timed_jsonify(resp)
+    except Exception as e:
+        return error_response(e)
+
+@app.route("/predict_batch", methods=["POST"])
+def predict_batch():
+    """
+    Scores many recipes in one request. Body is a JSON array of /predict-style
+    objects, {"recipes": [...]}, or columnar {"columns": {"current": [...], ...}}.
+    Valid rows are scored in a single vectorized call per model; invalid rows
+    are reported in "errors" and get null predictions instead of failing the batch.
+    """
+    try:
+        data = read_json()
+        try:
+            with metrics.STAGE_SECONDS.time(stage="parse_input"):
+                X, row_ids, errors = parse_batch_json(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        n_rows = len(row_ids) + len(errors)
+        pen = np.full(n_rows, np.nan)
+        bead = np.full(n_rows, np.nan)
+        def_prob = np.full(n_rows, np.nan)
+        if len(row_ids):
+            pen[row_ids], bead[row_ids], def_prob[row_ids] = predict_matrix(X)
+
+        def as_list(values):
+            return [None if np.isnan(v) else v for v in np.round(values, 4).tolist()]
+
+        ok = np.zeros(n_rows, dtype=bool)
+        ok[row_ids] = True
+        labels = [int(p >= 0.5) if good else None for p, good in zip(def_prob.tolist(), ok.tolist())]
+        return timed_jsonify({
+            "count": n_rows,
+            "scored": int(len(row_ids)),
+            "penetration_mm": as_list(pen),
+            "bead_width_mm": as_list(bead),
+            "defect_probability": as_list(def_prob),
+            "defect_label": labels,
+            "errors": errors
+        })
     except Exception as e:
-        return jsonify({"error": str(e), "trace": traceback.format_exc()}), 500
+        return error_response(e)
+
+@lru_cache(maxsize=512)
+def _cached_optimize(mode, material_thickness, target_pen, max_def, target_bead, bounds, version):
+    # version is part of the key so retrained models never reuse old results
+    return optimizer.optimize_recipe(
+        predict_matrix, _models["features"],
+        fixed={"mode": mode, "material_thickness": material_thickness},
+        target_penetration=target_pen, max_defect_probability=max_def,
+        target_bead_width=target_bead, bounds=dict(bounds),
+    )
+
+@app.route("/optimize", methods=["POST"])
+def optimize():
+    """
+    Inverse search: which settings give the target penetration with defect probability below a limit.
+    JSON body: target_penetration_mm (required), mode, material_thickness, max_defect_probability
+    (default 0.2), optional target_bead_width_mm and bounds {"current": [low, high], ...}.
+    Results are cached per (mode, material_thickness, targets, bounds).
+    """
+    try:
+        data = read_json() or {}
+        try:
+            mode = int(data.get("mode", FEATURE_DEFAULTS["mode"]))
+            thickness = round(float(data.get("material_thickness", FEATURE_DEFAULTS["material_thickness"])), 4)
+            target_pen = round(float(data["target_penetration_mm"]), 4)
+            max_def = round(float(data.get("max_defect_probability", 0.2)), 4)
+            target_bead = data.get("target_bead_width_mm")
+            target_bead = None if target_bead is None else round(float(target_bead), 4)
+            bounds = tuple(sorted(
+                (str(f), (float(b[0]), float(b[1]))) for f, b in (data.get("bounds") or {}).items()
+            ))
+        except KeyError as e:
+            return jsonify({"error": "missing field: %s" % e.args[0]}), 400
+        except (TypeError, ValueError, IndexError) as e:
+            return jsonify({"error": str(e)}), 400
+        unknown = [f for f, _ in bounds if f not in optimizer.FEATURE_BOUNDS]
+        if unknown:
+            return jsonify({"error": "cannot search: " + ", ".join(unknown)}), 400
+
+        hits = _cached_optimize.cache_info().hits
+        result = _cached_optimize(mode, thickness, target_pen, max_def, target_bead, bounds,
+                                  _model_load["version"])
+        cached = _cached_optimize.cache_info().hits > hits
+        return jsonify(dict(result, cached=cached))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return error_response(e)
 
 @app.route("/simulate", methods=["POST"])
 def simulate():
     """
     Simulate a welding pass over a length (virtual) by varying travel_speed slightly and returning time-series of predictions.
     JSON body may contain 'length_mm' and other feature overrides.
+    'uncertainty' and 'quantiles' work as in /predict, per segment.
     """
     try:
-        data = request.get_json(force=True) or {}
-        base = parse_input_json(data).reshape(-1)  # 1-D feature vector
+        data = read_json() or {}
+        with metrics.STAGE_SECONDS.time(stage="parse_input"):
+            base = parse_input_json(data).reshape(-1)  # 1-D feature vector
         length_mm = float(data.get("length_mm", 100.0))
         segments = int(data.get("segments", 10))
-        # Simulate small variations in travel speed and torch angle during the pass
-        travel_speed_base = base[_models["features"].index("travel_speed")]
-        torch_angle_base = base[_models["features"].index("torch_angle")]
-
-        results = []
-        for i in range(segments):
-            frac = i / max(1, segments - 1)
-            # small sinusoidal variation
-            travel_speed = travel_speed_base * (1 + 0.05 * np.sin(2 * np.pi * frac))
-            torch_angle = torch_angle_base + (0.5 * np.cos(2 * np.pi * frac))
-            # update local feature vector
-            local = base.copy()
-            local[_models["features"].index("travel_speed")] = travel_speed
-            local[_models["features"].index("torch_angle")] = torch_angle
-
-            # predict
-            x_scaled = _models["scaler"].transform(local.reshape(1, -1))
-            pen = float(np.round(_models["pen_model"].predict(x_scaled)[0], 4))
-            bead = float(np.round(_models["bead_model"].predict(x_scaled)[0], 4))
-            def_prob = float(np.round(_models["def_model"].predict_proba(x_scaled)[0][1], 4))
-            pos_mm = float(np.round(frac * length_mm, 3))
-            results.append({
+        if segments <= 0:
+            return timed_jsonify({"simulation": [], "segments": segments, "length_mm": length_mm})
+        frac, X = build_pass_matrix(base, segments)
+        spread = None
+        if data.get("uncertainty"):
+            try:
+                quantiles = parse_quantiles(data)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            pen, bead, def_prob, spread = predict_matrix_with_uncertainty(X, quantiles)
+        else:
+            pen, bead, def_prob = cached_predict_matrix(X)
+
+        ts_idx = _models["features"].index("travel_speed")
+        ta_idx = _models["features"].index("torch_angle")
+        columns = zip(
+            np.round(frac * length_mm, 3).tolist(),
+            np.round(X[:, ts_idx], 4).tolist(),
+            np.round(X[:, ta_idx], 4).tolist(),
+            np.round(pen, 4).tolist(),
+            np.round(bead, 4).tolist(),
+            np.round(def_prob, 4).tolist(),
+        )
+        results = [
+            {
                 "position_mm": pos_mm,
-                "travel_speed": float(np.round(travel_speed, 4)),
-                "torch_angle": float(np.round(torch_angle, 4)),
-                "penetration_mm": pen,
-                "bead_width_mm": bead,
-                "defect_probability": def_prob
-            })
-
-        return jsonify({"simulation": results, "segments": segments, "length_mm": length_mm})
+                "travel_speed": travel_speed,
+                "torch_angle": torch_angle,
+                "penetration_mm": p,
+                "bead_width_mm": b,
+                "defect_probability": d
+            }
+            for pos_mm, travel_speed, torch_angle, p, b, d in columns
+        ]
+        if spread is not None:
+            for i, segment in enumerate(results):
+                segment["uncertainty"] = uncertainty_json(spread, quantiles, i)
+
+        return timed_jsonify({"simulation": results, "segments": segments, "length_mm": length_mm})
     except Exception as e:
-        return jsonify({"error": str(e), "trace": traceback.format_exc()}), 500
+        return error_response(e)
+
+# Live monitoring stream: micro-batch limits (frames per batch, max wait, queue size)
+STREAM_MAX_BATCH = int(os.environ.get("WELDING_STREAM_MAX_BATCH", 256))
+STREAM_MAX_WAIT = float(os.environ.get("WELDING_STREAM_MAX_WAIT_MS", 5)) / 1000.0
+STREAM_MAX_QUEUE = int(os.environ.get("WELDING_STREAM_MAX_QUEUE", 4096))
+
+@sock.route("/ws/monitor")
+def monitor(ws):
+    """
+    WebSocket stream of sensor frames. Each message is one /predict-style JSON object
+    (optionally with an "id" that is echoed back) or an array of them.
+    Frames are scored in micro-batches; every batch is answered with one message:
+    {"results": [{"id", "penetration_mm", "bead_width_mm", "defect_probability"}, ...],
+     "errors": [{"id", "error"}], "queued": <frames still waiting>,
+     "dropped": <frames dropped so far because the queue was full>}
+    """
+    stream = streaming.FrameStream(ws, max_queue=STREAM_MAX_QUEUE)
+    seen = 0  # frames without an "id" are numbered in arrival order
+
+    def frame_id(frame, i):
+        return frame.get("id", seen + i) if isinstance(frame, dict) else seen + i
+
+    try:
+        while not stream.finished:
+            frames = stream.next_batch(STREAM_MAX_BATCH, STREAM_MAX_WAIT)
+            if not frames:
+                continue
+            X, row_ids, errors = parse_batch_json(frames)
+            results = []
+            if len(row_ids):
+                pen, bead, def_prob = (np.round(v, 4).tolist() for v in predict_matrix(X))
+                for k, i in enumerate(row_ids.tolist()):
+                    results.append({"id": frame_id(frames[i], i), "penetration_mm": pen[k],
+                                    "bead_width_mm": bead[k], "defect_probability": def_prob[k]})
+            errors = [{"id": frame_id(frames[e["row"]], e["row"]), "error": e["error"]} for e in errors]
+            seen += len(frames)
+            ws.send(json.dumps({"results": results, "errors": errors,
+                                "queued": stream.queue.qsize(), "dropped": stream.dropped}))
+    except ConnectionClosed:
+        pass
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """Prometheus text format: per-stage and per-request latency histograms, counters, model timings."""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 @app.route("/health", methods=["GET"])
 def health():
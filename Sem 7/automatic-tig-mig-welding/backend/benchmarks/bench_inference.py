@@ -0,0 +1,76 @@
+"""
+Latency, throughput and accuracy of the inference engines (sklearn, flat, distilled).
+
+Usage (from the backend folder):
+  python benchmarks/bench_inference.py
+  python benchmarks/bench_inference.py --reps 2000 --batches 100 1000 10000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app  # noqa: E402
+import fast_forest  # noqa: E402
+
+
+def sklearn_predict(X):
+    models = app._models
+    x_scaled = models["scaler"].transform(X)
+    return (models["pen_model"].predict(x_scaled),
+            models["bead_model"].predict(x_scaled),
+            models["def_model"].predict_proba(x_scaled)[:, 1])
+
+
+def latency_us(fn, x, reps):
+    fn(x)  # warm-up
+    times = np.empty(reps)
+    for i in range(reps):
+        t0 = time.perf_counter()
+        fn(x)
+        times[i] = time.perf_counter() - t0
+    return np.percentile(times, [50, 99]) * 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--reps", type=int, default=200, help="single-row repetitions per engine")
+    ap.add_argument("--batches", type=int, nargs="+", default=[100, 1000, 10000])
+    args = ap.parse_args()
+
+    features = app._models["features"]
+    X = app.generate_synthetic_data(max(args.batches), random_state=123)[features].values
+
+    engines = {"sklearn": sklearn_predict,
+               "flat": fast_forest.FlatForest(app._models).predict,
+               "distilled": app.build_engine(app._models, "distilled").predict}
+
+    ref = sklearn_predict(X)
+    print("accuracy vs sklearn on %d rows (max / mean abs error: penetration, bead width, defect prob)" % len(X))
+    for name, fn in engines.items():
+        got = fn(X)
+        errs = ["%.2e/%.2e" % (np.abs(a - b).max(), np.abs(a - b).mean()) for a, b in zip(ref, got)]
+        print("  %-10s %s" % (name, "  ".join(errs)))
+
+    print("\nsingle-row latency (%d reps)" % args.reps)
+    print("  %-10s %10s %10s" % ("engine", "p50 (us)", "p99 (us)"))
+    for name, fn in engines.items():
+        p50, p99 = latency_us(fn, X[:1], args.reps)
+        print("  %-10s %10.1f %10.1f" % (name, p50, p99))
+
+    print("\nbatch throughput (rows/s)")
+    print("  %-10s" % "engine" + "".join("%12d" % n for n in args.batches))
+    for name, fn in engines.items():
+        row = []
+        for n in args.batches:
+            t0 = time.perf_counter()
+            fn(X[:n])
+            row.append(n / (time.perf_counter() - t0))
+        print("  %-10s" % name + "".join("%12.0f" % r for r in row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Overhead of the per-stage instrumentation.
+
+Measures the raw cost of one timer observation, then /predict and /simulate
+latency through the Flask test client with metrics on and off.
+
+Usage (from the backend folder):
+  python benchmarks/bench_metrics.py --reps 200
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("WELDING_CACHE", "0")  # measure the models, not cache hits
+import app  # noqa: E402
+import metrics  # noqa: E402
+
+
+def per_call_us(fn, reps):
+    fn()
+    times = np.empty(reps)
+    for i in range(reps):
+        t0 = time.perf_counter()
+        fn()
+        times[i] = time.perf_counter() - t0
+    return np.median(times) * 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--reps", type=int, default=100)
+    args = ap.parse_args()
+
+    hist = metrics.Histogram("bench_seconds", "benchmark only")
+    n = 200000
+    t0 = time.perf_counter()
+    for _ in range(n):
+        with hist.time(stage="x"):
+            pass
+    timer_ns = (time.perf_counter() - t0) / n * 1e9
+    print("one timed stage (enter + observe): %.0f ns" % timer_ns)
+
+    client = app.app.test_client()
+    calls = {
+        "/predict": lambda: client.post("/predict", json={"mode": 1, "current": 150}),
+        "/simulate (100 seg)": lambda: client.post("/simulate", json={"segments": 100}),
+    }
+    print("\n%-22s %14s %14s %10s" % ("endpoint", "metrics on us", "metrics off us", "overhead"))
+    for name, fn in calls.items():
+        metrics.ENABLED = True
+        on = per_call_us(fn, args.reps)
+        metrics.ENABLED = False
+        off = per_call_us(fn, args.reps)
+        metrics.ENABLED = True
+        print("%-22s %14.1f %14.1f %9.2f%%" % (name, on, off, 100.0 * (on - off) / off))
+
+
+if __name__ == "__main__":
+    main()
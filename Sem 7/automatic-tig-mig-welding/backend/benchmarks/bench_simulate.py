@@ -0,0 +1,71 @@
+"""
+Compares the old per-segment /simulate loop with the vectorized pass.
+
+Usage (from the backend folder):
+  python benchmarks/bench_simulate.py
+  python benchmarks/bench_simulate.py --sizes 10 1000 100000 --loop-cap 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app  # noqa: E402  (trains / loads the models on import)
+
+
+def simulate_loop(base, segments):
+    """The original /simulate body: one scaler call and three forest calls per segment."""
+    models = app._models
+    ts_idx = models["features"].index("travel_speed")
+    ta_idx = models["features"].index("torch_angle")
+    out = []
+    for i in range(segments):
+        frac = i / max(1, segments - 1)
+        local = base.copy()
+        local[ts_idx] = base[ts_idx] * (1 + 0.05 * np.sin(2 * np.pi * frac))
+        local[ta_idx] = base[ta_idx] + (0.5 * np.cos(2 * np.pi * frac))
+        x_scaled = models["scaler"].transform(local.reshape(1, -1))
+        pen = models["pen_model"].predict(x_scaled)[0]
+        bead = models["bead_model"].predict(x_scaled)[0]
+        def_prob = models["def_model"].predict_proba(x_scaled)[0][1]
+        out.append((pen, bead, def_prob))
+    return np.array(out)
+
+
+def simulate_vectorized(base, segments):
+    _, X = app.build_pass_matrix(base, segments)
+    return np.column_stack(app.predict_matrix(X))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 100000])
+    ap.add_argument("--loop-cap", type=int, default=2000,
+                    help="max segments actually run through the old loop; larger sizes are extrapolated")
+    args = ap.parse_args()
+
+    base = app.parse_input_json({}).reshape(-1)
+
+    # sanity check: both paths give the same numbers
+    ref = simulate_loop(base, 25)
+    new = simulate_vectorized(base, 25)
+    assert np.allclose(ref, new), "vectorized pass diverges from the loop"
+
+    print(f"{'segments':>10} {'loop (s)':>12} {'vectorized (s)':>15} {'speedup':>9}")
+    for n in args.sizes:
+        ran = min(n, args.loop_cap)
+        t0 = time.perf_counter()
+        simulate_loop(base, ran)
+        loop_s = (time.perf_counter() - t0) * n / ran
+        t0 = time.perf_counter()
+        simulate_vectorized(base, n)
+        vec_s = time.perf_counter() - t0
+        note = "" if ran == n else f"  (loop extrapolated from {ran})"
+        print(f"{n:>10} {loop_s:>12.3f} {vec_s:>15.4f} {loop_s / vec_s:>8.0f}x{note}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Added latency of per-tree uncertainty (std + quantiles) over the plain mean prediction.
+
+Usage (from the backend folder):
+  python benchmarks/bench_uncertainty.py
+  WELDING_INFERENCE=flat python benchmarks/bench_uncertainty.py --rows 1 100 1000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app  # noqa: E402
+
+
+def median_seconds(fn, reps):
+    fn()
+    times = []
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return float(np.median(times))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--rows", type=int, nargs="+", default=[1, 100, 10000])
+    ap.add_argument("--reps", type=int, default=5)
+    args = ap.parse_args()
+
+    X_all = app.generate_synthetic_data(max(args.rows), random_state=7)[app._models["features"]].values
+    print("engine: %s" % app.INFERENCE_ENGINE)
+    print("%8s %14s %18s %10s" % ("rows", "mean only ms", "with uncertainty ms", "added"))
+    for n in args.rows:
+        X = X_all[:n]
+        plain = median_seconds(lambda: app.predict_matrix(X), args.reps)
+        unc = median_seconds(lambda: app.predict_matrix_with_uncertainty(X), args.reps)
+        print("%8d %14.2f %18.2f %9.1f%%" % (n, plain * 1e3, unc * 1e3, 100 * (unc - plain) / plain))
+
+
+if __name__ == "__main__":
+    main()
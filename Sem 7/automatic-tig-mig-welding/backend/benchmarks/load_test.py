@@ -0,0 +1,164 @@
+"""
+Reproducible HTTP load test for /predict, /simulate and /health.
+
+For every endpoint and concurrency level, N client threads send requests over
+keep-alive connections for --duration seconds. Request bodies come from a fixed
+seed, so runs are comparable. Reports throughput and p50/p95/p99 latency.
+With --serve the prediction cache is off unless --cache is given: the bodies
+repeat, so with the cache on /predict and /simulate would mostly measure hits.
+
+Usage (from the backend folder):
+  python benchmarks/load_test.py --url http://127.0.0.1:5000
+  python benchmarks/load_test.py --serve 4             # start gunicorn with 4 workers first
+  python benchmarks/load_test.py --concurrency 1 8 32 --duration 20 --json results.json
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_bodies(endpoint, n, seed, segments):
+    rng = np.random.RandomState(seed)
+    bodies = []
+    for _ in range(n):
+        recipe = {
+            "mode": int(rng.randint(0, 2)),
+            "current": round(float(rng.uniform(40, 300)), 2),
+            "voltage": round(float(rng.uniform(10, 40)), 2),
+            "wire_feed_speed": round(float(rng.uniform(0, 20)), 2),
+            "travel_speed": round(float(rng.uniform(1, 15)), 2),
+            "torch_angle": round(float(rng.uniform(0, 15)), 2),
+            "gas_flow_rate": round(float(rng.uniform(5, 30)), 2),
+            "material_thickness": round(float(rng.uniform(0.5, 12)), 2),
+        }
+        if endpoint == "/simulate":
+            recipe.update({"length_mm": 100.0, "segments": segments})
+        bodies.append(json.dumps(recipe).encode())
+    return bodies
+
+
+def run_level(host, port, endpoint, concurrency, duration, bodies):
+    latencies = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+    stop = time.perf_counter() + duration
+
+    def client(k):
+        conn = http.client.HTTPConnection(host, port, timeout=60)
+        i = k
+        while time.perf_counter() < stop:
+            t0 = time.perf_counter()
+            try:
+                if endpoint == "/health":
+                    conn.request("GET", endpoint)
+                else:
+                    conn.request("POST", endpoint, body=bodies[i % len(bodies)],
+                                 headers={"Content-Type": "application/json"})
+                resp = conn.getresponse()
+                resp.read()
+                if resp.status != 200:
+                    errors[k] += 1
+            except (OSError, http.client.HTTPException):
+                errors[k] += 1
+                conn.close()
+                conn = http.client.HTTPConnection(host, port, timeout=60)
+            latencies[k].append(time.perf_counter() - t0)
+            i += concurrency
+        conn.close()
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(k,)) for k in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+
+    lat = np.concatenate([np.array(l) for l in latencies]) * 1000
+    p50, p95, p99 = np.percentile(lat, [50, 95, 99]) if len(lat) else (np.nan,) * 3
+    return {"endpoint": endpoint, "concurrency": concurrency, "requests": int(len(lat)),
+            "errors": int(sum(errors)), "rps": len(lat) / elapsed,
+            "p50_ms": p50, "p95_ms": p95, "p99_ms": p99}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_gunicorn(workers, cache):
+    port = free_port()
+    env = dict(os.environ, WELDING_WORKERS=str(workers), WELDING_BIND="127.0.0.1:%d" % port,
+               WELDING_CACHE="1" if cache else "0")
+    proc = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:app"],
+                            cwd=BACKEND_DIR, env=env)
+    deadline = time.time() + 300  # first start may train the models
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return proc, "http://127.0.0.1:%d" % port
+        except OSError:
+            time.sleep(0.5)
+    proc.terminate()
+    raise RuntimeError("gunicorn did not become healthy")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--url", default="http://127.0.0.1:5000")
+    ap.add_argument("--serve", type=int, metavar="WORKERS", help="start gunicorn with this many workers")
+    ap.add_argument("--endpoints", nargs="+", default=["/health", "/predict", "/simulate"])
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    ap.add_argument("--duration", type=float, default=10.0, help="seconds per endpoint and level")
+    ap.add_argument("--segments", type=int, default=100, help="segments per /simulate request")
+    ap.add_argument("--bodies", type=int, default=1000, help="distinct request bodies per endpoint")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--cache", action="store_true",
+                    help="with --serve, keep the prediction cache on (results then include cache hits)")
+    ap.add_argument("--json", help="also write the results to this file")
+    args = ap.parse_args()
+
+    proc = None
+    url = args.url
+    cache = "on" if args.cache else "off"
+    if args.serve:
+        proc, url = start_gunicorn(args.serve, args.cache)
+    else:
+        cache = "server setting"  # WELDING_CACHE of the running server
+    target = urlparse(url)
+    try:
+        results = []
+        print("prediction cache: %s" % cache)
+        print("%-10s %6s %9s %7s %10s %9s %9s %9s" % (
+            "endpoint", "conc", "requests", "errors", "req/s", "p50 ms", "p95 ms", "p99 ms"))
+        for endpoint in args.endpoints:
+            bodies = make_bodies(endpoint, args.bodies, args.seed, args.segments)
+            for c in args.concurrency:
+                r = run_level(target.hostname, target.port or 80, endpoint, c, args.duration, bodies)
+                results.append(r)
+                print("%-10s %6d %9d %7d %10.1f %9.2f %9.2f %9.2f" % (
+                    endpoint, c, r["requests"], r["errors"], r["rps"], r["p50_ms"], r["p95_ms"], r["p99_ms"]))
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump({"url": url, "workers": args.serve, "cache": cache, "results": results}, f, indent=2)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
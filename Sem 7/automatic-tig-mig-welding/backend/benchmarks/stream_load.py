@@ -0,0 +1,89 @@
+"""
+Load generator for the /ws/monitor stream: sends feature frames as fast as the
+server accepts them (or at a fixed --rate) and reports sustained frames/s and
+per-frame latency (send -> result received). Frames the server drops because its
+queue is full are counted separately.
+
+Usage (from the backend folder):
+  python benchmarks/stream_load.py --serve                # start the app in-process
+  python benchmarks/stream_load.py --url ws://host:5000/ws/monitor --frames 50000
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+from simple_websocket import Client, ConnectionClosed
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def serve_in_background():
+    from werkzeug.serving import make_server
+    import app
+    server = make_server("127.0.0.1", 0, app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return "ws://127.0.0.1:%d/ws/monitor" % server.server_port
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--url", default="ws://127.0.0.1:5000/ws/monitor")
+    ap.add_argument("--serve", action="store_true", help="run the app in this process on a free port")
+    ap.add_argument("--frames", type=int, default=20000)
+    ap.add_argument("--per-message", type=int, default=1, help="frames packed into one websocket message")
+    ap.add_argument("--rate", type=float, default=0, help="target frames/s (0 = as fast as possible)")
+    args = ap.parse_args()
+
+    url = serve_in_background() if args.serve else args.url
+    ws = Client.connect(url)
+    sent_at = np.zeros(args.frames)
+    latency = np.full(args.frames, np.nan)
+    rng = np.random.RandomState(0)
+    currents = rng.uniform(80, 250, size=args.frames)
+
+    def sender():
+        interval = args.per_message / args.rate if args.rate else 0
+        next_send = time.perf_counter()
+        for start in range(0, args.frames, args.per_message):
+            ids = range(start, min(start + args.per_message, args.frames))
+            msg = [{"id": i, "mode": 1, "current": float(currents[i]), "travel_speed": 6.0} for i in ids]
+            now = time.perf_counter()
+            sent_at[start:start + len(msg)] = now
+            ws.send(json.dumps(msg if len(msg) > 1 else msg[0]))
+            if interval:
+                next_send += interval
+                time.sleep(max(0, next_send - time.perf_counter()))
+
+    t0 = time.perf_counter()
+    threading.Thread(target=sender, daemon=True).start()
+    done = 0
+    dropped = 0
+    batches = 0
+    try:
+        while done + dropped < args.frames:
+            reply = json.loads(ws.receive(timeout=30))
+            now = time.perf_counter()
+            for r in reply["results"] + reply["errors"]:
+                latency[r["id"]] = now - sent_at[r["id"]]
+            done += len(reply["results"]) + len(reply["errors"])
+            dropped = reply.get("dropped", 0)
+            batches += 1
+    except (ConnectionClosed, TypeError):
+        print("stream ended early after %d frames" % done)
+    elapsed = time.perf_counter() - t0
+    ws.close()
+
+    lat_ms = latency[~np.isnan(latency)] * 1000
+    print("frames: %d in %.2fs -> %.0f frames/s sustained" % (done, elapsed, done / elapsed))
+    print("dropped by the server (queue full): %d" % dropped)
+    print("batches: %d (avg %.1f frames/batch)" % (batches, done / max(1, batches)))
+    print("latency ms: p50 %.2f  p95 %.2f  p99 %.2f  max %.2f" % tuple(
+        np.percentile(lat_ms, [50, 95, 99, 100])))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+# datagen.py
+# Synthetic welding dataset (physics-inspired), in memory or chunked on disk.
+#
+# generate_synthetic_data() builds one DataFrame, as the server does at startup.
+# The chunked mode below is for datasets that do not fit in RAM: sample i is
+# always drawn from block i // BLOCK_ROWS, and every block has its own RNG
+# stream derived from the seed, so the output is identical for any chunk size
+# or number of worker processes, and memory stays at one chunk per worker.
+#
+# Usage (from the backend folder):
+#   python datagen.py --out data/welds --rows 50000000 --chunk-rows 1000000 --format parquet
+import argparse
+import math
+import multiprocessing
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# ---------------------
+# Synthetic dataset generation (physics-inspired)
+# ---------------------
+def _synthesize(rng, n_samples):
+    """
+    Draws one block of samples from rng (np.random.RandomState or Generator)
+    and returns the columns as a dict of arrays.
+    """
+    # Features ranges (typical-ish values — for demo only)
+    mode = rng.choice([0, 1], size=n_samples, p=[0.5, 0.5])  # 0: TIG, 1: MIG
+    current = rng.uniform(40, 300, size=n_samples)  # Amps
+    voltage = rng.uniform(10, 40, size=n_samples)  # Volts
+    wire_feed_speed = rng.uniform(0, 20, size=n_samples)  # mm/s, relevant for MIG
+    travel_speed = rng.uniform(1, 15, size=n_samples)  # mm/s
+    torch_angle = rng.uniform(0, 15, size=n_samples)  # degrees
+    gas_flow_rate = rng.uniform(5, 30, size=n_samples)  # L/min
+    material_thickness = rng.uniform(0.5, 12, size=n_samples)  # mm
+
+    # Physics-inspired target generation:
+    # penetration increases with current and thickness, decreases with travel speed.
+    penetration = (
+        0.01 * current
+        + 0.2 * np.log1p(material_thickness)
+        - 0.3 * travel_speed
+        + 0.5 * mode  # MIG tends to give deeper penetration here in synthetic model
+    )
+    penetration += rng.normal(scale=0.5, size=n_samples)
+
+    # bead width influenced by voltage, current, and wire feed (for MIG)
+    bead_width = (
+        0.02 * voltage
+        + 0.01 * current
+        + 0.5 * wire_feed_speed * mode  # only for MIG (mode=1)
+        - 0.1 * travel_speed
+    )
+    bead_width += 0.2 * np.log1p(material_thickness) + rng.normal(scale=0.3, size=n_samples)
+    bead_width = np.clip(bead_width, 0.5, None)
+
+    # defect probability: higher when settings mismatch thickness (too much travel speed, too low gas, extreme torch angle)
+    mismatch_score = (
+        np.abs(0.5 * material_thickness - 0.01 * current)  # arbitrary mismatch formula
+        + 0.2 * np.maximum(0, travel_speed - (1 + 0.8 * material_thickness))
+        + 0.3 * np.maximum(0, 10 - gas_flow_rate)
+        + 0.05 * torch_angle
+    )
+    defect_prob = 1 / (1 + np.exp(-0.5 * (mismatch_score - 2.5)))  # logistic
+    defect = (rng.random(n_samples) < defect_prob).astype(int)
+
+    return {
+        "mode": mode,
+        "current": current,
+        "voltage": voltage,
+        "wire_feed_speed": wire_feed_speed,
+        "travel_speed": travel_speed,
+        "torch_angle": torch_angle,
+        "gas_flow_rate": gas_flow_rate,
+        "material_thickness": material_thickness,
+        "penetration": penetration,
+        "bead_width": bead_width,
+        "defect": defect
+    }
+
+def generate_synthetic_data(n_samples=2000, random_state=42):
+    rng = np.random.RandomState(random_state)
+    return pd.DataFrame(_synthesize(rng, n_samples))
+
+
+# ---------------------
+# Chunked, out-of-core generation
+# ---------------------
+BLOCK_ROWS = 1 << 16
+
+# on-disk dtypes: compact but exact for the values the generator produces
+FLOAT_COLUMNS = ["current", "voltage", "wire_feed_speed", "travel_speed", "torch_angle",
+                 "gas_flow_rate", "material_thickness", "penetration", "bead_width"]
+COLUMN_DTYPES = dict({"mode": np.int8, "defect": np.int8}, **{c: np.float32 for c in FLOAT_COLUMNS})
+COLUMNS = ["mode", "current", "voltage", "wire_feed_speed", "travel_speed", "torch_angle",
+           "gas_flow_rate", "material_thickness", "penetration", "bead_width", "defect"]
+
+
+def _block(seed, block_id, n_rows):
+    rng = np.random.Generator(np.random.PCG64(np.random.SeedSequence(seed, spawn_key=(block_id,))))
+    cols = _synthesize(rng, n_rows)
+    return {c: cols[c].astype(COLUMN_DTYPES[c]) for c in COLUMNS}
+
+
+def synthetic_rows(start, stop, n_samples, seed):
+    """Rows [start, stop) of the chunked dataset as a DataFrame."""
+    parts = []
+    for block_id in range(start // BLOCK_ROWS, (stop - 1) // BLOCK_ROWS + 1):
+        b0 = block_id * BLOCK_ROWS
+        cols = _block(seed, block_id, min(BLOCK_ROWS, n_samples - b0))
+        lo, hi = max(start, b0) - b0, min(stop, b0 + BLOCK_ROWS) - b0
+        parts.append({c: v[lo:hi] for c, v in cols.items()})
+    return pd.DataFrame({c: np.concatenate([p[c] for p in parts]) for c in COLUMNS})
+
+
+def iter_synthetic_chunks(n_samples, chunk_rows=1_000_000, seed=42):
+    """Yields DataFrames of at most chunk_rows rows covering n_samples rows."""
+    for start in range(0, n_samples, chunk_rows):
+        yield synthetic_rows(start, min(start + chunk_rows, n_samples), n_samples, seed)
+
+
+def _write_chunk(args):
+    out, fmt, k, start, stop, n_samples, seed = args
+    df = synthetic_rows(start, stop, n_samples, seed)
+    if fmt == "parquet":
+        df.to_parquet(os.path.join(out, "part-%05d.parquet" % k), index=False)
+    else:
+        for c in COLUMNS:
+            arr = np.load(os.path.join(out, c + ".npy"), mmap_mode="r+")
+            arr[start:stop] = df[c].to_numpy()
+            arr.flush()
+            del arr
+    return stop - start
+
+
+def write_synthetic_dataset(out, n_samples, chunk_rows=1_000_000, seed=42, fmt="parquet", workers=None):
+    """
+    Writes n_samples rows to folder out, one chunk per task, in parallel.
+    fmt="parquet": one part-NNNNN.parquet file per chunk (needs pyarrow).
+    fmt="npy": one memory-mappable <column>.npy file per column.
+    Both layouts can be read back with training.load_dataset().
+    """
+    if fmt not in ("parquet", "npy"):
+        raise ValueError("fmt must be 'parquet' or 'npy'")
+    os.makedirs(out, exist_ok=True)
+    if fmt == "npy":
+        for c in COLUMNS:
+            np.lib.format.open_memmap(os.path.join(out, c + ".npy"), mode="w+",
+                                      dtype=COLUMN_DTYPES[c], shape=(n_samples,))
+    n_chunks = math.ceil(n_samples / chunk_rows)
+    tasks = [(out, fmt, k, k * chunk_rows, min((k + 1) * chunk_rows, n_samples), n_samples, seed)
+             for k in range(n_chunks)]
+    workers = workers or os.cpu_count()
+    written = 0
+    if workers > 1 and n_chunks > 1:
+        with multiprocessing.Pool(min(workers, n_chunks)) as pool:
+            for n in pool.imap_unordered(_write_chunk, tasks):
+                written += n
+    else:
+        for task in tasks:
+            written += _write_chunk(task)
+    return written
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Write a chunked synthetic welding dataset to disk.")
+    ap.add_argument("--out", required=True, help="output folder")
+    ap.add_argument("--rows", type=int, required=True)
+    ap.add_argument("--chunk-rows", type=int, default=1_000_000)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--format", choices=["parquet", "npy"], default="parquet")
+    ap.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    n = write_synthetic_dataset(args.out, args.rows, args.chunk_rows, args.seed, args.format, args.workers)
+    elapsed = time.perf_counter() - t0
+    print("wrote %d rows to %s in %.2fs (%.0f rows/s)" % (n, args.out, elapsed, n / elapsed))
+
+
+if __name__ == "__main__":
+    main()
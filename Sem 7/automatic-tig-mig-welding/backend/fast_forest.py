@@ -0,0 +1,199 @@
+# fast_forest.py
+# Optional fast inference engine for the welding models.
+#
+# The scaler and all trees of pen_model, bead_model and def_model are flattened
+# into one set of contiguous node arrays. Prediction walks every (row, tree)
+# pair down the trees at once with NumPy fancy indexing, one level per step,
+# instead of going through sklearn's per-estimator predict machinery (which
+# dispatches every tree through joblib and dominates single-row latency).
+# For large batches sklearn's compiled per-tree loop is faster again; app.py
+# only routes batches up to FAST_MAX_ROWS rows to the engine.
+#
+# Tolerance: FlatForest follows sklearn's exact decision rule (features cast to
+# float32, go left when x <= threshold) and averages the same leaf values, so
+# outputs match the original forests up to float summation order (< 1e-9).
+# A distilled engine (see distill()) is smaller and faster but approximate;
+# bench_inference.py reports its error against the full forests.
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+
+# engine output order, matches app.predict_matrix()
+MODEL_NAMES = ("pen_model", "bead_model", "def_model")
+
+
+def _tree_arrays(est, classifier):
+    t = est.tree_
+    left = t.children_left.astype(np.int32)
+    right = t.children_right.astype(np.int32)
+    leaf = left == -1
+    idx = np.arange(t.node_count, dtype=np.int32)
+    # leaves point to themselves, which is also how is_leaf is recognised later
+    left = np.where(leaf, idx, left)
+    right = np.where(leaf, idx, right)
+    feature = np.where(leaf, 0, t.feature).astype(np.int32)
+    threshold = np.where(leaf, np.inf, t.threshold)
+    if classifier:
+        v = t.value[:, 0, :]
+        value = v[:, 1] / v.sum(axis=1)  # probability of class 1 (defect)
+    else:
+        value = t.value[:, 0, 0]
+    return left, right, feature, threshold, value
+
+
+class FlatForest:
+    """
+    All trees of several forests packed into flat arrays.
+    predict(X) takes raw (unscaled) features and returns one 1-D array per forest.
+    """
+
+    def __init__(self, models, names=MODEL_NAMES, block_rows=2048):
+        scaler = models["scaler"]
+        self.mean = np.asarray(scaler.mean_, dtype=np.float64)
+        self.scale = np.asarray(scaler.scale_, dtype=np.float64)
+        self.names = tuple(names)
+        self.block_rows = block_rows
+
+        lefts, rights, feats, thrs, vals, roots, owner = [], [], [], [], [], [], []
+        offset = 0
+        for k, name in enumerate(self.names):
+            forest = models[name]
+            classifier = hasattr(forest, "classes_")
+            if classifier and list(forest.classes_) != [0, 1]:
+                raise ValueError("%s: expected binary classes [0, 1]" % name)
+            for est in forest.estimators_:
+                left, right, feature, threshold, value = _tree_arrays(est, classifier)
+                lefts.append(left + offset)
+                rights.append(right + offset)
+                feats.append(feature)
+                thrs.append(threshold)
+                vals.append(value)
+                roots.append(offset)
+                owner.append(k)
+                offset += len(left)
+
+        # children[node, 0] = left, children[node, 1] = right
+        self.children = np.ascontiguousarray(np.stack([np.concatenate(lefts), np.concatenate(rights)], axis=1))
+        self.feature = np.concatenate(feats)
+        self.threshold = np.concatenate(thrs)
+        self.value = np.concatenate(vals)
+        self.is_leaf = self.children[:, 0] == np.arange(len(self.feature))
+        self.roots = np.array(roots, dtype=np.int32)
+        self.owner = np.array(owner, dtype=np.int32)
+        self.n_trees_per_model = np.bincount(self.owner, minlength=len(self.names))
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.children, self.feature, self.threshold, self.value, self.roots))
+
+    def _leaf_values(self, Xs):
+        # Xs: (n, n_features) float32, already scaled -> (n, n_trees) leaf values.
+        # Every (row, tree) pair is one slot; slots that reached a leaf are dropped
+        # from the active set, so the work is the sum of path lengths, not n * depth.
+        n, n_features = Xs.shape
+        n_trees = len(self.roots)
+        nodes = np.tile(self.roots, n)
+        flat_x = Xs.ravel()
+        active = np.arange(n * n_trees)
+        cur = nodes
+        row_off = np.repeat(np.arange(n) * n_features, n_trees)
+        while active.size:
+            go_right = flat_x[row_off + self.feature[cur]] > self.threshold[cur]
+            cur = self.children[cur, go_right.view(np.int8)]
+            nodes[active] = cur
+            inner = ~self.is_leaf[cur]
+            active, cur, row_off = active[inner], cur[inner], row_off[inner]
+        return self.value[nodes].reshape(n, n_trees)
+
+    def _scaled(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        # same arithmetic as StandardScaler.transform, then sklearn's float32 cast
+        return ((X - self.mean) / self.scale).astype(np.float32)
+
+    def predict(self, X):
+        Xs = self._scaled(X)
+        out = np.empty((len(self.names), Xs.shape[0]))
+        for start in range(0, Xs.shape[0], self.block_rows):
+            leaf = self._leaf_values(Xs[start:start + self.block_rows])
+            sums = np.zeros((leaf.shape[0], len(self.names)))
+            for k in range(len(self.names)):
+                sums[:, k] = leaf[:, self.owner == k].sum(axis=1)
+            out[:, start:start + leaf.shape[0]] = (sums / self.n_trees_per_model).T
+        return tuple(out)
+
+    def predict_stats(self, X, spread_names, quantiles):
+        """
+        Like predict(), plus the spread of the per-tree outputs for the forests in
+        spread_names, from the same traversal. Returns (means, spread) where spread
+        maps name -> (std, quantile array of shape (len(quantiles), n_rows)).
+        """
+        Xs = self._scaled(X)
+        n = Xs.shape[0]
+        means = np.empty((len(self.names), n))
+        spread = {name: (np.empty(n), np.empty((len(quantiles), n))) for name in spread_names}
+        for start in range(0, n, self.block_rows):
+            leaf = self._leaf_values(Xs[start:start + self.block_rows])
+            sl = slice(start, start + leaf.shape[0])
+            for k, name in enumerate(self.names):
+                per_tree = leaf[:, self.owner == k]
+                if name in spread:
+                    means[k, sl], spread[name][0][sl], spread[name][1][:, sl] = tree_stats(per_tree, quantiles)
+                else:
+                    means[k, sl] = per_tree.mean(axis=1)
+        return tuple(means), spread
+
+
+def tree_stats(per_tree, quantiles):
+    """(mean, std, quantiles) across trees of a (n_rows, n_trees) matrix of tree outputs."""
+    return per_tree.mean(axis=1), per_tree.std(axis=1), np.quantile(per_tree, quantiles, axis=1)
+
+
+def sklearn_forest_stats(forest, x_scaled, quantiles, block_rows=4096):
+    """
+    tree_stats() for a fitted sklearn forest regressor: every tree is evaluated
+    once, which is the same work forest.predict() does to compute the mean.
+    """
+    x32 = np.ascontiguousarray(x_scaled, dtype=np.float32)
+    n = x32.shape[0]
+    mean, std = np.empty(n), np.empty(n)
+    qs = np.empty((len(quantiles), n))
+    for start in range(0, n, block_rows):
+        block = x32[start:start + block_rows]
+        per_tree = np.column_stack([est.predict(block, check_input=False) for est in forest.estimators_])
+        sl = slice(start, start + block.shape[0])
+        mean[sl], std[sl], qs[:, sl] = tree_stats(per_tree, quantiles)
+    return mean, std, qs
+
+
+def distill(models, n_samples=50_000, n_estimators=16, max_depth=10, random_state=0, sample_fn=None):
+    """
+    Trains small regression forests that mimic the full models on sampled inputs
+    (the defect classifier is distilled as a regressor on its probability).
+    sample_fn(n, rng) returns raw feature rows; by default features are drawn
+    uniformly within +/- 3 standard deviations of the training data.
+    Returns a models-like dict that FlatForest accepts.
+    """
+    rng = np.random.RandomState(random_state)
+    scaler = models["scaler"]
+    if sample_fn is None:
+        lo = scaler.mean_ - 3 * scaler.scale_
+        hi = scaler.mean_ + 3 * scaler.scale_
+        X = rng.uniform(lo, hi, size=(n_samples, len(scaler.mean_)))
+    else:
+        X = sample_fn(n_samples, rng)
+    Xs = scaler.transform(X)
+    # large batch: sklearn's own predict is the faster teacher here
+    targets = (models["pen_model"].predict(Xs),
+               models["bead_model"].predict(Xs),
+               models["def_model"].predict_proba(Xs)[:, 1])
+
+    small = {"scaler": scaler, "features": models["features"]}
+    for name, y in zip(MODEL_NAMES, targets):
+        student = RandomForestRegressor(n_estimators=n_estimators, max_depth=max_depth,
+                                        random_state=random_state, n_jobs=-1)
+        student.fit(Xs, y)
+        student.set_params(n_jobs=None)
+        small[name] = student
+    return small
@@ -0,0 +1,24 @@
+# gunicorn.conf.py
+# Production serving mode for the welding backend.
+# Usage (from the backend folder):  gunicorn -c gunicorn.conf.py app:app
+#
+#   WELDING_BIND     address to listen on (default 0.0.0.0:5000)
+#   WELDING_WORKERS  worker processes (default: number of cores)
+#   WELDING_THREADS  threads per worker (default 4; /ws/monitor holds one thread per stream)
+import multiprocessing
+import os
+
+bind = os.environ.get("WELDING_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("WELDING_WORKERS", multiprocessing.cpu_count()))
+
+# Threads let a worker keep serving while another request waits on I/O or a
+# websocket; model inference itself holds the GIL, so CPU scales with workers.
+worker_class = "gthread"
+threads = int(os.environ.get("WELDING_THREADS", 4))
+
+# Import app.py (and load the models) once in the master, then fork the workers,
+# so every worker shares the same copy-on-write pages for the forest arrays.
+preload_app = True
+
+# /simulate with very long passes and /optimize can take a few seconds
+timeout = 120
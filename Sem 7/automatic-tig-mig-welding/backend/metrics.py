@@ -0,0 +1,134 @@
+# metrics.py
+# Minimal Prometheus-style metrics for the welding API (no extra dependency).
+#
+# Counters and histograms live in process memory. With several gunicorn
+# workers every worker keeps its own numbers and a scrape of /metrics sees the
+# worker that answered it.
+# WELDING_METRICS=0 turns every timer and counter into a no-op.
+import bisect
+import os
+import threading
+import time
+
+ENABLED = os.environ.get("WELDING_METRICS", "1") != "0"
+
+# seconds; per-stage times range from microseconds (parsing) to seconds (long passes)
+DEFAULT_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = []
+
+
+def _label_str(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join('%s="%s"' % (k, str(v).replace('"', '\\"')) for k, v in labels) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name, self.help = name, help_text
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        if not ENABLED:
+            return
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = ["# HELP %s %s" % (self.name, self.help), "# TYPE %s counter" % self.name]
+        with self._lock:
+            values = list(self._values.items())
+        for key, v in sorted(values):
+            lines.append("%s%s %s" % (self.name, _label_str(key), v))
+        return lines
+
+
+class Gauge(Counter):
+    def set(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = value
+
+    def render(self):
+        lines = super().render()
+        lines[1] = "# TYPE %s gauge" % self.name
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name, self.help = name, help_text
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        if not ENABLED:
+            return
+        key = tuple(sorted(labels.items()))
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(key)
+            if s is None:
+                s = self._series[key] = [0] * (len(self.buckets) + 2)
+            s[i] += 1
+            s[-1] += value
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def render(self):
+        lines = ["# HELP %s %s" % (self.name, self.help), "# TYPE %s histogram" % self.name]
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        for key, s in sorted(series.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + ("+Inf",), s[:-1]):
+                cumulative += n
+                lines.append("%s_bucket%s %d" % (self.name, _label_str(key + (("le", bound),)), cumulative))
+            lines.append("%s_sum%s %.9f" % (self.name, _label_str(key), s[-1]))
+            lines.append("%s_count%s %d" % (self.name, _label_str(key), cumulative))
+        return lines
+
+
+class _Timer:
+    __slots__ = ("hist", "labels", "start")
+
+    def __init__(self, hist, labels):
+        self.hist, self.labels = hist, labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+def render():
+    """All registered metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ---------------------
+# Welding API metrics
+# ---------------------
+STAGE_SECONDS = Histogram("welding_stage_seconds",
+                          "Time spent per request stage (json_parse, parse_input, scale, "
+                          "pen_model, bead_model, def_model, engine, serialize)")
+REQUEST_SECONDS = Histogram("welding_request_seconds", "End-to-end request latency per endpoint")
+REQUESTS = Counter("welding_requests_total", "Requests per endpoint and HTTP status")
+ERRORS = Counter("welding_errors_total", "Requests that failed with an unhandled exception")
+ROWS = Counter("welding_predicted_rows_total", "Feature rows scored by the models")
+MODEL_LOAD_SECONDS = Gauge("welding_model_load_seconds", "Time to load (or train) the models at startup")
+MODEL_TRAIN_SECONDS = Gauge("welding_model_train_seconds", "Wall-clock training time per model")
@@ -0,0 +1,114 @@
+# model_store.py
+# On-disk store for the trained welding models (scaler + three forests + feature list).
+#
+# Each artifact lives in its own folder named after a hash of everything that
+# determines the trained models (data-generation parameters, model version,
+# scikit-learn version), so the server only retrains when one of those changes.
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import joblib
+import sklearn
+
+MODELS_FILE = "models.joblib"
+META_FILE = "meta.json"
+DEFAULT_STORE_DIR = os.environ.get(
+    "WELDING_MODEL_STORE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_store")
+)
+
+
+def params_hash(data_params, model_version):
+    """
+    Stable short hash of the inputs that define a trained model set.
+    """
+    key = {
+        "data_params": data_params,
+        "model_version": model_version,
+        "sklearn": sklearn.__version__,
+    }
+    blob = json.dumps(key, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(blob).hexdigest()[:16]
+
+
+def save_models(models, store_dir, version, meta=None):
+    """
+    Writes models to <store_dir>/<version>/ atomically (temp folder + rename).
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    final_dir = os.path.join(store_dir, version)
+    tmp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=store_dir)
+    try:
+        joblib.dump(models, os.path.join(tmp_dir, MODELS_FILE))
+        info = dict(meta or {})
+        info.update({"version": version, "features": models["features"], "saved_at": time.time()})
+        with open(os.path.join(tmp_dir, META_FILE), "w") as f:
+            json.dump(info, f, indent=2)
+        # another worker may have stored the same version meanwhile; keep theirs
+        if os.path.isdir(final_dir):
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        else:
+            os.replace(tmp_dir, final_dir)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not os.path.isdir(final_dir):
+            raise
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return final_dir
+
+
+def load_models(store_dir, version):
+    """
+    Loads a stored model set into process memory (sklearn trees copy their node
+    arrays on unpickling, so memory mapping would not save anything). Workers share
+    one copy only when the app is preloaded before forking; see gunicorn.conf.py.
+    Returns None when the version is not in the store.
+    """
+    path = os.path.join(store_dir, version, MODELS_FILE)
+    if not os.path.isfile(path):
+        return None
+    return joblib.load(path)
+
+
+def save_artifact(obj, store_dir, version, name):
+    """Stores an extra object (e.g. a distilled engine) next to a model version."""
+    path = os.path.join(store_dir, version, name)
+    tmp = path + ".tmp-%d" % os.getpid()
+    joblib.dump(obj, tmp)
+    os.replace(tmp, path)
+    return path
+
+
+def load_artifact(store_dir, version, name):
+    """Loads an extra object saved with save_artifact(), or None if it is missing."""
+    path = os.path.join(store_dir, version, name)
+    if not os.path.isfile(path):
+        return None
+    return joblib.load(path)
+
+
+def load_or_train(store_dir, data_params, model_version, generate_fn, train_fn):
+    """
+    Returns (models, info). Loads the stored artifact matching the current
+    parameters, otherwise generates data, trains, saves and returns the new models.
+    """
+    version = params_hash(data_params, model_version)
+    t0 = time.perf_counter()
+    models = load_models(store_dir, version)
+    if models is not None:
+        return models, {"version": version, "source": "store",
+                        "load_seconds": time.perf_counter() - t0}
+
+    df = generate_fn(**data_params)
+    models = train_fn(df)
+    train_seconds = time.perf_counter() - t0
+    save_models(models, store_dir, version,
+                meta={"data_params": data_params, "model_version": model_version,
+                      "train_seconds": train_seconds,
+                      "train_report": models.get("train_report")})
+    return models, {"version": version, "source": "trained", "load_seconds": train_seconds}
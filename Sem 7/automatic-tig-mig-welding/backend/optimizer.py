@@ -0,0 +1,96 @@
+# optimizer.py
+# Inverse search over the welding models: find process settings that give a
+# target penetration (and optionally bead width) while keeping the predicted
+# defect probability below a limit.
+#
+# Uses the cross-entropy method: each iteration samples a whole population of
+# candidate recipes, scores it with one vectorized predict call, and refits a
+# per-feature normal distribution to the best (elite) candidates.
+import numpy as np
+
+# Search ranges, same as generate_synthetic_data()
+FEATURE_BOUNDS = {
+    "current": (40.0, 300.0),
+    "voltage": (10.0, 40.0),
+    "wire_feed_speed": (0.0, 20.0),
+    "travel_speed": (1.0, 15.0),
+    "torch_angle": (0.0, 15.0),
+    "gas_flow_rate": (5.0, 30.0),
+}
+
+# score offset for recipes that break the defect constraint, so any feasible recipe wins
+INFEASIBLE_PENALTY = 1e3
+
+
+def score_candidates(pen, bead, def_prob, target_penetration, max_defect_probability,
+                     target_bead_width=None):
+    """Lower is better. Squared error to the targets, plus a penalty above the defect limit."""
+    score = (pen - target_penetration) ** 2
+    if target_bead_width is not None:
+        score = score + (bead - target_bead_width) ** 2
+    excess = def_prob - max_defect_probability
+    return np.where(excess > 0, INFEASIBLE_PENALTY + excess, score)
+
+
+def optimize_recipe(predict_fn, features, fixed, target_penetration, max_defect_probability,
+                    target_bead_width=None, bounds=None, population=2048, iterations=8,
+                    elite_frac=0.05, top_k=5, seed=0):
+    """
+    predict_fn(X) -> (penetration, bead_width, defect_probability) for a raw feature matrix.
+    fixed maps features that are not searched (mode, material_thickness) to their values.
+    Returns a dict with the best recipes (best first) and search statistics.
+    """
+    bounds = dict(FEATURE_BOUNDS, **(bounds or {}))
+    search = [f for f in features if f not in fixed]
+    missing = [f for f in search if f not in bounds]
+    if missing:
+        raise ValueError("no bounds for: " + ", ".join(missing))
+    lo = np.array([bounds[f][0] for f in search], dtype=float)
+    hi = np.array([bounds[f][1] for f in search], dtype=float)
+    if np.any(lo > hi):
+        raise ValueError("every bound must be [low, high] with low <= high")
+    cols = [features.index(f) for f in search]
+
+    rng = np.random.RandomState(seed)
+    mean = (lo + hi) / 2
+    std = (hi - lo) / 2
+    n_elite = max(1, int(population * elite_frac))
+    template = np.array([float(fixed.get(f, 0.0)) for f in features])
+
+    best_X = np.empty((0, len(features)))
+    best_out = np.empty((0, 4))
+    evaluated = 0
+    for it in range(iterations):
+        if it == 0:
+            cand = rng.uniform(lo, hi, size=(population, len(search)))
+        else:
+            cand = np.clip(rng.normal(mean, std, size=(population, len(search))), lo, hi)
+        X = np.repeat(template[None, :], population, axis=0)
+        X[:, cols] = cand
+        pen, bead, def_prob = predict_fn(X)
+        score = score_candidates(pen, bead, def_prob, target_penetration,
+                                 max_defect_probability, target_bead_width)
+        evaluated += population
+
+        elite = np.argsort(score)[:n_elite]
+        mean = cand[elite].mean(axis=0)
+        std = np.maximum(cand[elite].std(axis=0), 1e-3 * (hi - lo))
+
+        # keep a running pool of the overall best candidates
+        best_X = np.vstack([best_X, X[elite]])
+        best_out = np.vstack([best_out, np.column_stack([pen, bead, def_prob, score])[elite]])
+        keep = np.argsort(best_out[:, 3])[:max(top_k, n_elite)]
+        best_X, best_out = best_X[keep], best_out[keep]
+
+    recipes = []
+    for x, (pen, bead, def_prob, score) in zip(best_X[:top_k], best_out[:top_k]):
+        recipes.append({
+            "settings": {f: float(np.round(x[j], 4)) for j, f in enumerate(features)},
+            "penetration_mm": float(np.round(pen, 4)),
+            "bead_width_mm": float(np.round(bead, 4)),
+            "defect_probability": float(np.round(def_prob, 4)),
+            "feasible": bool(def_prob <= max_defect_probability),
+            "score": float(score),
+        })
+    return {"recipes": recipes, "evaluated": evaluated, "iterations": iterations,
+            "population": population}
@@ -0,0 +1,170 @@
+# prediction_cache.py
+# Cache of (penetration, bead_width, defect_probability) per feature vector.
+#
+# Keys are the raw feature vector quantized to a grid (quantum), so recipes that
+# differ only by float noise share an entry. Entries are tagged with the model
+# version; a new version empties the cache. The in-process backend is an LRU with
+# a TTL and a memory cap; the optional Redis backend is shared by all workers.
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+try:
+    import redis  # optional, only for the shared backend
+except ImportError:
+    redis = None
+
+# rough per-entry cost in the in-process backend: key bytes, tuple, floats, OrderedDict node
+ENTRY_BYTES = 320
+N_OUTPUTS = 3
+
+
+class PredictionCache:
+    """
+    In-process LRU cache. get_many()/put_many() work on whole feature matrices.
+    quantum is one grid step for all features or a list with one step per feature.
+    """
+
+    def __init__(self, max_bytes=16 * 2**20, ttl=3600.0, quantum=1e-3):
+        self.max_entries = max(1, int(max_bytes // ENTRY_BYTES))
+        self.ttl = ttl
+        self.quantum = np.asarray(quantum, dtype=float)
+        self.version = None
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def keys(self, X):
+        q = np.round(np.asarray(X, dtype=float) / self.quantum).astype(np.int64)
+        return [row.tobytes() for row in q]
+
+    def check_version(self, version):
+        """Drops every entry when the models changed."""
+        if version != self.version:
+            with self._lock:
+                self._data.clear()
+                self.version = version
+
+    def get_many(self, keys):
+        """Returns (values (n, 3) with NaN for misses, hit mask)."""
+        out = np.full((len(keys), N_OUTPUTS), np.nan)
+        hit = np.zeros(len(keys), dtype=bool)
+        now = time.monotonic()
+        with self._lock:
+            for i, k in enumerate(keys):
+                entry = self._data.get(k)
+                if entry is None:
+                    continue
+                expires, values = entry
+                if self.ttl and expires < now:
+                    del self._data[k]
+                    continue
+                self._data.move_to_end(k)
+                out[i] = values
+                hit[i] = True
+            n_hit = int(hit.sum())
+            self.hits += n_hit
+            self.misses += len(keys) - n_hit
+        return out, hit
+
+    def put_many(self, keys, values):
+        expires = time.monotonic() + (self.ttl or 0)
+        with self._lock:
+            for k, v in zip(keys, values.tolist()):
+                self._data[k] = (expires, tuple(v))
+                self._data.move_to_end(k)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "backend": "memory",
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "approx_bytes": len(self._data) * ENTRY_BYTES,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else None,
+            "ttl_seconds": self.ttl,
+        }
+
+
+class RedisPredictionCache(PredictionCache):
+    """
+    Same interface, stored in Redis so every worker shares one cache. Keys carry
+    the model version, so old entries are never read again and age out via the TTL.
+    The memory cap and LRU eviction are Redis settings (maxmemory, allkeys-lru).
+    Hit/miss counters are per worker.
+    """
+
+    def __init__(self, url, ttl=3600.0, quantum=1e-3, prefix="welding:pred:"):
+        if redis is None:
+            raise ImportError("the shared prediction cache needs the 'redis' package")
+        super().__init__(ttl=ttl, quantum=quantum)
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def check_version(self, version):
+        self.version = version
+
+    def _rkey(self, k):
+        return self.prefix.encode() + str(self.version).encode() + b":" + k
+
+    def get_many(self, keys):
+        out = np.full((len(keys), N_OUTPUTS), np.nan)
+        hit = np.zeros(len(keys), dtype=bool)
+        if keys:
+            for i, raw in enumerate(self.client.mget([self._rkey(k) for k in keys])):
+                if raw is not None:
+                    out[i] = np.frombuffer(raw, dtype=np.float64)
+                    hit[i] = True
+        n_hit = int(hit.sum())
+        self.hits += n_hit
+        self.misses += len(keys) - n_hit
+        return out, hit
+
+    def put_many(self, keys, values):
+        pipe = self.client.pipeline(transaction=False)
+        ttl = int(self.ttl) if self.ttl else None
+        for k, v in zip(keys, np.asarray(values, dtype=np.float64)):
+            pipe.set(self._rkey(k), v.tobytes(), ex=ttl)
+        pipe.execute()
+
+    def clear(self):
+        for k in self.client.scan_iter(self.prefix.encode() + b"*"):
+            self.client.delete(k)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "backend": "redis",
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else None,
+            "ttl_seconds": self.ttl,
+        }
+
+
+def cached_predict(cache, predict_fn, X, version):
+    """
+    predict_fn over X, answering rows from the cache where possible.
+    Only the missing rows are scored, in one predict_fn call.
+    """
+    cache.check_version(version)
+    keys = cache.keys(X)
+    out, hit = cache.get_many(keys)
+    miss = np.flatnonzero(~hit)
+    if len(miss):
+        fresh = np.column_stack(predict_fn(X[miss]))
+        out[miss] = fresh
+        cache.put_many([keys[i] for i in miss], fresh)
+    return out[:, 0], out[:, 1], out[:, 2]
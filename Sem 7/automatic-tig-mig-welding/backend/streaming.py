@@ -0,0 +1,93 @@
+# streaming.py
+# Micro-batching helpers for the /ws/monitor live-weld stream.
+#
+# A reader thread pulls JSON messages off the websocket into a bounded queue.
+# simple_websocket keeps reading the socket into its own unbounded buffer in a
+# background thread, so blocking our reader would not slow the sender down.
+# Instead, when the queue is full the oldest frame is dropped (and counted):
+# a live monitor wants the newest readings, and memory and latency stay bounded.
+# The handler thread drains the queue in micro-batches, bounded both in size
+# and in how long the first frame of a batch may wait.
+import json
+import queue
+import threading
+import time
+
+from simple_websocket import ConnectionClosed
+
+
+class FrameStream:
+    """
+    Bounded queue of incoming feature frames read from a websocket.
+    A message may hold one frame (JSON object) or several (JSON array).
+    Messages that are not valid JSON are queued as-is and reported as row errors.
+    When the queue is full the oldest frame is dropped; `dropped` counts them.
+    """
+
+    def __init__(self, ws, max_queue=1024):
+        self.ws = ws
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.closed = threading.Event()
+        self.received = 0
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._read, daemon=True)
+        self._thread.start()
+
+    def _read(self):
+        try:
+            while True:
+                msg = self.ws.receive()
+                try:
+                    payload = json.loads(msg)
+                except (TypeError, ValueError):
+                    payload = msg
+                frames = payload if isinstance(payload, list) else [payload]
+                for frame in frames:
+                    self._put(frame)
+                    self.received += 1
+        except ConnectionClosed:
+            pass
+        finally:
+            self.closed.set()
+
+    def _put(self, frame):
+        while True:
+            try:
+                self.queue.put_nowait(frame)
+                return
+            except queue.Full:
+                pass
+            try:
+                self.queue.get_nowait()  # drop the oldest frame
+                self.dropped += 1
+            except queue.Empty:
+                pass
+
+    @property
+    def finished(self):
+        return self.closed.is_set() and self.queue.empty()
+
+    def next_batch(self, max_batch, max_wait):
+        """
+        Returns up to max_batch frames. Waits for the first frame (up to 0.1s so the
+        caller can notice a closed stream), then at most max_wait seconds for more.
+        """
+        try:
+            batch = [self.queue.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + max_wait
+        while len(batch) < max_batch:
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
@@ -0,0 +1,46 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("WELDING_CACHE", "0")
+
+import app  # noqa: E402
+
+
+class SimulateTest(unittest.TestCase):
+    def setUp(self):
+        self.client = app.app.test_client()
+
+    def test_no_segments_gives_an_empty_simulation(self):
+        for segments in (0, -3):
+            r = self.client.post("/simulate", json={"segments": segments})
+            self.assertEqual(r.status_code, 200, r.get_json())
+            self.assertEqual(r.get_json()["simulation"], [])
+            self.assertEqual(r.get_json()["segments"], segments)
+
+    def test_segments(self):
+        r = self.client.post("/simulate", json={"segments": 5})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(len(r.get_json()["simulation"]), 5)
+
+
+class QuantilesTest(unittest.TestCase):
+    def setUp(self):
+        self.client = app.app.test_client()
+
+    def test_bad_quantiles_are_rejected(self):
+        for quantiles in ([], [1.5], [-0.1, 0.5], ["a"], [None], 5, "0.5"):
+            for endpoint in ("/predict", "/simulate"):
+                r = self.client.post(endpoint, json={"uncertainty": True, "quantiles": quantiles})
+                self.assertEqual(r.status_code, 400, (endpoint, quantiles, r.get_json()))
+                self.assertIn("quantiles", r.get_json()["error"])
+
+    def test_quantiles(self):
+        r = self.client.post("/predict", json={"uncertainty": True, "quantiles": [0.1, 0.9]})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(sorted(r.get_json()["uncertainty"]["penetration_mm"]["quantiles"]), ["0.1", "0.9"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,198 @@
+# training.py
+# Parallel training pipeline for the welding models.
+#
+# The three forests are fitted concurrently, each in its own worker process,
+# and every forest builds its trees on several cores (n_jobs). Data can come
+# from the in-memory synthetic DataFrame or from a chunked on-disk dataset.
+#
+# Usage (from the backend folder):
+#   python training.py --data data/welds/ --jobs 32
+import argparse
+import glob
+import multiprocessing
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+try:
+    import resource  # not available on Windows
+except ImportError:
+    resource = None
+
+FEATURES = ["mode", "current", "voltage", "wire_feed_speed", "travel_speed",
+            "torch_angle", "gas_flow_rate", "material_thickness"]
+TARGETS = ["penetration", "bead_width", "defect"]
+
+# Bump when MODEL_SPECS or the training code changes so stored artifacts are not reused.
+MODEL_VERSION = "rf200-v1"
+
+# model name -> (target column, estimator class, constructor kwargs)
+MODEL_SPECS = {
+    "pen_model": ("penetration", RandomForestRegressor, {"n_estimators": 200, "random_state": 0}),
+    "bead_model": ("bead_width", RandomForestRegressor, {"n_estimators": 200, "random_state": 1}),
+    "def_model": ("defect", RandomForestClassifier, {"n_estimators": 200, "random_state": 2}),
+}
+
+# ---------------------
+# Worker side
+# ---------------------
+_worker_data = {}
+
+def _init_worker(X, targets):
+    # With the fork start method these are inherited, not pickled.
+    _worker_data["X"] = X
+    _worker_data["targets"] = targets
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0  # KiB on Linux
+
+def _fit_one(name, n_jobs):
+    target, cls, kwargs = MODEL_SPECS[name]
+    X = _worker_data["X"]
+    y = _worker_data["targets"][target]
+    t0 = time.perf_counter()
+    model = cls(n_jobs=n_jobs, **kwargs)
+    model.fit(X, y)
+    seconds = time.perf_counter() - t0
+    # serve single rows without joblib's thread-pool overhead
+    model.set_params(n_jobs=None)
+    return name, model, {"seconds": round(seconds, 3), "n_jobs": n_jobs, "peak_rss_mb": _peak_rss_mb()}
+
+def _can_fork():
+    # spawn would re-import app.py in every child; daemon processes cannot have children
+    return ("fork" in multiprocessing.get_all_start_methods()
+            and not multiprocessing.current_process().daemon)
+
+# ---------------------
+# Public API
+# ---------------------
+def fit_models(X, targets, n_jobs=-1, parallel_models=True):
+    """
+    Fits the scaler and the three models on X (n_rows, n_features).
+    targets maps target column name -> 1-D array.
+    With parallel_models=True (and fork available) every model is fitted in its
+    own process and the cores given by n_jobs are split between them.
+    Returns the models dict used by app.py, with a "train_report" entry holding
+    per-model wall-clock time and peak memory (peak RSS of the fitting process;
+    cumulative when the models are fitted sequentially in one process).
+    """
+    t_start = time.perf_counter()
+    total_jobs = os.cpu_count() if n_jobs in (None, -1) else max(1, int(n_jobs))
+
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+
+    names = list(MODEL_SPECS)
+    results = []
+    if parallel_models and total_jobs > 1 and _can_fork():
+        jobs_per_model = max(1, total_jobs // len(names))
+        # one fresh process per model so peak RSS is attributable to that model
+        with multiprocessing.get_context("fork").Pool(len(names), initializer=_init_worker,
+                                  initargs=(X_scaled, targets), maxtasksperchild=1) as pool:
+            results = pool.starmap(_fit_one, [(name, jobs_per_model) for name in names])
+    else:
+        _init_worker(X_scaled, targets)
+        try:
+            results = [_fit_one(name, total_jobs) for name in names]
+        finally:
+            _worker_data.clear()
+
+    models = {"scaler": scaler, "features": list(FEATURES)}
+    report = {}
+    for name, model, stats in results:
+        models[name] = model
+        report[name] = stats
+    report["total_seconds"] = round(time.perf_counter() - t_start, 3)
+    report["n_rows"] = int(X.shape[0])
+    models["train_report"] = report
+    return models
+
+def dataset_files(path):
+    """Returns the sorted chunk files of an on-disk dataset (a file or a folder of chunks)."""
+    if os.path.isdir(path):
+        files = []
+        for ext in ("*.parquet", "*.csv", "*.npy"):
+            files.extend(glob.glob(os.path.join(path, ext)))
+        return sorted(files)
+    return [path]
+
+def dataset_fingerprint(path):
+    """Cheap fingerprint (names, sizes, mtimes) used to version models trained from disk."""
+    return [[os.path.basename(f), os.path.getsize(f), int(os.path.getmtime(f))]
+            for f in dataset_files(path)]
+
+def _iter_chunks(path, columns, chunksize):
+    if os.path.isdir(path) and os.path.isfile(os.path.join(path, columns[0] + ".npy")):
+        # one memory-mapped .npy file per column (datagen.py --format npy)
+        arrays = {c: np.load(os.path.join(path, c + ".npy"), mmap_mode="r") for c in columns}
+        n = len(arrays[columns[0]])
+        for start in range(0, n, chunksize):
+            yield pd.DataFrame({c: a[start:start + chunksize] for c, a in arrays.items()})
+        return
+    for f in dataset_files(path):
+        if f.endswith(".parquet"):
+            yield pd.read_parquet(f, columns=columns)
+        else:
+            for chunk in pd.read_csv(f, usecols=columns, chunksize=chunksize):
+                yield chunk
+
+def load_dataset(path, chunksize=1_000_000, fingerprint=None):
+    """
+    Reads a chunked on-disk dataset (Parquet/CSV files or per-column .npy files
+    in a folder, or one file)
+    one chunk at a time, keeping only the feature and target columns as float32.
+    Returns a DataFrame like generate_synthetic_data(). fingerprint is unused and
+    only there so it can be part of the model-store key.
+    """
+    columns = FEATURES + TARGETS
+    parts = {c: [] for c in columns}
+    for chunk in _iter_chunks(path, columns, chunksize):
+        for c in columns:
+            parts[c].append(chunk[c].to_numpy(dtype=np.float32))
+    if not parts[columns[0]]:
+        raise ValueError("no data found at %s" % path)
+    return pd.DataFrame({c: np.concatenate(parts.pop(c)) for c in columns})
+
+def train_from_dataframe(df, n_jobs=-1, parallel_models=True):
+    X = df[FEATURES].to_numpy(dtype=np.float64)
+    targets = {t: df[t].to_numpy() for t in TARGETS}
+    return fit_models(X, targets, n_jobs=n_jobs, parallel_models=parallel_models)
+
+def print_report(report):
+    print("%-12s %10s %8s %14s" % ("model", "seconds", "n_jobs", "peak_rss_mb"))
+    for name in MODEL_SPECS:
+        stats = report[name]
+        rss = "-" if stats["peak_rss_mb"] is None else "%.1f" % stats["peak_rss_mb"]
+        print("%-12s %10.3f %8d %14s" % (name, stats["seconds"], stats["n_jobs"], rss))
+    print("%d rows, total wall-clock %.3fs" % (report["n_rows"], report["total_seconds"]))
+
+def main():
+    ap = argparse.ArgumentParser(description="Train the welding models from an on-disk dataset.")
+    ap.add_argument("--data", required=True, help="Parquet/CSV file, folder of chunk files or of .npy columns")
+    ap.add_argument("--jobs", type=int, default=-1, help="total cores to use (-1 = all)")
+    ap.add_argument("--sequential", action="store_true", help="fit the three models one after another")
+    ap.add_argument("--store", help="model store folder to save into (default: backend/model_store)")
+    args = ap.parse_args()
+
+    import model_store
+
+    df = load_dataset(args.data)
+    models = train_from_dataframe(df, n_jobs=args.jobs, parallel_models=not args.sequential)
+    print_report(models["train_report"])
+
+    data_params = {"path": os.path.abspath(args.data), "fingerprint": dataset_fingerprint(args.data)}
+    version = model_store.params_hash(data_params, MODEL_VERSION)
+    out = model_store.save_models(models, args.store or model_store.DEFAULT_STORE_DIR, version,
+                                  meta={"data_params": data_params, "model_version": MODEL_VERSION,
+                                        "train_report": models["train_report"]})
+    print("saved version %s to %s" % (version, out))
+    print("serve it with WELDING_DATASET=%s" % args.data)
+
+if __name__ == "__main__":
+    main()
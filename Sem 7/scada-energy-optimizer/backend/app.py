@@ -1,8 +1,22 @@
-from flask import Flask, request, jsonify
-from sklearn.linear_model import LinearRegression
+from flask import Flask, request, jsonify, Response
 import numpy as np
 from flask_cors import CORS
+import io
+import json
 import os
+import time
+from contextlib import contextmanager
+from energy_model import FEATURES
+from online_model import OnlineLinearModel
+from model_families import FittedModel, OnlineUpdateUnsupported, load_training_csv
+from setpoint_optimizer import optimize_schedule
+from site_registry import SiteLoadTimeout, SiteRegistry, UnknownSite
+from feature_engine import FeatureEngine, TEMPORAL_FEATURES, TEMPORAL_LABELS
+
+try:
+    import pyarrow.parquet as pq  # optional, only for Parquet uploads
+except ImportError:
+    pq = None
 
 app = Flask(__name__)
 CORS(app)
@@ -27,9 +41,148 @@ X_train = np.array([
 # Corresponding energy consumption (kWh)
 y_train = np.array([120, 150, 180, 140, 220, 170, 155, 240, 200, 160, 195, 165])
 
-# Train the model
-model = LinearRegression()
-model.fit(X_train, y_train)
+# Optional CSV (five features plus kwh) to train on instead of the data above
+TRAINING_DATA = os.environ.get('ENERGY_TRAINING_DATA')
+if TRAINING_DATA:
+    X_train, y_train = load_training_csv(TRAINING_DATA)
+
+# Model family: linear (default), gbt (gradient-boosted trees) or mlp (small neural net)
+MODEL_FAMILY = os.environ.get('ENERGY_MODEL_FAMILY', 'linear')
+
+# Train the model. The linear family is least squares on running statistics (X'X, X'y),
+# seeded with the training data. Samples posted to /ingest update it incrementally; the
+# statistics are persisted to ENERGY_STATS_PATH so a restart continues where it left off
+# without refitting. The other families are fitted once at startup.
+STATS_PATH = os.environ.get(
+    'ENERGY_STATS_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'energy_stats.npz')
+)
+if MODEL_FAMILY == 'linear':
+    model = OnlineLinearModel.load_or_seed(STATS_PATH, X_train, y_train)
+else:
+    model = FittedModel(MODEL_FAMILY, X_train, y_train)
+
+# Per-site models (<SITE_MODEL_DIR>/<site_id>.npz), loaded on first use and kept in a
+# memory-capped LRU. Requests without a site_id use the default model above.
+site_registry = SiteRegistry(
+    os.environ.get('SITE_MODEL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'site_models')),
+    max_bytes=int(float(os.environ.get('SITE_CACHE_MB', '64')) * 2**20),
+    load_workers=int(os.environ.get('SITE_LOAD_WORKERS', '4'))
+)
+SITE_LOAD_TIMEOUT = float(os.environ.get('SITE_LOAD_TIMEOUT', '10'))
+
+# Per-site history of recent readings (POST /readings) and the model over the base features
+# plus rolling temperature, lagged load and time of day derived from it. Window and lag are
+# counted in readings (defaults: 4 = one hour and 96 = one day at 15-minute readings).
+feature_engine = FeatureEngine(window=int(os.environ.get('FEATURE_WINDOW', '4')),
+                               lag=int(os.environ.get('FEATURE_LAG', '96')))
+TEMPORAL_STATS_PATH = os.environ.get(
+    'TEMPORAL_STATS_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'temporal_stats.npz')
+)
+if os.path.isfile(TEMPORAL_STATS_PATH):
+    temporal_model = OnlineLinearModel.load(TEMPORAL_STATS_PATH, TEMPORAL_LABELS)
+else:
+    temporal_model = OnlineLinearModel(len(TEMPORAL_FEATURES), TEMPORAL_STATS_PATH, TEMPORAL_LABELS)
+
+# Predictions per line in streamed batch responses
+STREAM_CHUNK = 10000
+
+
+def read_feature_file(upload):
+    """Reads the feature columns of an uploaded CSV (header row required) or Parquet file."""
+    if upload.filename and upload.filename.lower().endswith('.parquet'):
+        if pq is None:
+            raise ValueError("Parquet uploads need the 'pyarrow' package")
+        table = pq.read_table(upload.stream, columns=FEATURES)
+        return np.column_stack([table.column(f).to_numpy() for f in FEATURES]).astype(float)
+
+    text = io.TextIOWrapper(upload.stream, encoding='utf-8')
+    header = [h.strip() for h in text.readline().split(',')]
+    missing = [f for f in FEATURES if f not in header]
+    if missing:
+        raise ValueError(f"missing columns: {', '.join(missing)}")
+    X = np.loadtxt(text, delimiter=',', usecols=[header.index(f) for f in FEATURES], ndmin=2)
+    return X.reshape(-1, len(FEATURES))
+
+
+def parse_batch_request():
+    """
+    Feature array of a batch request, features on the last axis.
+    Accepts an uploaded file (form field 'file') or a JSON object of columnar arrays,
+    e.g. {"temperature": [...], ...}; nested arrays such as buildings x intervals keep their shape.
+    """
+    if 'file' in request.files:
+        X = read_feature_file(request.files['file'])
+    else:
+        data = request.get_json(force=True)
+        columns = data.get('columns', data) if isinstance(data, dict) else None
+        if not isinstance(columns, dict):
+            raise ValueError("expected a JSON object of feature arrays")
+        X = stack_columns(columns)
+    bad = int(np.count_nonzero(~np.isfinite(X).all(axis=-1)))
+    if bad:
+        raise ValueError(f"{bad} rows contain missing or non-numeric values")
+    return X
+
+
+def stack_columns(columns):
+    """Columnar feature arrays (same shape each) -> one array with the features on the last axis."""
+    missing = [f for f in FEATURES if f not in columns]
+    if missing:
+        raise ValueError(f"missing columns: {', '.join(missing)}")
+    arrays = [np.asarray(columns[f], dtype=float) for f in FEATURES]
+    if len({a.shape for a in arrays}) != 1:
+        raise ValueError("all feature arrays must have the same shape")
+    return np.stack(arrays, axis=-1)
+
+
+def request_site_id(data=None):
+    """site_id from the query string or the JSON body, None when neither gives one."""
+    site_id = request.args.get('site_id')
+    if site_id is None and isinstance(data, dict):
+        site_id = data.get('site_id')
+    return site_id
+
+
+def resolve_model(data=None):
+    """The online model for a request: the site's model, or the default model without a site_id."""
+    site_id = request_site_id(data)
+    if site_id is None:
+        return model
+    return site_registry.get(site_id, timeout=SITE_LOAD_TIMEOUT)
+
+
+@contextmanager
+def model_for_update(data=None):
+    """Like resolve_model, but keeps a site's model loaded until the update is done."""
+    site_id = request_site_id(data)
+    if site_id is None:
+        yield model
+        return
+    with site_registry.writer(site_id, timeout=SITE_LOAD_TIMEOUT) as site_model:
+        yield site_model
+
+
+def site_error(e):
+    if isinstance(e, UnknownSite):
+        return jsonify({'error': f"unknown site: {e.args[0]}"}), 404
+    if isinstance(e, SiteLoadTimeout):
+        return jsonify({'error': str(e)}), 503
+    return jsonify({'error': str(e)}), 400
+
+
+def stream_predictions(predictions, current_model):
+    """NDJSON: one header line, then chunks of STREAM_CHUNK predictions in row order."""
+    flat = predictions.reshape(-1)
+    yield json.dumps({
+        'count': int(flat.size),
+        'shape': list(predictions.shape),
+        'model_version': current_model.version,
+        'target_function': current_model.target_function
+    }) + "\n"
+    for start in range(0, flat.size, STREAM_CHUNK):
+        chunk = flat[start:start + STREAM_CHUNK]
+        yield json.dumps({'offset': start, 'optimized_energy': chunk.tolist()}) + "\n"
+
 
 @app.route('/')
 def home():
@@ -39,33 +192,240 @@ def home():
 def optimize_energy():
     try:
         data = request.get_json()
+        if not isinstance(data, dict):
+            return jsonify({'error': "expected a JSON object of inputs"}), 400
+        site_id = request_site_id(data)
+
+        # A site with recorded readings fills in any input the request leaves out
+        latest = feature_engine.latest(site_id)
+        if latest is not None:
+            data = {**dict(zip(FEATURES, latest)), **data}
+
         # Extract all 5 inputs
         temperature = data['temperature']
         humidity = data['humidity']
         wind_speed = data['wind_speed']
         solar_radiation = data['solar_radiation']
         occupancy = data['occupancy']
-
         input_data = np.array([[temperature, humidity, wind_speed, solar_radiation, occupancy]])
-        optimized_energy = model.predict(input_data)[0]
 
-        # Generate dynamic target function from model coefficients
-        coefs = model.coef_
-        intercept = model.intercept_
-        target_function = (
-            f"Energy = {round(coefs[0], 2)}*Temp + {round(coefs[1], 2)}*Humidity + "
-            f"{round(coefs[2], 2)}*Wind + {round(coefs[3], 2)}*Solar + "
-            f"{round(coefs[4], 2)}*Occupancy + {round(intercept, 2)}"
-        )
+        # A site's own model (the default model without a site_id) comes first, so this
+        # endpoint and /optimize_energy_batch agree for registered sites
+        site_model = None
+        try:
+            site_model = resolve_model(data)
+        except (UnknownSite, SiteLoadTimeout, ValueError) as e:
+            if latest is None or isinstance(e, SiteLoadTimeout):
+                return site_error(e)
+
+        # A site known only from its readings: the temporal model over the derived features,
+        # once trained, otherwise the default model
+        if site_model is None and temporal_model.ready:
+            vector = feature_engine.features(site_id, input_data[0].tolist(), float(data.get('timestamp', time.time())))
+            if vector is not None and np.isfinite(vector).all():
+                current_model = temporal_model.current
+                return jsonify({
+                    'optimized_energy': round(float(current_model.predict(vector)), 2),
+                    'target_function': current_model.target_function,
+                    'features': dict(zip(TEMPORAL_FEATURES, np.round(vector, 4).tolist()))
+                })
+        current_model = (model if site_model is None else site_model).current
+        optimized_energy = current_model.predict(input_data)[0]
 
         return jsonify({
             'optimized_energy': round(optimized_energy, 2),
-            'target_function': target_function
+            'target_function': current_model.target_function
         })
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/optimize_energy_batch', methods=['POST'])
+def optimize_energy_batch():
+    """
+    Scores many feature vectors with one matrix product.
+    Body: JSON columnar arrays, or a CSV/Parquet upload in the 'file' form field.
+    ?stream=1 streams the predictions as NDJSON chunks instead of one JSON document.
+    """
+    try:
+        try:
+            X = parse_batch_request()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        try:
+            current_model = resolve_model().current
+        except (UnknownSite, SiteLoadTimeout, ValueError) as e:
+            return site_error(e)
+
+        predictions = np.round(current_model.predict(X), 2)
+
+        if request.args.get('stream', '0') not in ('0', 'false', ''):
+            return Response(stream_predictions(predictions, current_model), mimetype='application/x-ndjson')
+
+        return jsonify({
+            'optimized_energy': predictions.tolist(),
+            'count': int(predictions.size),
+            'model_version': current_model.version,
+            'target_function': current_model.target_function
+        })
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/optimize_schedule', methods=['POST'])
+def optimize_schedule_route():
+    """
+    Minimum-energy schedule over a forecast horizon.
+    Body: {"forecast": {feature: sites x intervals arrays, ...},
+           "controls": {feature: {"min": ..., "max": ..., "shift": false}, ...},
+           "price": per-interval weights (optional)}
+    """
+    try:
+        data = request.get_json(force=True)
+        try:
+            if not isinstance(data, dict) or not isinstance(data.get('forecast'), dict):
+                raise ValueError("expected a 'forecast' object of feature arrays")
+            forecast = stack_columns(data['forecast'])
+            if forecast.ndim == 2:
+                forecast = forecast[None]  # a single site: intervals x features
+            if not np.isfinite(forecast).all():
+                raise ValueError("forecast contains missing or non-numeric values")
+            controls = data.get('controls') or {}
+            if not isinstance(controls, dict) or not all(isinstance(c, dict) for c in controls.values()):
+                raise ValueError("'controls' must map feature names to {min, max, shift}")
+            try:
+                current_model = resolve_model(data).current
+            except (UnknownSite, SiteLoadTimeout, ValueError) as e:
+                return site_error(e)
+            if not hasattr(current_model, 'coef'):
+                return jsonify({'error': "schedule optimization needs the linear model family"}), 409
+            result = optimize_schedule(current_model, forecast, controls, data.get('price'))
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+
+        schedule = result['schedule']
+        total = result['energy'].sum(axis=-1)
+        baseline = result['baseline_energy'].sum(axis=-1)
+        response = {
+            'schedule': {f: np.round(schedule[..., FEATURES.index(f)], 2).tolist() for f in controls},
+            'energy': np.round(result['energy'], 2).tolist(),
+            'total_energy': np.round(total, 2).tolist(),
+            'baseline_total_energy': np.round(baseline, 2).tolist(),
+            'savings': np.round(baseline - total, 2).tolist(),
+            'feasible': result['feasible'].tolist(),
+            'model_version': current_model.version,
+            'target_function': current_model.target_function
+        }
+        if data.get('price') is not None:
+            price = np.broadcast_to(np.asarray(data['price'], dtype=float), result['energy'].shape)
+            response['total_cost'] = np.round((price * result['energy']).sum(axis=-1), 2).tolist()
+            response['baseline_total_cost'] = np.round((price * result['baseline_energy']).sum(axis=-1), 2).tolist()
+        return jsonify(response)
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/ingest', methods=['POST'])
+def ingest():
+    """
+    Adds observed samples and updates the model incrementally.
+    Body: one {"temperature", ..., "occupancy", "kwh"} object, a list of them,
+    or columnar arrays {"temperature": [...], ..., "kwh": [...]}.
+    """
+    try:
+        data = request.get_json(force=True)
+        try:
+            if isinstance(data, dict) and isinstance(data.get('kwh'), list):
+                X = np.column_stack([np.asarray(data[f], dtype=float) for f in FEATURES])
+                y = np.asarray(data['kwh'], dtype=float)
+            else:
+                samples = data if isinstance(data, list) else [data]
+                X = np.array([[float(s[f]) for f in FEATURES] for s in samples])
+                y = np.array([float(s['kwh']) for s in samples])
+        except KeyError as e:
+            return jsonify({'error': f"missing field: {e.args[0]}"}), 400
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+        if len(y) == 0 or len(X) != len(y) or not (np.isfinite(X).all() and np.isfinite(y).all()):
+            return jsonify({'error': "samples must be non-empty, aligned and numeric"}), 400
+
+        try:
+            with model_for_update(data) as target:
+                updated = target.update(X, y)
+                n_samples = target.n_samples
+        except OnlineUpdateUnsupported as e:
+            return jsonify({'error': str(e)}), 409
+        except (UnknownSite, SiteLoadTimeout, ValueError) as e:
+            return site_error(e)
+        return jsonify({
+            'accepted': int(len(y)),
+            'n_samples': n_samples,
+            'model_version': updated.version,
+            'target_function': updated.target_function
+        })
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/readings', methods=['POST'])
+def readings():
+    """
+    Records meter readings in the sites' histories.
+    Body: one {"site_id", "timestamp" (epoch seconds, default now), five features,
+    "kwh" (optional)} object or a list of them, oldest first. Readings with kwh also
+    train the temporal model once their derived features are known.
+    """
+    try:
+        data = request.get_json(force=True)
+        samples = data if isinstance(data, list) else [data]
+        now = time.time()
+        vectors, targets = [], []
+        try:
+            for s in samples:
+                site_id = s['site_id']
+                if not isinstance(site_id, str):
+                    raise ValueError("site_id must be a string")
+                x = [float(s[f]) for f in FEATURES]
+                kwh = float(s['kwh']) if s.get('kwh') is not None else float('nan')
+                vector = feature_engine.observe(site_id, x, kwh, float(s.get('timestamp', now)))
+                if np.isfinite(kwh) and np.isfinite(vector).all():
+                    vectors.append(vector)
+                    targets.append(kwh)
+        except KeyError as e:
+            return jsonify({'error': f"missing field: {e.args[0]}"}), 400
+        except (TypeError, ValueError, AttributeError) as e:
+            return jsonify({'error': str(e)}), 400
+
+        if vectors:
+            temporal_model.update(np.array(vectors), np.array(targets))
+        return jsonify({
+            'accepted': len(samples),
+            'trained': len(vectors),
+            'temporal_model_ready': temporal_model.ready,
+            'temporal_samples': temporal_model.n_samples,
+            'history': feature_engine.stats()
+        })
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/model_registry', methods=['GET', 'POST'])
+def model_registry():
+    """
+    GET: registry statistics (loaded sites, memory, hit rate, load latency).
+    POST {"site_ids": [...]}: starts loading those sites in the background.
+    """
+    if request.method == 'POST':
+        data = request.get_json(force=True)
+        site_ids = data.get('site_ids') if isinstance(data, dict) else None
+        if not isinstance(site_ids, list):
+            return jsonify({'error': "expected {\"site_ids\": [...]}"}), 400
+        try:
+            site_registry.prefetch(site_ids)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    return jsonify(site_registry.stats())
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 500))
-    app.run(host="0.0.0.0", port=port, debug=False)
\ No newline at end of file
+    app.run(host="0.0.0.0", port=port, debug=False)
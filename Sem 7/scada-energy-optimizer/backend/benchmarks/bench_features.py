@@ -0,0 +1,70 @@
+"""
+Memory per site and update latency of the rolling-window feature engine.
+
+Each site's history is filled past its ring-buffer capacity, then observe()
+(feature vector + push) and features() (vector only) are timed per call.
+Latency should stay flat as the window grows, since the updates are O(1).
+
+Usage (from the backend folder):
+  python benchmarks/bench_features.py
+  python benchmarks/bench_features.py --sites 5000 --windows 4 96 672
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from feature_engine import FeatureEngine  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--sites", type=int, default=1000)
+    ap.add_argument("--windows", type=int, nargs="+", default=[4, 96, 672])
+    ap.add_argument("--lag", type=int, default=96)
+    ap.add_argument("--updates", type=int, default=100000, help="timed observe() calls")
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    readings = rng.uniform(0, 100, (4096, 6)).tolist()
+    site_ids = ["site-%d" % i for i in range(args.sites)]
+
+    print("%d sites, lag %d readings" % (args.sites, args.lag))
+    print("%8s %14s %16s %14s %14s" % ("window", "bytes/site", "engine estimate", "observe us", "features us"))
+    for window in args.windows:
+        tracemalloc.start()
+        engine = FeatureEngine(window=window, lag=args.lag)
+        fill = max(window, args.lag) + 1
+        t = 0.0
+        for k in range(fill):
+            r = readings[k % len(readings)]
+            for site_id in site_ids:
+                engine.observe(site_id, r[:5], r[5], t)
+            t += 900.0
+        traced = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        n = args.updates
+        t0 = time.perf_counter()
+        for k in range(n):
+            r = readings[k % len(readings)]
+            engine.observe(site_ids[k % args.sites], r[:5], r[5], t + k)
+        observe = (time.perf_counter() - t0) / n
+
+        t0 = time.perf_counter()
+        for k in range(n):
+            r = readings[k % len(readings)]
+            engine.features(site_ids[k % args.sites], r[:5], t + k)
+        features = (time.perf_counter() - t0) / n
+
+        print("%8d %14.0f %16.0f %14.2f %14.2f" % (
+            window, traced / args.sites, engine.stats()["approx_bytes"] / args.sites,
+            observe * 1e6, features * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Compares the model families (linear, gbt, mlp) on one synthetic building-load
+dataset: accuracy, training time, single-row latency, batch throughput and memory.
+
+The dataset has the non-linear shape of real building loads (cooling above and
+heating below a comfort band, humidity and solar gains on the cooling side,
+occupancy), so the accuracy column shows how much the linear model underfits.
+
+Usage (from the backend folder):
+  python benchmarks/bench_models.py
+  python benchmarks/bench_models.py --rows 200000 --families linear gbt
+  python benchmarks/bench_models.py --write-csv building.csv   # reuse as ENERGY_TRAINING_DATA
+"""
+import argparse
+import os
+import pickle
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from energy_model import FEATURES  # noqa: E402
+from model_families import FAMILIES, FittedModel  # noqa: E402
+
+
+def building_load(n, seed=0):
+    rng = np.random.default_rng(seed)
+    temperature = rng.uniform(-5, 40, n)
+    humidity = rng.uniform(20, 95, n)
+    wind_speed = rng.uniform(0, 25, n)
+    solar_radiation = rng.uniform(0, 900, n)
+    occupancy = rng.uniform(0, 100, n)
+    cooling = np.maximum(temperature - 22, 0) * (3.5 + 0.04 * (humidity - 50)) + 0.02 * solar_radiation * (temperature > 20)
+    heating = np.maximum(16 - temperature, 0) * (2.5 + 0.08 * wind_speed)
+    lighting = 12 * np.exp(-solar_radiation / 200) * (occupancy > 5)
+    kwh = 40 + cooling + heating + lighting + 0.6 * occupancy + rng.normal(0, 3, n)
+    X = np.column_stack([temperature, humidity, wind_speed, solar_radiation, occupancy])
+    return X, kwh
+
+
+def median_seconds(fn, reps):
+    fn()
+    times = []
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return float(np.median(times))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--rows", type=int, default=50000, help="training rows (a quarter as many test rows)")
+    ap.add_argument("--batch", type=int, default=100000, help="rows per throughput batch")
+    ap.add_argument("--families", nargs="+", default=list(FAMILIES), choices=FAMILIES)
+    ap.add_argument("--write-csv", help="also write the training set as CSV (features plus kwh)")
+    args = ap.parse_args()
+
+    X, y = building_load(args.rows + args.rows // 4)
+    X_fit, y_fit, X_test, y_test = X[:args.rows], y[:args.rows], X[args.rows:], y[args.rows:]
+    if args.write_csv:
+        np.savetxt(args.write_csv, np.column_stack([X_fit, y_fit]), delimiter=",", fmt="%.4f",
+                   header=",".join(FEATURES + ["kwh"]), comments="")
+    X_batch = np.resize(X_test, (args.batch, len(FEATURES)))
+    row = X_test[:1]
+
+    print("%d training rows, %d test rows" % (len(X_fit), len(X_test)))
+    print("%-8s %8s %8s %9s %10s %14s %10s %11s" % (
+        "family", "R2", "MAE kWh", "train s", "1-row us", "batch rows/s", "model KB", "fit peak MB"))
+    for family in args.families:
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        fitted = FittedModel(family, X_fit, y_fit)
+        train_s = time.perf_counter() - t0
+        fit_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        snapshot = fitted.current
+        pred = snapshot.predict(X_test)
+        r2 = 1 - np.sum((y_test - pred) ** 2) / np.sum((y_test - y_test.mean()) ** 2)
+        mae = np.mean(np.abs(y_test - pred))
+        one = median_seconds(lambda: snapshot.predict(row), 200)
+        batch = median_seconds(lambda: snapshot.predict(X_batch), 3)
+        size = len(pickle.dumps(getattr(snapshot, 'estimator', snapshot)))
+        print("%-8s %8.4f %8.2f %9.2f %10.1f %14.0f %10.1f %11.1f" % (
+            family, r2, mae, train_s, one * 1e6, args.batch / batch, size / 1024, fit_peak / 2**20))
+
+
+if __name__ == "__main__":
+    main()
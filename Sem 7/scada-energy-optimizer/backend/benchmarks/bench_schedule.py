@@ -0,0 +1,63 @@
+"""
+Time to solve a 24h x 15-minute (96 interval) schedule for many sites with
+/optimize_schedule's solver: occupancy shifting plus a temperature setpoint band,
+weighted by a time-of-use price.
+
+Usage (from the backend folder):
+  python benchmarks/bench_schedule.py
+  python benchmarks/bench_schedule.py --sites 1 100 1000 --intervals 96
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app  # noqa: E402
+from setpoint_optimizer import optimize_schedule  # noqa: E402
+
+
+def make_problem(sites, intervals, seed=0):
+    rng = np.random.default_rng(seed)
+    hours = np.arange(intervals) * 24.0 / intervals
+    daily = np.sin((hours - 6) / 24 * 2 * np.pi)
+    forecast = np.empty((sites, intervals, len(app.FEATURES)))
+    forecast[..., 0] = 28 + 6 * daily + rng.normal(0, 1, (sites, 1))
+    forecast[..., 1] = rng.uniform(50, 80, (sites, intervals))
+    forecast[..., 2] = rng.uniform(5, 20, (sites, intervals))
+    forecast[..., 3] = np.clip(500 * daily, 0, None) + rng.uniform(0, 50, (sites, intervals))
+    forecast[..., 4] = np.where((hours >= 8) & (hours < 18), 40, 5) * rng.uniform(0.5, 1.5, (sites, 1))
+    controls = {
+        'occupancy': {'min': 0.5 * forecast[..., 4], 'max': 1.5 * forecast[..., 4].max(), 'shift': True},
+        'temperature': {'min': forecast[..., 0] - 3, 'max': forecast[..., 0] + 1},
+    }
+    price = np.where((hours >= 16) & (hours < 21), 0.35, np.where(hours < 7, 0.08, 0.15))
+    return forecast, controls, price
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--sites", type=int, nargs="+", default=[1, 100, 500, 2000])
+    ap.add_argument("--intervals", type=int, default=96)
+    ap.add_argument("--reps", type=int, default=5)
+    args = ap.parse_args()
+
+    current_model = app.model.current
+    print("%8s %10s %12s %12s" % ("sites", "intervals", "solve ms", "savings %"))
+    for sites in args.sites:
+        forecast, controls, price = make_problem(sites, args.intervals)
+        times = []
+        for _ in range(args.reps + 1):
+            t0 = time.perf_counter()
+            result = optimize_schedule(current_model, forecast, controls, price)
+            times.append(time.perf_counter() - t0)
+        cost = (price * result['energy']).sum()
+        baseline = (price * result['baseline_energy']).sum()
+        print("%8d %10d %12.2f %12.1f" % (sites, args.intervals, 1000 * np.median(times[1:]),
+                                          100 * (baseline - cost) / baseline))
+
+
+if __name__ == "__main__":
+    main()
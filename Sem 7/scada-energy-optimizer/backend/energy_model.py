@@ -0,0 +1,34 @@
+import numpy as np
+
+# Feature order used by the model, and the names shown in the target function
+FEATURES = ['temperature', 'humidity', 'wind_speed', 'solar_radiation', 'occupancy']
+FEATURE_LABELS = ['Temp', 'Humidity', 'Wind', 'Solar', 'Occupancy']
+
+
+def format_target_function(coef, intercept, labels=FEATURE_LABELS):
+    terms = " + ".join(f"{round(float(c), 2)}*{label}" for c, label in zip(coef, labels))
+    return f"Energy = {terms} + {round(float(intercept), 2)}"
+
+
+class EnergyModel:
+    """
+    Read-only snapshot of a fitted linear energy model.
+
+    Predictions are a plain matrix product with the coefficients, so any number
+    of rows (or a buildings x intervals x features array) is scored in one call.
+    The target function string is built once, when the snapshot is created.
+    """
+
+    def __init__(self, coef, intercept, version=1, labels=FEATURE_LABELS):
+        self.coef = np.asarray(coef, dtype=float)
+        self.intercept = float(intercept)
+        self.version = version
+        self.target_function = format_target_function(self.coef, self.intercept, labels)
+
+    @classmethod
+    def from_estimator(cls, estimator, version=1):
+        return cls(estimator.coef_, estimator.intercept_, version)
+
+    def predict(self, X):
+        """X has the features on its last axis; returns an array of X.shape[:-1]."""
+        return np.asarray(X, dtype=float) @ self.coef + self.intercept
@@ -0,0 +1,147 @@
+import math
+import threading
+from collections import deque
+
+import numpy as np
+
+from energy_model import FEATURES, FEATURE_LABELS
+
+# Features derived from a site's recent readings, appended after the five base features
+DERIVED_FEATURES = ['temp_mean', 'temp_max', 'kwh_lag1', 'kwh_lag', 'kwh_mean', 'hour_sin', 'hour_cos']
+DERIVED_LABELS = ['TempMean', 'TempMax', 'LoadPrev', 'LoadLag', 'LoadMean', 'HourSin', 'HourCos']
+TEMPORAL_FEATURES = FEATURES + DERIVED_FEATURES
+TEMPORAL_LABELS = FEATURE_LABELS + DERIVED_LABELS
+
+# Recompute the running sums from the buffer every this many windows to stop rounding drift
+RESUM_EVERY = 64
+
+
+class SiteHistory:
+    """
+    Ring buffer of one site's recent temperature and kWh readings.
+
+    Rolling sums (mean temperature and mean kWh over the last `window` readings)
+    and a monotonic deque (max temperature) are updated as each reading arrives,
+    so push() and features() cost O(1) whatever the window. The buffer holds
+    max(window, lag) readings, so kwh_lag is the load `lag` readings ago
+    (96 x 15 min = the same time yesterday).
+    """
+
+    __slots__ = ('window', 'lag', 'capacity', 'temp', 'kwh', 'count', 'temp_sum',
+                 'kwh_sum', 'kwh_n', 'temp_max', 'last', 'last_time')
+
+    def __init__(self, window, lag):
+        self.window = window
+        self.lag = lag
+        self.capacity = max(window, lag)
+        self.temp = np.full(self.capacity, np.nan)
+        self.kwh = np.full(self.capacity, np.nan)
+        self.count = 0
+        self.temp_sum = 0.0
+        self.kwh_sum = 0.0
+        self.kwh_n = 0
+        self.temp_max = deque()  # (reading index, temperature), temperatures decreasing
+        self.last = None
+        self.last_time = None
+
+    def push(self, x, kwh, timestamp):
+        """Adds a reading (base feature vector x, measured kWh or NaN)."""
+        n, cap = self.count, self.capacity
+        if n >= self.window:
+            j = (n - self.window) % cap
+            self.temp_sum -= self.temp[j]
+            if not math.isnan(self.kwh[j]):
+                self.kwh_sum -= self.kwh[j]
+                self.kwh_n -= 1
+        temp = float(x[0])
+        i = n % cap
+        self.temp[i] = temp
+        self.kwh[i] = kwh
+        self.temp_sum += temp
+        if not math.isnan(kwh):
+            self.kwh_sum += kwh
+            self.kwh_n += 1
+        while self.temp_max and self.temp_max[-1][1] <= temp:
+            self.temp_max.pop()
+        self.temp_max.append((n, temp))
+        if self.temp_max[0][0] <= n - self.window:
+            self.temp_max.popleft()
+        self.count = n + 1
+        self.last = x
+        self.last_time = timestamp
+        if self.count % (self.window * RESUM_EVERY) == 0:
+            self._resum()
+
+    def _resum(self):
+        idx = [(self.count - k) % self.capacity for k in range(1, min(self.count, self.window) + 1)]
+        self.temp_sum = float(self.temp[idx].sum())
+        kwh = self.kwh[idx]
+        self.kwh_sum = float(np.nansum(kwh))
+        self.kwh_n = int(np.count_nonzero(~np.isnan(kwh)))
+
+    def derived(self, timestamp):
+        """Derived features for a reading at timestamp, from the readings before it (NaN if unknown)."""
+        n, cap = self.count, self.capacity
+        in_window = min(n, self.window)
+        hour = (timestamp % 86400.0) / 3600.0
+        return [
+            self.temp_sum / in_window if in_window else math.nan,
+            self.temp_max[0][1] if self.temp_max else math.nan,
+            float(self.kwh[(n - 1) % cap]) if n else math.nan,
+            float(self.kwh[(n - self.lag) % cap]) if n >= self.lag else math.nan,
+            self.kwh_sum / self.kwh_n if self.kwh_n else math.nan,
+            math.sin(2 * math.pi * hour / 24),
+            math.cos(2 * math.pi * hour / 24),
+        ]
+
+    @property
+    def nbytes(self):
+        return self.temp.nbytes + self.kwh.nbytes + 64 * len(self.temp_max) + 512
+
+
+class FeatureEngine:
+    """
+    Per-site histories. observe() records a reading and returns its full feature
+    vector (base + derived, computed before the reading is added, exactly as a
+    prediction at that moment would see it). features() builds the vector for a
+    prediction without changing the history.
+    """
+
+    def __init__(self, window=4, lag=96):
+        self.window = window
+        self.lag = lag
+        self._sites = {}
+        self._lock = threading.Lock()
+
+    def observe(self, site_id, x, kwh, timestamp):
+        with self._lock:
+            history = self._sites.get(site_id)
+            if history is None:
+                history = self._sites[site_id] = SiteHistory(self.window, self.lag)
+            vector = list(x) + history.derived(timestamp)
+            history.push(x, kwh, timestamp)
+        return vector
+
+    def features(self, site_id, x, timestamp):
+        """Feature vector for x at timestamp, or None when the site has no history."""
+        with self._lock:
+            history = self._sites.get(site_id)
+            if history is None:
+                return None
+            return list(x) + history.derived(timestamp)
+
+    def latest(self, site_id):
+        """The site's most recent base feature vector (None if unknown)."""
+        history = self._sites.get(site_id)
+        return None if history is None else history.last
+
+    def stats(self):
+        with self._lock:
+            sites = list(self._sites.values())
+        return {
+            'sites': len(sites),
+            'window': self.window,
+            'lag': self.lag,
+            'approx_bytes': sum(h.nbytes for h in sites),
+            'readings': sum(h.count for h in sites),
+        }
@@ -0,0 +1,84 @@
+import numpy as np
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.neural_network import MLPRegressor
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+from energy_model import EnergyModel, FEATURES
+
+FAMILIES = ('linear', 'gbt', 'mlp')
+
+
+class OnlineUpdateUnsupported(ValueError):
+    """update() on a model family that cannot learn online."""
+
+
+def make_estimator(family, n_samples):
+    """Unfitted sklearn estimator for a model family name."""
+    if family == 'linear':
+        return LinearRegression()
+    if family == 'gbt':
+        # leaves need a few samples each; scale the minimum down for small training sets
+        return HistGradientBoostingRegressor(max_iter=200, learning_rate=0.1,
+                                             min_samples_leaf=max(1, min(20, n_samples // 10)),
+                                             random_state=0)
+    if family == 'mlp':
+        return make_pipeline(StandardScaler(),
+                             MLPRegressor(hidden_layer_sizes=(32, 16), max_iter=500,
+                                          early_stopping=n_samples >= 1000, random_state=0))
+    raise ValueError(f"unknown model family: {family!r} (expected one of {', '.join(FAMILIES)})")
+
+
+class EstimatorModel:
+    """
+    Read-only snapshot of a fitted sklearn model with the EnergyModel interface.
+
+    predict() accepts any leading shape with the features on the last axis.
+    Non-linear models have no closed-form target function, so target_function
+    describes the model instead.
+    """
+
+    def __init__(self, estimator, family, version=1):
+        self.estimator = estimator
+        self.family = family
+        self.version = version
+        self.target_function = f"Energy = {family}({len(FEATURES)} features)"
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=float)
+        return self.estimator.predict(X.reshape(-1, X.shape[-1])).reshape(X.shape[:-1])
+
+
+class FittedModel:
+    """
+    A model family fitted once at startup, served like OnlineLinearModel.
+    Only the linear family learns online, so update() is not supported here.
+    """
+
+    def __init__(self, family, X, y):
+        X = np.asarray(X, dtype=float)
+        estimator = make_estimator(family, len(X))
+        estimator.fit(X, np.asarray(y, dtype=float))
+        self.family = family
+        self.n_samples = len(X)
+        if family == 'linear':
+            # served as a plain matrix product, like the online linear model
+            self.current = EnergyModel.from_estimator(estimator)
+        else:
+            self.current = EstimatorModel(estimator, family)
+
+    def update(self, X, y, persist=True):
+        raise OnlineUpdateUnsupported(f"online updates need the linear model family, not {self.family!r}")
+
+
+def load_training_csv(path):
+    """Feature matrix and kWh from a CSV with a header row (the five features plus kwh)."""
+    with open(path, encoding='utf-8') as f:
+        header = [h.strip() for h in f.readline().split(',')]
+        columns = FEATURES + ['kwh']
+        missing = [c for c in columns if c not in header]
+        if missing:
+            raise ValueError(f"missing columns: {', '.join(missing)}")
+        data = np.loadtxt(f, delimiter=',', usecols=[header.index(c) for c in columns], ndmin=2)
+    return data[:, :-1], data[:, -1]
@@ -0,0 +1,117 @@
+import os
+import threading
+
+import numpy as np
+
+from energy_model import EnergyModel, FEATURE_LABELS
+
+# Recompute the inverse from scratch every this many samples to stop rounding drift
+REFRESH_EVERY = 1000
+
+
+class OnlineLinearModel:
+    """
+    Least-squares energy model updated from running sufficient statistics.
+
+    Keeps X'X and X'y (with a bias column) plus the inverse of X'X. Each new
+    sample updates the inverse with a Sherman-Morrison rank-1 step, so an update
+    costs O(features^2) and never refits on the full history. After every
+    update a new EnergyModel snapshot replaces `current` in one reference
+    assignment, so concurrent readers always see a complete model.
+    The statistics are saved to `path` (.npz) so a restart loads them instantly.
+    """
+
+    def __init__(self, n_features, path=None, labels=FEATURE_LABELS):
+        d = n_features + 1
+        self.labels = labels
+        self.xtx = np.zeros((d, d))
+        self.xty = np.zeros(d)
+        self.n_samples = 0
+        self.version = 0
+        self.path = path
+        self._inv = None
+        self._full_rank = False
+        self._since_refresh = 0
+        self._lock = threading.Lock()
+        self.current = None
+
+    @classmethod
+    def load(cls, path, labels=FEATURE_LABELS):
+        """Loads statistics saved by a previous run (or written by save())."""
+        with np.load(path) as saved:
+            model = cls(saved['xty'].shape[0] - 1, path, labels)
+            model.xtx = saved['xtx']
+            model.xty = saved['xty']
+            model.n_samples = int(saved['n_samples'])
+            model.version = int(saved['version'])
+        with model._lock:
+            model._refresh_inverse()
+            model._publish()
+        return model
+
+    @classmethod
+    def load_or_seed(cls, path, X_seed, y_seed):
+        """Loads persisted statistics from path, or starts from the seed data."""
+        if path and os.path.isfile(path):
+            return cls.load(path)
+        model = cls(X_seed.shape[1], path)
+        model.update(X_seed, y_seed, persist=False)
+        return model
+
+    @property
+    def ready(self):
+        """True once the samples determine every coefficient (X'X has full rank)."""
+        return self.current is not None and self._full_rank
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the model (statistics, inverse and snapshot)."""
+        arrays = [self.xtx, self.xty, self._inv, self.current.coef if self.current else None]
+        return sum(a.nbytes for a in arrays if a is not None) + 2048
+
+    @staticmethod
+    def _with_bias(X):
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        return np.hstack([X, np.ones((X.shape[0], 1))])
+
+    def _refresh_inverse(self):
+        # pinv also covers the start, while there are fewer samples than coefficients
+        self._full_rank = bool(np.linalg.matrix_rank(self.xtx) == len(self.xty))
+        self._inv = np.linalg.pinv(self.xtx)
+        self._since_refresh = 0
+
+    def _publish(self):
+        beta = self._inv @ self.xty
+        self.current = EnergyModel(beta[:-1], beta[-1], self.version, self.labels)
+
+    def update(self, X, y, persist=True):
+        """Adds samples (rows of X, kWh in y) and publishes a new model version."""
+        Z = self._with_bias(X)
+        y = np.asarray(y, dtype=float).reshape(-1)
+        if Z.shape[0] != y.shape[0]:
+            raise ValueError("features and kWh must have the same number of samples")
+        with self._lock:
+            self.xtx += Z.T @ Z
+            self.xty += Z.T @ y
+            self.n_samples += Z.shape[0]
+            if self._inv is None or not self._full_rank \
+                    or self._since_refresh + Z.shape[0] > REFRESH_EVERY:
+                self._refresh_inverse()
+            else:
+                P = self._inv
+                for z in Z:
+                    Pz = P @ z
+                    P -= np.outer(Pz, Pz) / (1.0 + z @ Pz)
+                self._since_refresh += Z.shape[0]
+            self.version += 1
+            self._publish()
+            if persist:
+                self.save()
+        return self.current
+
+    def save(self):
+        if not self.path:
+            return
+        tmp = self.path + '.tmp.npz'
+        np.savez(tmp, xtx=self.xtx, xty=self.xty, n_samples=self.n_samples, version=self.version)
+        os.replace(tmp, self.path)
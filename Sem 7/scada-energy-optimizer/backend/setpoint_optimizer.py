@@ -0,0 +1,93 @@
+import numpy as np
+
+from energy_model import FEATURES
+
+
+def _broadcast(value, shape, name):
+    try:
+        return np.broadcast_to(np.asarray(value, dtype=float), shape)
+    except ValueError:
+        raise ValueError(f"{name} does not match the forecast shape {list(shape)}")
+
+
+def _fill_cheapest(weight, lo, hi, total):
+    """
+    Minimizes sum(weight * x) over the last axis subject to lo <= x <= hi and
+    sum(x) == total, for every leading index at once.
+    The continuous knapsack is solved greedily: start every interval at its lower
+    bound and hand the remaining amount to the cheapest intervals first.
+    """
+    order = np.argsort(weight, axis=-1, kind='stable')
+    room = np.take_along_axis(hi - lo, order, axis=-1)
+    remaining = (total - lo.sum(axis=-1))[..., None]
+    before = np.cumsum(room, axis=-1) - room
+    extra = np.clip(remaining - before, 0.0, room)
+    x = lo.copy()
+    np.put_along_axis(x, order, np.take_along_axis(lo, order, axis=-1) + extra, axis=-1)
+    return x
+
+
+def optimize_schedule(model, forecast, controls, price=None):
+    """
+    Minimum-energy (or minimum-cost) schedule for the linear energy model.
+
+    forecast has the features on its last axis and the intervals on the one
+    before, e.g. sites x intervals x features. It holds the forecast weather and
+    the planned occupancy; controlled features start from these values.
+    controls maps a feature name to {"min": ..., "max": ..., "shift": bool}.
+    Bounds broadcast against sites x intervals. A plain control is a setpoint
+    kept inside [min, max] in every interval. A shift control also keeps its total
+    over the horizon (e.g. occupancy moved to other intervals, not removed).
+    price (per interval, optional) weights each interval's kWh; without it the
+    objective is total kWh.
+
+    The model is linear, so each controlled feature contributes
+    price * coefficient * value and is optimized on its own, in closed form:
+    a setpoint goes to whichever bound is cheaper, and a shifted quantity fills the
+    cheapest intervals first. Every site is solved in the same array operations.
+
+    Returns the schedule (same shape as forecast), the energy per interval, and a
+    per-site feasibility mask. A shift whose total cannot fit within its bounds is
+    moved as close as the bounds allow, and that site is marked infeasible.
+    """
+    forecast = np.asarray(forecast, dtype=float)
+    if forecast.ndim < 2 or forecast.shape[-1] != len(FEATURES):
+        raise ValueError("forecast must be (..., intervals, features)")
+    grid = forecast.shape[:-1]
+    weight = np.ones(grid) if price is None else _broadcast(price, grid, 'price')
+
+    schedule = forecast.copy()
+    feasible = np.ones(grid[:-1], dtype=bool)
+    for name, spec in controls.items():
+        if name not in FEATURES:
+            raise ValueError(f"unknown control: {name}")
+        j = FEATURES.index(name)
+        planned = forecast[..., j]
+        lo = _broadcast(spec.get('min', -np.inf), grid, f"{name}.min")
+        hi = _broadcast(spec.get('max', np.inf), grid, f"{name}.max")
+        if np.any(lo > hi):
+            raise ValueError(f"{name}: min is above max")
+        w = weight * model.coef[j]
+
+        if spec.get('shift'):
+            if not (np.isfinite(lo).all() and np.isfinite(hi).all()):
+                raise ValueError(f"{name}: a shifted control needs finite min and max")
+            total = planned.sum(axis=-1)
+            lo_sum, hi_sum = lo.sum(axis=-1), hi.sum(axis=-1)
+            feasible &= (total >= lo_sum - 1e-9) & (total <= hi_sum + 1e-9)
+            best = _fill_cheapest(w, lo, hi, np.clip(total, lo_sum, hi_sum))
+            # with the same weight in every interval any split costs the same: keep the plan
+            keep = (np.ptp(w, axis=-1) == 0) & ((planned >= lo) & (planned <= hi)).all(axis=-1)
+            schedule[..., j] = np.where(keep[..., None], planned, best)
+        else:
+            cheaper = np.where(w > 0, lo, np.where(w < 0, hi, np.clip(planned, lo, hi)))
+            if not np.isfinite(cheaper).all():
+                raise ValueError(f"{name}: unbounded setpoint, give both min and max")
+            schedule[..., j] = cheaper
+
+    return {
+        'schedule': schedule,
+        'energy': model.predict(schedule),
+        'baseline_energy': model.predict(forecast),
+        'feasible': feasible,
+    }
@@ -0,0 +1,193 @@
+import argparse
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+
+from energy_model import FEATURES
+from model_families import load_training_csv
+from online_model import OnlineLinearModel
+
+# Site ids become file names, so keep them to a safe character set
+SITE_ID_PATTERN = re.compile(r'^[A-Za-z0-9_.-]{1,64}$')
+
+
+class UnknownSite(KeyError):
+    pass
+
+
+class SiteLoadTimeout(TimeoutError):
+    pass
+
+
+class SiteRegistry:
+    """
+    Per-site energy models, loaded lazily from <model_dir>/<site_id>.npz.
+
+    Loaded models sit in an LRU bounded by max_bytes. A cold site is loaded on a
+    small thread pool. The registry lock only guards the dictionaries, never the
+    disk read, so requests for warm sites go on while a cold site loads. Concurrent
+    requests for the same cold site share one load.
+
+    Sites held through writer() are never evicted, so every concurrent update of a
+    site goes to the same model instance and is saved by it.
+    """
+
+    def __init__(self, model_dir, max_bytes=64 * 2**20, load_workers=4):
+        self.model_dir = model_dir
+        self.max_bytes = max_bytes
+        self._models = OrderedDict()
+        self._bytes = 0
+        self._loading = {}
+        self._writers = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=load_workers, thread_name_prefix='site-load')
+        self.hits = self.misses = self.evictions = self.loads = self.load_errors = 0
+        self.load_seconds_total = self.load_seconds_max = 0.0
+
+    def path(self, site_id):
+        if not isinstance(site_id, str) or not SITE_ID_PATTERN.match(site_id):
+            raise ValueError(f"invalid site id: {site_id!r}")
+        return os.path.join(self.model_dir, site_id + '.npz')
+
+    def get(self, site_id, timeout=None):
+        """The site's model; waits (up to timeout seconds) only if the site is cold."""
+        try:
+            return self._request(site_id).result(timeout)
+        except FutureTimeout:
+            raise SiteLoadTimeout(f"site {site_id} is still loading") from None
+
+    @contextmanager
+    def writer(self, site_id, timeout=None):
+        """
+        The site's model for updating. It stays loaded until the block ends, so
+        concurrent writers share one instance instead of one of them updating a
+        copy that has already been evicted.
+        """
+        while True:
+            model = self.get(site_id, timeout)
+            with self._lock:
+                # Only pin the instance the registry still holds; if it was evicted
+                # between the load and here, request it again
+                if self._models.get(site_id) is model:
+                    self._writers[site_id] = self._writers.get(site_id, 0) + 1
+                    break
+        try:
+            yield model
+        finally:
+            with self._lock:
+                self._writers[site_id] -= 1
+                if not self._writers[site_id]:
+                    del self._writers[site_id]
+                    self._evict()
+
+    def prefetch(self, site_ids):
+        """Starts loading the given sites in parallel and returns without waiting."""
+        for site_id in site_ids:
+            self._request(site_id, count=False)
+
+    def _request(self, site_id, count=True):
+        path = self.path(site_id)
+        with self._lock:
+            model = self._models.get(site_id)
+            if model is not None:
+                self._models.move_to_end(site_id)
+                if count:
+                    self.hits += 1
+                return _Done(model)
+            if count:
+                self.misses += 1
+            future = self._loading.get(site_id)
+            if future is None:
+                future = self._loading[site_id] = self._pool.submit(self._load, site_id, path)
+        return future
+
+    def _load(self, site_id, path):
+        t0 = time.perf_counter()
+        try:
+            if not os.path.isfile(path):
+                raise UnknownSite(site_id)
+            model = OnlineLinearModel.load(path)
+        except Exception:
+            with self._lock:
+                self._loading.pop(site_id, None)
+                self.load_errors += 1
+            raise
+        elapsed = time.perf_counter() - t0
+        with self._lock:
+            self._loading.pop(site_id, None)
+            self._models[site_id] = model
+            self._bytes += model.nbytes
+            self.loads += 1
+            self.load_seconds_total += elapsed
+            self.load_seconds_max = max(self.load_seconds_max, elapsed)
+            self._evict()
+        return model
+
+    def _evict(self):
+        """Drops least recently used sites until under max_bytes, skipping sites with writers."""
+        for site_id in list(self._models):
+            if self._bytes <= self.max_bytes or len(self._models) <= 1:
+                break
+            if site_id in self._writers:
+                continue
+            self._bytes -= self._models.pop(site_id).nbytes
+            self.evictions += 1
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'model_dir': self.model_dir,
+            'loaded_sites': len(self._models),
+            'loading_sites': len(self._loading),
+            'writing_sites': len(self._writers),
+            'approx_bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else None,
+            'evictions': self.evictions,
+            'loads': self.loads,
+            'load_errors': self.load_errors,
+            'load_seconds_avg': round(self.load_seconds_total / self.loads, 6) if self.loads else None,
+            'load_seconds_max': round(self.load_seconds_max, 6),
+        }
+
+
+class _Done:
+    """Already-loaded model with the result() interface of a Future."""
+    __slots__ = ('model',)
+
+    def __init__(self, model):
+        self.model = model
+
+    def result(self, timeout=None):
+        return self.model
+
+
+def create_site(model_dir, site_id, X, y):
+    """Fits a site's model on its history and writes <model_dir>/<site_id>.npz."""
+    os.makedirs(model_dir, exist_ok=True)
+    path = SiteRegistry(model_dir, load_workers=1).path(site_id)
+    model = OnlineLinearModel(len(FEATURES), path)
+    model.update(X, y)
+    return model
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Create a site model from a CSV of the five features plus kwh")
+    ap.add_argument("site_id")
+    ap.add_argument("csv")
+    ap.add_argument("--model-dir", default=os.environ.get(
+        'SITE_MODEL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'site_models')))
+    args = ap.parse_args()
+
+    try:
+        X, y = load_training_csv(args.csv)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    site_model = create_site(args.model_dir, args.site_id, X, y)
+    print(f"{args.site_id}: {site_model.n_samples} samples -> {site_model.current.target_function}")